@@ -0,0 +1,81 @@
+import asyncio
+import socket
+
+from constants import *
+from listener import open_socket, TelemetryPipeline
+
+# asyncio listener. The socket is non-blocking and read with recv_into into a
+# pool of preallocated buffers, so no bytes object is allocated per datagram.
+# Each time the socket becomes readable every queued datagram is drained and
+# handed to the consumers as one batch (a list of memoryviews). The views point
+# into the shared pool and are only valid until the consumer returns.
+
+
+class AsyncUdpListener:
+    def __init__(self, consumers, ip=UDP_IP, port=UDP_PORT, rcvbuf=UDP_RCVBUF,
+                 pool_size=UDP_BUFFER_POOL_SIZE, packet_size=UDP_MAX_PACKET_SIZE):
+        self.consumers = list(consumers)
+        self.ip = ip
+        self.port = port
+        self.rcvbuf = rcvbuf
+        self.buffers = [memoryview(bytearray(packet_size)) for _ in range(pool_size)]
+        self.sock = None
+        self.stopped = None
+        self.packets_received = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    def _on_readable(self):
+        while True:
+            batch = []
+            for buffer in self.buffers:
+                try:
+                    size = self.sock.recv_into(buffer)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionResetError:
+                    continue  # Windows reports ICMP port unreachable on UDP sockets
+                batch.append(buffer[:size])
+
+            if batch:
+                self.packets_received += len(batch)
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(batch))
+                for consumer in self.consumers:
+                    consumer(batch)
+                for view in batch:
+                    view.release()
+
+            if len(batch) < len(self.buffers):
+                return  # Socket drained, otherwise the pool was full and there is more queued
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.sock = open_socket(self.ip, self.port, self.rcvbuf, blocking=False)
+        self.stopped = loop.create_future()
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+        try:
+            await self.stopped
+        finally:
+            loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+
+    def stop(self):
+        if self.stopped is not None and not self.stopped.done():
+            self.stopped.get_loop().call_soon_threadsafe(self.stopped.set_result, None)
+
+
+def async_udp_listener(gui, recorder=None, consumers=(), stats=None, live=None, relay=None, catalogue=None,
+                       logger=None, lap_traces=None):
+    """Thread entry point mirroring listener.udp_listener, but driven by asyncio."""
+    pipeline = TelemetryPipeline(recorder, logger, gui=gui, stats=stats, lap_traces=lap_traces, live=live,
+                                 relay=relay, catalogue=catalogue)
+    listener = AsyncUdpListener([pipeline.process_batch, *consumers])
+    if stats is not None:
+        stats.add_gauge("largest_receive_batch", lambda: listener.largest_batch)
+    # add_reader needs a selector loop; the default Windows proactor loop lacks it
+    loop = asyncio.SelectorEventLoop()
+    try:
+        loop.run_until_complete(listener.run())
+    finally:
+        loop.close()
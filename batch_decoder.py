@@ -0,0 +1,108 @@
+import argparse
+import csv
+import os
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import *
+from capture import CaptureReader
+from data_logging import LAP_LOG_HEADER, TelemetryLogger
+from packet_views import PacketView
+from session_state import SessionState
+
+# Offline reprocessing of .f1cap captures. Each session is split on the
+# player's lap boundaries into chunks that are decoded in a process pool. A
+# chunk owns the lap completions triggered by its own packets, the first of
+# which completes the lap before the chunk. It therefore replays the two laps
+# before it without recording anything: the first primes the Car state (tyre
+# compound, wear, sector) and the second is then built exactly as the live
+# listener built it, so the merged rows equal what TelemetryLogger.log_lap
+# wrote live.
+
+
+class BatchChunk:
+    def __init__(self, capture_path, session_uid, warmup_offsets, offsets):
+        self.capture_path = capture_path
+        self.session_uid = session_uid
+        self.warmup_offsets = warmup_offsets
+        self.offsets = offsets
+
+
+def plan_chunks(capture_path, laps_per_chunk=5):
+    with CaptureReader(capture_path) as reader:
+        sessions = {}
+        for entry in reader.index:
+            sessions.setdefault(entry.session_uid, []).append(entry)
+
+    chunks = []
+    for session_uid, entries in sessions.items():
+        # Positions where the player's lap changes, plus the session start
+        lap_starts = [0] + [i for i in range(1, len(entries)) if entries[i].lap != entries[i - 1].lap]
+        for n in range(0, len(lap_starts), laps_per_chunk):
+            start = lap_starts[n]
+            stop = lap_starts[n + laps_per_chunk] if n + laps_per_chunk < len(lap_starts) else len(entries)
+            warmup_start = lap_starts[max(0, n - 2)]
+            chunks.append(BatchChunk(
+                capture_path, session_uid,
+                array('Q', (entry.offset for entry in entries[warmup_start:start])),
+                array('Q', (entry.offset for entry in entries[start:stop]))
+            ))
+    return chunks
+
+
+def decode_chunk(chunk):
+    rows = []
+    recording = False
+
+    def record_lap(car):
+        if recording and car.car_index == state.player_index:
+            rows.extend(TelemetryLogger.lap_rows(car))
+
+    state = SessionState(on_lap_completed=record_lap)
+    with CaptureReader(chunk.capture_path) as reader:
+        for offsets in (chunk.warmup_offsets, chunk.offsets):
+            for offset in offsets:
+                _, data = reader.read_at(offset)
+                try:
+                    state.update(PacketView(data))
+                except (ValueError, IndexError, struct.error):
+                    pass  # Skipped live as well
+                finally:
+                    data.release()
+            recording = True
+    return rows
+
+
+def decode_captures(capture_paths, workers=None, laps_per_chunk=5):
+    """Returns {(capture_path, session_uid): lap rows}, in capture order."""
+    chunks = [chunk for path in capture_paths for chunk in plan_chunks(path, laps_per_chunk)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk, rows in zip(chunks, pool.map(decode_chunk, chunks, chunksize=1)):
+            results.setdefault((chunk.capture_path, chunk.session_uid), []).extend(rows)
+    return results
+
+
+def write_lap_csv(path, rows):
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(LAP_LOG_HEADER)
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Reprocess F1 telemetry captures into lap logs")
+    arg_parser.add_argument('captures', nargs='+', help=".f1cap capture files")
+    arg_parser.add_argument('--out', default='logs', help="Directory for the lap CSV files")
+    arg_parser.add_argument('--workers', type=int, default=None, help="Worker processes, default one per core")
+    arg_parser.add_argument('--laps-per-chunk', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    results = decode_captures(args.captures, args.workers, args.laps_per_chunk)
+    for (capture_path, session_uid), rows in results.items():
+        name = os.path.splitext(os.path.basename(capture_path))[0]
+        out_path = os.path.join(args.out, f"lap_telemetry_{name}_{session_uid}.csv")
+        write_lap_csv(out_path, rows)
+        print(f"{out_path}: {len(rows) // 3} laps")
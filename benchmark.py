@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from constants import *
+from packet_generator import PacketGenerator
+from packet_parsers import F1PacketParser
+from packet_arrays import np, CAR_ARRAY_FIELDS
+from data_logging import TelemetryLogger
+import car
+import listener
+
+# Parser microbenchmarks on synthetic datagrams. Every parser method is timed on
+# its own packet type, then the listener's TelemetryPipeline.process is timed on
+# a stream with the game's packet mix; the pipeline is built once beforehand, so
+# its session state (about MAX_CARS car data buffers) is not part of the timing. Each result is printed and appended as one JSON
+# object per line to the output file, so runs can be compared across commits.
+#
+# Allocations are measured in a separate pass with tracemalloc while every
+# result is kept alive: alloc_blocks/bytes_per_packet is what one parse leaves
+# allocated, i.e. the objects it returns, not temporaries freed on the way.
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def measure(name, run, datagrams, repeat):
+    """Times run(datagrams) repeat times (best run counts), then measures its allocations."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        run(datagrams)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = run(datagrams)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    del results
+
+    count = len(datagrams)
+    return {
+        'benchmark': name,
+        'packets': count,
+        'packets_per_sec': count / (best / 1e9),
+        'ns_per_packet': best / count,
+        'alloc_blocks_per_packet': sum(stat.count_diff for stat in stats) / count,
+        'alloc_bytes_per_packet': sum(stat.size_diff for stat in stats) / count,
+    }
+
+
+def parser_benchmarks(generator, packets_per_type, repeat, vectorized):
+    parser = F1PacketParser()
+    car_index = generator.player_car_index
+    results = []
+    for packet_id, parse in sorted(parser.parsers.items()):
+        generator.advance()
+        datagrams = [generator.packet(packet_id) for _ in range(packets_per_type)]
+        # The index argument selects a car, except for tyre sets where it picks a set
+        index = car_index if 'car' in generator.layouts.get(packet_id, {}) else 0
+
+        def run(datagrams, parse=parse, index=index):
+            parse_header = parser.parse_header
+            return [parse(parse_header(data), data, index) for data in datagrams]
+
+        result = measure(f"parser.{parse.__name__}", run, datagrams, repeat)
+        result['packet_id'] = packet_id
+        results.append(result)
+
+    if vectorized and np is not None:
+        vector_parser = F1PacketParser(vectorized=True)
+        for packet_id in sorted(CAR_ARRAY_FIELDS):
+            datagrams = [generator.packet(packet_id) for _ in range(packets_per_type)]
+
+            def run(datagrams):
+                parse_header = vector_parser.parse_header
+                return [vector_parser.parse_all_cars(parse_header(data), data) for data in datagrams]
+
+            result = measure("parser.parse_all_cars", run, datagrams, repeat)
+            result['packet_id'] = packet_id
+            results.append(result)
+    return results
+
+
+def listener_benchmark(generator, frames, repeat, log_dir):
+    """Times TelemetryPipeline.process on frames of game traffic, with logging into log_dir."""
+    datagrams = generator.frames(frames)
+    logger = TelemetryLogger(log_dir)
+    pipeline = listener.TelemetryPipeline(logger=logger)
+    # The pipeline and Car print every packet, lap and sector when DEBUG_PRINT is on;
+    # both modules star-import it, so keep the terminal quiet in each
+    saved = listener.DEBUG_PRINT, car.DEBUG_PRINT
+    listener.DEBUG_PRINT = car.DEBUG_PRINT = False
+    try:
+        def run(datagrams):
+            process = pipeline.process
+            for data in datagrams:
+                process(data)
+        result = measure("TelemetryPipeline.process", run, datagrams, repeat)
+    finally:
+        listener.DEBUG_PRINT, car.DEBUG_PRINT = saved
+        logger.close()
+    result['packet_id'] = None
+    return result
+
+
+def print_results(results):
+    print(f"{'Benchmark':<34} {'Id':>3} {'Packets/s':>12} {'ns/packet':>11} {'Blocks':>8} {'Bytes':>9}")
+    for result in results:
+        packet_id = '' if result['packet_id'] is None else result['packet_id']
+        print(f"{result['benchmark']:<34} {packet_id:>3} {result['packets_per_sec']:>12,.0f} "
+              f"{result['ns_per_packet']:>11,.0f} {result['alloc_blocks_per_packet']:>8.1f} "
+              f"{result['alloc_bytes_per_packet']:>9,.0f}")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark the F1 25 packet parsers")
+    arg_parser.add_argument('--packets', type=int, default=2000, help="Packets per parser benchmark")
+    arg_parser.add_argument('--frames', type=int, default=600, help="Frames of traffic for the listener benchmark")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark, the best counts")
+    arg_parser.add_argument('--seed', type=int, default=2025)
+    arg_parser.add_argument('--vectorized', action='store_true', help="Also time the NumPy all-car parser")
+    arg_parser.add_argument('--out', default='bench_output.txt', help="JSON lines file results are appended to")
+    args = arg_parser.parse_args()
+
+    generator = PacketGenerator(seed=args.seed)
+    results = parser_benchmarks(generator, args.packets, args.repeat, args.vectorized)
+    with tempfile.TemporaryDirectory() as log_dir:
+        results.append(listener_benchmark(generator, args.frames, args.repeat, log_dir))
+    print_results(results)
+
+    run_info = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': args.seed,
+    }
+    with open(args.out, 'a') as file:
+        for result in results:
+            file.write(json.dumps({**run_info, **result}) + '\n')
+    print(f"Results appended to {args.out}")
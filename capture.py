@@ -0,0 +1,213 @@
+import mmap
+import os
+import struct
+import time
+
+from constants import *
+from packet_views import PacketView
+
+# Raw packet capture format
+#
+#   <name>.f1cap   magic, then one record per datagram: receive time (f64),
+#                  datagram length (u16), datagram bytes
+#   <name>.f1idx   magic, then one fixed-size entry per datagram: record offset,
+#                  receive time, m_sessionUID, m_frameIdentifier, packet id and
+#                  the player's current lap when the datagram arrived
+#
+# Both files are append-only, so a capture that was cut short is still readable
+# up to its last complete record.
+
+CAPTURE_MAGIC = b'F1CAP\x00\x01\x00'
+INDEX_MAGIC = b'F1IDX\x00\x01\x00'
+CAPTURE_EXTENSION = '.f1cap'
+INDEX_EXTENSION = '.f1idx'
+
+RECORD_STRUCT = struct.Struct('<dH')
+INDEX_STRUCT = struct.Struct('<QdQIBB')
+
+
+def index_path_for(capture_path):
+    return os.path.splitext(capture_path)[0] + INDEX_EXTENSION
+
+
+class IndexEntry:
+    __slots__ = ('offset', 'timestamp', 'session_uid', 'frame_identifier', 'packet_id', 'lap')
+
+    def __init__(self, offset, timestamp, session_uid, frame_identifier, packet_id, lap):
+        self.offset = offset
+        self.timestamp = timestamp
+        self.session_uid = session_uid
+        self.frame_identifier = frame_identifier
+        self.packet_id = packet_id
+        self.lap = lap
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        if not path.endswith(CAPTURE_EXTENSION):
+            path += CAPTURE_EXTENSION
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.capture_file = open(path, 'wb')
+        self.index_file = open(index_path_for(path), 'wb')
+        self.capture_file.write(CAPTURE_MAGIC)
+        self.index_file.write(INDEX_MAGIC)
+        self.offset = len(CAPTURE_MAGIC)
+        self.lap = 0
+        self.packet_count = 0
+
+    def write(self, data, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        if len(data) < HEADER_SIZE:
+            return
+
+        packet = PacketView(data)
+        packet_id = packet.packet_id
+        header = packet.header
+        if packet_id == 2:
+            try:
+                self.lap = packet.car(packet.player_car_index).currentLapNum
+            except IndexError:
+                pass  # Spectating, or a truncated packet
+
+        self.capture_file.write(RECORD_STRUCT.pack(timestamp, len(data)))
+        self.capture_file.write(data)
+        self.index_file.write(INDEX_STRUCT.pack(
+            self.offset, timestamp, header.m_sessionUID, header.m_frameIdentifier, packet_id, self.lap
+        ))
+        self.offset += RECORD_STRUCT.size + len(data)
+        self.packet_count += 1
+
+    def close(self):
+        self.capture_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class CaptureReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+            self.data.close()
+            raise ValueError(f"{path} is not an F1 telemetry capture file")
+        self._index = None
+
+    def read_at(self, offset):
+        """Returns (timestamp, datagram) for the record at offset, the datagram as a memoryview."""
+        timestamp, length = RECORD_STRUCT.unpack_from(self.data, offset)
+        start = offset + RECORD_STRUCT.size
+        return timestamp, memoryview(self.data)[start:start + length]
+
+    def __iter__(self):
+        offset = len(CAPTURE_MAGIC)
+        end = len(self.data)
+        while offset + RECORD_STRUCT.size <= end:
+            timestamp, length = RECORD_STRUCT.unpack_from(self.data, offset)
+            start = offset + RECORD_STRUCT.size
+            if start + length > end:
+                break  # Truncated last record
+            yield timestamp, memoryview(self.data)[start:start + length]
+            offset = start + length
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _load_index(self):
+        index_path = index_path_for(self.path)
+        if not os.path.exists(index_path):
+            return self._build_index()
+        with open(index_path, 'rb') as file:
+            raw = file.read()
+        if raw[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not an F1 telemetry capture index")
+        body = memoryview(raw)[len(INDEX_MAGIC):]
+        usable = len(body) - len(body) % INDEX_STRUCT.size
+        return [IndexEntry(*entry) for entry in INDEX_STRUCT.iter_unpack(body[:usable])]
+
+    def _build_index(self):
+        # Capture without a sidecar: rebuild the index by scanning the records
+        entries = []
+        offset = len(CAPTURE_MAGIC)
+        lap = 0
+        for timestamp, data in self:
+            if len(data) >= HEADER_SIZE:
+                packet = PacketView(data)
+                if packet.packet_id == 2:
+                    try:
+                        lap = packet.car(packet.player_car_index).currentLapNum
+                    except IndexError:
+                        pass
+                header = packet.header
+                entries.append(IndexEntry(offset, timestamp, header.m_sessionUID,
+                                          header.m_frameIdentifier, packet.packet_id, lap))
+            offset += RECORD_STRUCT.size + len(data)
+        return entries
+
+    def find(self, session_uid=None, packet_id=None, lap=None, first_frame=None, last_frame=None):
+        return [
+            entry for entry in self.index
+            if (session_uid is None or entry.session_uid == session_uid)
+            and (packet_id is None or entry.packet_id == packet_id)
+            and (lap is None or entry.lap == lap)
+            and (first_frame is None or entry.frame_identifier >= first_frame)
+            and (last_frame is None or entry.frame_identifier <= last_frame)
+        ]
+
+    def session_uids(self):
+        return sorted({entry.session_uid for entry in self.index})
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+# Socket stand-in that replays a capture through udp_listener. speed=1.0 keeps
+# the recorded timing, speed=N plays N times faster and speed=None (or 0) plays
+# as fast as possible. Raises EOFError once the capture is exhausted.
+class ReplaySource:
+    def __init__(self, path, speed=1.0, entries=None):
+        self.reader = CaptureReader(path)
+        self.speed = speed
+        if entries is not None:
+            self.records = (self.reader.read_at(entry.offset) for entry in entries)
+        else:
+            self.records = iter(self.reader)
+        self.first_timestamp = None
+        self.start_time = None
+        self.address = (path, 0)
+
+    def recvfrom(self, bufsize):
+        try:
+            timestamp, data = next(self.records)
+        except StopIteration:
+            raise EOFError(f"End of capture {self.reader.path}")
+
+        if self.speed:
+            if self.first_timestamp is None:
+                self.first_timestamp = timestamp
+                self.start_time = time.perf_counter()
+            due = self.start_time + (timestamp - self.first_timestamp) / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return bytes(data[:bufsize]), self.address
+
+    def close(self):
+        self.records = iter(())
+        self.reader.close()
@@ -1,15 +1,21 @@
 from lap import LapClass
-from car_data import CarDataClass
+from car_data import CarDataBuffer
 from constants import *
 
 class Car:
-    def __init__(self, car_index):
+    __slots__ = (
+        'car_index', 'speed', 'throttle', 'brake', 'steer', 'clutch', 'gear',
+        'tire_wear', 'tire_type', 'used_race_tires', 'fastest_lap', 'laps', 'lap',
+        'sector_number', 'retention', 'car_data', 'lap_start_sample'
+    )
+
+    def __init__(self, car_index, retention=CAR_DATA_RETENTION):
         self.car_index = car_index
         self.speed = 0.0
         self.throttle = 0.0
         self.brake = 0.0
         self.steer = 0.0
-        self.clutch = 0.0
+        self.clutch = 0  # 0-100, as sent by the game
         self.gear = 0
         self.tire_wear = [0.0, 0.0, 0.0, 0.0]  # FL, FR, RL, RR
         self.tire_type = 0
@@ -18,7 +24,14 @@ class Car:
         self.laps = []
         self.lap = LapClass(0)  # Current lap snapshot
         self.sector_number = 0  # Current sector number
-        self.car_data = []
+        self.retention = retention
+        self.car_data = None  # Allocated by activate(), so empty grid slots cost no history
+        self.lap_start_sample = 0  # car_data.total_samples when the current lap started
+
+    def activate(self):
+        """Allocates the telemetry history once the car is on track."""
+        if self.car_data is None:
+            self.car_data = CarDataBuffer(self.car_index, self.retention)
 
     def update_car_damage(self, tire_wear):
         if len(tire_wear) == 4:
@@ -41,11 +54,11 @@ class Car:
         self.clutch = clutch
         self.gear = gear
 
-        carData = CarDataClass(
-            self.car_index, speed, throttle, brake, steer, clutch, gear,
-            self.tire_wear, self.tire_type, lap_distance, track_length
-        )
-        self.car_data.append(carData)
+        if self.car_data is not None:
+            self.car_data.append(
+                speed, throttle, brake, steer, clutch, gear,
+                self.tire_wear, self.tire_type, lap_distance, track_length, self.lap.time
+            )
 
 
 
@@ -59,6 +72,7 @@ class Car:
         if self.lap.time < self.fastest_lap or self.fastest_lap == 0.0:
             self.fastest_lap = self.lap.time
         self.lap = LapClass(lap_number)
+        self.lap_start_sample = self.car_data.total_samples if self.car_data is not None else 0
 
         if DEBUG_PRINT:
             print(f"New lap started: {lap_number}, Fastest Lap: {self.fastest_lap:.3f}s")
@@ -1,6 +1,14 @@
+from array import array
+from constants import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only window_array needs it
+    np = None
+
 class CarDataClass:
-    def __init__(self, car_index, speed=0.0, throttle=0.0, brake=0.0, steer=0.0, clutch=0.0, gear=0,
-                 tire_wear=None, tire_type=0, distance_around_track=0.0, track_length=0.0):
+    def __init__(self, car_index, speed=0.0, throttle=0.0, brake=0.0, steer=0.0, clutch=0, gear=0,
+                 tire_wear=None, tire_type=0, distance_around_track=0.0, track_length=0.0, lap_time=0.0):
         self.car_index = car_index
         self.speed = speed
         self.throttle = throttle
@@ -11,4 +19,77 @@ class CarDataClass:
         self.tire_wear = tire_wear
         self.tire_type = tire_type
         self.distance_around_track = distance_around_track
-        self.track_length = track_length
\ No newline at end of file
+        self.track_length = track_length
+        self.lap_time = lap_time
+
+# Columnar, fixed-capacity history of CarDataClass samples. Every column is a
+# typed array holding two copies of the ring back to back, so any window of up
+# to `capacity` samples is one contiguous memoryview and never needs a copy.
+class CarDataBuffer:
+    CHANNELS = [
+        ('speed', 'f'), ('throttle', 'f'), ('brake', 'f'), ('steer', 'f'),
+        ('clutch', 'B'), ('gear', 'b'),
+        ('distance_around_track', 'f'), ('track_length', 'f'),
+        ('tire_wear_fl', 'f'), ('tire_wear_fr', 'f'), ('tire_wear_rl', 'f'), ('tire_wear_rr', 'f'),
+        ('tire_type', 'B'), ('lap_time', 'f'),
+    ]
+
+    def __init__(self, car_index, capacity=CAR_DATA_RETENTION):
+        if capacity <= 0:
+            raise ValueError("Car data capacity must be positive.")
+        self.car_index = car_index
+        self.capacity = capacity
+        self.columns = {
+            name: array(code, bytes(2 * capacity * array(code).itemsize))
+            for name, code in self.CHANNELS
+        }
+        self._column_list = [self.columns[name] for name, _ in self.CHANNELS]
+        self.total_samples = 0
+
+    def append(self, speed, throttle, brake, steer, clutch, gear,
+               tire_wear, tire_type, distance_around_track=0.0, track_length=0.0, lap_time=0.0):
+        first = self.total_samples % self.capacity
+        second = first + self.capacity
+        # The clutch column is unsigned bytes like the game's 0-100 value; accept floats too
+        values = (speed, throttle, brake, steer, int(clutch), gear, distance_around_track, track_length,
+                  tire_wear[0], tire_wear[1], tire_wear[2], tire_wear[3], tire_type, lap_time)
+        for column, value in zip(self._column_list, values):
+            column[first] = value
+            column[second] = value
+        self.total_samples += 1
+
+    def __len__(self):
+        return min(self.total_samples, self.capacity)
+
+    def _bounds(self, start, stop):
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return start, max(start, stop)
+
+    def window(self, channel, start=None, stop=None):
+        """Returns samples [start, stop) of one channel, oldest first, as a memoryview."""
+        start, stop = self._bounds(start, stop)
+        offset = (self.total_samples - len(self) + start) % self.capacity
+        return memoryview(self.columns[channel])[offset:offset + stop - start]
+
+    def tail(self, channel, count):
+        return self.window(channel, max(0, len(self) - count))
+
+    def window_array(self, channel, start=None, stop=None):
+        """Same as window, but as a NumPy array sharing the buffer's memory."""
+        if np is None:
+            raise ImportError("window_array requires numpy.")
+        return np.frombuffer(self.window(channel, start, stop), dtype=self.columns[channel].typecode)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Car data index out of range")
+        offset = (self.total_samples - len(self) + index) % self.capacity
+        row = {name: self.columns[name][offset] for name, _ in self.CHANNELS}
+        return CarDataClass(
+            self.car_index, row['speed'], row['throttle'], row['brake'], row['steer'],
+            row['clutch'], row['gear'],
+            [row['tire_wear_fl'], row['tire_wear_fr'], row['tire_wear_rl'], row['tire_wear_rr']],
+            row['tire_type'], row['distance_around_track'], row['track_length'], row['lap_time']
+        )
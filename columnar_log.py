@@ -0,0 +1,168 @@
+import argparse
+import ast
+import csv
+import mmap
+import os
+import struct
+from array import array
+
+from constants import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, without it channels load as memoryviews
+    np = None
+
+# Columnar telemetry log. Every telemetry sample is kept at full rate, split
+# into one chunk per car per lap, and each channel of a chunk is its own .npy
+# file (standard NumPy v1.0 format, written without needing NumPy):
+#
+#   <log_dir>/session_<uid>/car_<idx>/lap_<NNN>/<channel>.npy
+#
+# A lap that is entered more than once (flashbacks, restarts) gets extra
+# chunks named lap_<NNN>_<part>.
+
+SAMPLE_CHANNELS = [
+    ('session_time', 'd'), ('lap_time', 'f'), ('lap_distance', 'f'),
+    ('speed', 'f'), ('throttle', 'f'), ('brake', 'f'), ('steer', 'f'),
+    ('clutch', 'B'), ('gear', 'b'),
+    ('tire_wear_fl', 'f'), ('tire_wear_fr', 'f'), ('tire_wear_rl', 'f'), ('tire_wear_rr', 'f'),
+    ('tire_type', 'B'),
+]
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_DESCR = {'f': '<f4', 'd': '<f8', 'B': '|u1', 'b': '|i1', 'H': '<u2', 'h': '<i2', 'I': '<u4'}
+NPY_TYPECODES = {descr: typecode for typecode, descr in NPY_DESCR.items()}
+
+CSV_EXPORT_HEADER = [
+    "SessionTime", "Lap", "LapTime", "LapDistance",
+    "CarIndex", "Speed", "Throttle", "Brake", "Steer", "Clutch", "Gear",
+    "TireType", "FL_Wear", "FR_Wear", "RL_Wear", "RR_Wear"
+]
+
+
+def write_npy(path, values):
+    header = repr({'descr': NPY_DESCR[values.typecode], 'fortran_order': False, 'shape': (len(values),)})
+    # Pad so the data starts on a 64 byte boundary, as the format requires
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    with open(path, 'wb') as file:
+        file.write(NPY_MAGIC)
+        file.write(struct.pack('<H', len(header)))
+        file.write(header)
+        values.tofile(file)
+
+
+def open_npy(path):
+    """Memory-maps a 1-D .npy channel: a read-only NumPy memmap, or a typed memoryview without NumPy."""
+    if np is not None:
+        return np.load(path, mmap_mode='r')
+    with open(path, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:len(NPY_MAGIC)] != NPY_MAGIC:
+        raise ValueError(f"{path} is not a version 1.0 .npy file")
+    header_length = struct.unpack_from('<H', data, len(NPY_MAGIC))[0]
+    start = len(NPY_MAGIC) + 2
+    header = ast.literal_eval(data[start:start + header_length].decode('latin1'))
+    return memoryview(data)[start + header_length:].cast(NPY_TYPECODES[header['descr']])
+
+
+# One car's samples for one lap, accumulated in typed arrays until the lap ends
+class LapChunk:
+    __slots__ = ('session_uid', 'car_index', 'lap_number', 'columns')
+
+    def __init__(self, session_uid, car_index, lap_number):
+        self.session_uid = session_uid
+        self.car_index = car_index
+        self.lap_number = lap_number
+        self.columns = [array(typecode) for _, typecode in SAMPLE_CHANNELS]
+
+    def append(self, values):
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def write(self, log_dir):
+        car_dir = os.path.join(log_dir, f"session_{self.session_uid}", f"car_{self.car_index}")
+        chunk_dir = os.path.join(car_dir, f"lap_{self.lap_number:03d}")
+        part = 1
+        while os.path.exists(chunk_dir):
+            part += 1
+            chunk_dir = os.path.join(car_dir, f"lap_{self.lap_number:03d}_{part}")
+        os.makedirs(chunk_dir)
+        for (name, _), column in zip(SAMPLE_CHANNELS, self.columns):
+            write_npy(os.path.join(chunk_dir, f"{name}.npy"), column)
+        return chunk_dir
+
+
+class ColumnarLogReader:
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+
+    def sessions(self):
+        return sorted(int(name[len('session_'):]) for name in os.listdir(self.log_dir)
+                      if name.startswith('session_'))
+
+    def _car_dir(self, session_uid, car_index):
+        return os.path.join(self.log_dir, f"session_{session_uid}", f"car_{car_index}")
+
+    def cars(self, session_uid):
+        session_dir = os.path.join(self.log_dir, f"session_{session_uid}")
+        return sorted(int(name[len('car_'):]) for name in os.listdir(session_dir) if name.startswith('car_'))
+
+    def laps(self, session_uid, car_index):
+        """Returns (lap_number, part) for every chunk of a car, in lap order."""
+        chunks = []
+        for name in os.listdir(self._car_dir(session_uid, car_index)):
+            lap, _, part = name[len('lap_'):].partition('_')
+            chunks.append((int(lap), int(part) if part else 1))
+        return sorted(chunks)
+
+    def channel(self, session_uid, car_index, lap_number, name, part=1):
+        chunk = f"lap_{lap_number:03d}" if part == 1 else f"lap_{lap_number:03d}_{part}"
+        return open_npy(os.path.join(self._car_dir(session_uid, car_index), chunk, f"{name}.npy"))
+
+    def lap(self, session_uid, car_index, lap_number, part=1):
+        return {name: self.channel(session_uid, car_index, lap_number, name, part) for name, _ in SAMPLE_CHANNELS}
+
+    def export_csv(self, out_path, session_uid, car_index):
+        """Converts every lap of one car to a CSV with the input log's columns and rounding."""
+        with open(out_path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_EXPORT_HEADER)
+            for lap_number, part in self.laps(session_uid, car_index):
+                lap = self.lap(session_uid, car_index, lap_number, part)
+                for i in range(len(lap['speed'])):
+                    writer.writerow([
+                        round(float(lap['session_time'][i]), 3), lap_number,
+                        round(float(lap['lap_time'][i]), 3), round(float(lap['lap_distance'][i]), 1),
+                        car_index,
+                        round(float(lap['speed'][i]), 1),
+                        round(float(lap['throttle'][i]), 2),
+                        round(float(lap['brake'][i]), 2),
+                        round(float(lap['steer'][i]), 2),
+                        round(float(lap['clutch'][i]), 2),
+                        int(lap['gear'][i]),
+                        TYRE_COMPOUND_MAP.get(int(lap['tire_type'][i]), f"Type {int(lap['tire_type'][i])}"),
+                        round(float(lap['tire_wear_fl'][i]), 1),
+                        round(float(lap['tire_wear_fr'][i]), 1),
+                        round(float(lap['tire_wear_rl'][i]), 1),
+                        round(float(lap['tire_wear_rr'][i]), 1)
+                    ])
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Export a columnar telemetry log to CSV")
+    arg_parser.add_argument('log_dir')
+    arg_parser.add_argument('--out', default='.', help="Directory for the CSV files")
+    args = arg_parser.parse_args()
+
+    reader = ColumnarLogReader(args.log_dir)
+    os.makedirs(args.out, exist_ok=True)
+    for session_uid in reader.sessions():
+        for car_index in reader.cars(session_uid):
+            out_path = os.path.join(args.out, f"input_telemetry_{session_uid}_car{car_index}.csv")
+            reader.export_csv(out_path, session_uid, car_index)
+            print(out_path)
@@ -3,7 +3,46 @@ import struct
 
 UDP_IP = "0.0.0.0"
 UDP_PORT = 20777
+UDP_RCVBUF = 4 * 1024 * 1024  # socket receive buffer, absorbs bursts at session start
+UDP_MAX_PACKET_SIZE = 2048
+UDP_BUFFER_POOL_SIZE = 64  # preallocated receive buffers for the asyncio listener
+SHM_RING_SLOTS = 4096  # datagram slots in the shared-memory ring of the multi-process pipeline
+SHM_OVERRUN_REPORT_INTERVAL = 10.0  # seconds between reports of datagrams a ring reader lost
+MULTI_RIG_WORKERS = 2  # session worker processes of the multi-rig listener
+MULTI_RIG_SESSION_TIMEOUT = 60.0  # seconds without packets before a rig session is closed
 LOG_INTERVAL = 0.2  # seconds
+LOG_QUEUE_SIZE = 10000  # batches of rows waiting for the logger's writer thread
+LOG_FLUSH_ROWS = 500
+LOG_FLUSH_INTERVAL = 1.0  # seconds
+CATALOGUE_PATH = "logs/sessions.sqlite"  # SQLite index of every logged session
+MAX_CARS = 22
+CAR_DATA_RETENTION = 10800  # telemetry samples kept per car, ~3 minutes at 60 Hz, ~1 MB per car on track
+GUI_FRAME_RATE = 30  # GUI redraws per second at most
+GUI_PENDING_UPDATES = 256  # updates kept between GUI frames, older ones are dropped
+STATS_PORT = 20780  # local HTTP port for pipeline stats
+STATS_INTERVAL = 10.0  # seconds between printed stats reports
+LIVE_PORT = 20781  # local WebSocket/HTTP port for live dashboards
+LIVE_CLIENT_RATE = 20.0  # frames per second at most for each dashboard client
+LIVE_SNAPSHOT_INTERVAL = 0.02  # seconds a state snapshot is shared between clients
+LIVE_CLIENT_BUFFER_LIMIT = 64 * 1024  # unsent bytes after which a client's frames are skipped
+LAP_TRACE_STEP = 1.0  # metres between points of a resampled lap
+LAP_TRACE_MAX_GAP = 50.0  # metres a lap may miss at either end and still be resampled
+LAP_TRACE_SEGMENT = 100.0  # metres per segment when reporting time lost
+LAP_TRACE_CORNER_WINDOW = 100.0  # metres either side of a corner's minimum speed
+CONSISTENCY_WINDOW = 5  # recent laps compared for the consistency tip
+STRATEGY_SAMPLES = 300  # simulated races per strategy plan
+STRATEGY_MAX_STOPS = 3
+STRATEGY_MAX_CANDIDATES = 20000  # stop laps are spaced further apart until the candidates fit
+STRATEGY_BATCH_CELLS = 2_000_000  # candidate x race cells evaluated per array batch
+STRATEGY_MIN_STINT = 5  # laps
+STRATEGY_PIT_LOSS = 22.0  # seconds lost to a pit stop under green flag
+STRATEGY_PIT_LOSS_STD = 1.5  # seconds
+STRATEGY_SAFETY_CAR_PROBABILITY = 0.01  # chance of a safety car on any given lap
+STRATEGY_SAFETY_CAR_PIT_FACTOR = 0.5  # share of the pit loss paid when stopping under the safety car
+STRATEGY_DEGRADATION = 0.03  # seconds per lap lost per % of tyre wear
+STRATEGY_PACE_PER_WEAR = 0.25  # seconds per lap gained per %/lap of extra wear rate, softer is faster
+STRATEGY_CLIFF_WEAR = 70.0  # % wear beyond which the tyre falls off the cliff
+STRATEGY_CLIFF_PENALTY = 2.0  # seconds per lap driven past the cliff
 
 DEBUG_PRINT = True
 
@@ -34,6 +73,9 @@ SESSION_TYPE_MAP = {
     10: 'Sprint Shootout 1', 11: 'Sprint Shootout 2', 12: 'Sprint Shootout 3', 13: 'Short Sprint Shootout',
     14: 'One-Shot Sprint Shootout', 15: 'Race', 16: 'Race 2', 17: 'Race 3', 18: 'Time Trial', 28: 'F1 World Event (Unmapped)'
 }
+RESULT_STATUS_ACTIVE = 2  # lap data resultStatus from which a car is on track (0 invalid, 1 inactive)
+PRACTICE_SESSION_TYPES = (1, 2, 3, 4)  # laps feeding the strategy advisor's practice wear rates
+RACE_SESSION_TYPES = (15, 16, 17)
 
 TYRE_COMPOUND_MAP = {
     16: 'C5', 17: 'C4', 18: 'C3', 19: 'C2', 20: 'C1', 21: 'C0', 22: 'C6',
@@ -1,68 +1,240 @@
 import csv
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 
 from constants import *
 
 from car import Car
+from columnar_log import LapChunk
 from lap import LapClass
 
-# Logger file for telemetry data
+# Queue message kinds for the writer thread
+LAP_LOG = 'lap'
+INPUT_LOG = 'input'
+LAP_CHUNK = 'chunk'
+FLUSH = 'flush'
+CLOSE = 'close'
+
+LAP_LOG_HEADER = [
+    "CarIndex", "Lap", "LapTime", "Compound",
+    "FL_Wear", "FR_Wear", "RL_Wear", "RR_Wear",
+    "Sector", "SectorTime"
+]
+
+INPUT_LOG_HEADER = [
+    "CarIndex", "Speed", "Throttle", "Brake", "Steer", "Clutch", "Gear",
+    "TireType", "FL_Wear", "FR_Wear", "RL_Wear", "RR_Wear"
+]
+
+# Logger file for telemetry data. Rows are handed to a bounded queue and written
+# by a background thread that keeps both files open and flushes in batches, so
+# the UDP receive loop never waits on disk I/O. If the queue is full the rows
+# are dropped and counted in dropped_rows rather than blocking the caller.
+# Rows or samples lost to a failed write (disk full, file removed) are counted
+# in write_errors and the writer thread carries on.
+# With columnar=True every telemetry sample passed to log_sample is also kept,
+# at full rate, in per-lap .npy column chunks (see columnar_log.py).
 class TelemetryLogger:
-    def __init__(self, base_dir="logs"):
+    def __init__(self, base_dir="logs", queue_size=LOG_QUEUE_SIZE,
+                 flush_rows=LOG_FLUSH_ROWS, flush_interval=LOG_FLUSH_INTERVAL, columnar=False):
         os.makedirs(base_dir, exist_ok=True)
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.lap_file_path = os.path.join(base_dir, f"lap_telemetry_TRACK_SESSIONTYPE_{timestamp}.csv")
         self.input_file_path = os.path.join(base_dir, f"input_telemetry_TRACK_SESSIONTYPE_{timestamp}.csv")
-        self.lap_header_written = False
-        self.input_header_written = False
+        self.columnar_dir = os.path.join(base_dir, f"columnar_telemetry_{timestamp}") if columnar else None
+        self.lap_chunks = {}  # car index -> LapChunk being filled
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.dropped_rows = 0
+        self.write_errors = 0
+        self.last_write_error = None
+        self.closed = False
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="TelemetryLogger", daemon=True)
+        self.writer_thread.start()
 
     def log_lap(self, car):
-        with open(self.lap_file_path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            if not self.lap_header_written:
-                writer.writerow([
-                    "CarIndex", "Lap", "LapTime", "Compound",
-                    "FL_Wear", "FR_Wear", "RL_Wear", "RR_Wear",
-                    "Sector", "SectorTime"
-                ])
-                self.lap_header_written = True
-
-            for sector in car.lap.sectors:
-                writer.writerow([
-                    car.car_index,
-                    car.lap.lap_number,
-                    round(car.lap.time, 3),
-                    TYRE_COMPOUND_MAP.get(car.lap.tire_type, f"Type {car.lap.tire_type}"),
-                    round(sector.tire_wear[0], 1),
-                    round(sector.tire_wear[1], 1),
-                    round(sector.tire_wear[2], 1),
-                    round(sector.tire_wear[3], 1),
-                    sector.sector_number,
-                    round(sector.time, 3)
-                ])
+        self.log_lap_rows(self.lap_rows(car))
 
-    def log_car_status(self, car):
-        with open(self.input_file_path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            if not self.input_header_written:
-                writer.writerow([
-                    "CarIndex", "Speed", "Throttle", "Brake", "Steer", "Clutch", "Gear",
-                    "TireType", "FL_Wear", "FR_Wear", "RL_Wear", "RR_Wear"
-                ])
-                self.input_header_written = True
-
-            writer.writerow([
+    @staticmethod
+    def lap_rows(car):
+        return [
+            [
                 car.car_index,
-                round(car.speed, 1),
-                round(car.throttle, 2),
-                round(car.brake, 2),
-                round(car.steer, 2),
-                round(car.clutch, 2),
-                car.gear,
-                TYRE_COMPOUND_MAP.get(car.tire_type, f"Type {car.tire_type}"),
-                round(car.tire_wear[0], 1),
-                round(car.tire_wear[1], 1),
-                round(car.tire_wear[2], 1),
-                round(car.tire_wear[3], 1)
-            ])
\ No newline at end of file
+                car.lap.lap_number,
+                round(car.lap.time, 3),
+                TYRE_COMPOUND_MAP.get(car.lap.tire_type, f"Type {car.lap.tire_type}"),
+                round(sector.tire_wear[0], 1),
+                round(sector.tire_wear[1], 1),
+                round(sector.tire_wear[2], 1),
+                round(sector.tire_wear[3], 1),
+                sector.sector_number,
+                round(sector.time, 3)
+            ]
+            for sector in car.lap.sectors
+        ]
+
+    def log_lap_rows(self, rows):
+        self._enqueue(LAP_LOG, rows)
+
+    def log_car_status(self, car):
+        # Snapshot the raw values here; rounding and formatting happen on the writer thread
+        self._enqueue(INPUT_LOG, [(
+            car.car_index, car.speed, car.throttle, car.brake, car.steer, car.clutch, car.gear,
+            car.tire_type, car.tire_wear[0], car.tire_wear[1], car.tire_wear[2], car.tire_wear[3]
+        )])
+
+    def log_sample(self, car, session_uid, session_time, lap_number, lap_time, lap_distance):
+        if self.columnar_dir is None:
+            return
+        chunk = self.lap_chunks.get(car.car_index)
+        if chunk is None or chunk.lap_number != lap_number or chunk.session_uid != session_uid:
+            if chunk is not None:
+                self._enqueue(LAP_CHUNK, chunk)
+            chunk = self.lap_chunks[car.car_index] = LapChunk(session_uid, car.car_index, lap_number)
+        chunk.append((
+            session_time, lap_time, lap_distance,
+            car.speed, car.throttle, car.brake, car.steer, car.clutch, car.gear,
+            car.tire_wear[0], car.tire_wear[1], car.tire_wear[2], car.tire_wear[3], car.tire_type
+        ))
+
+    @staticmethod
+    def input_row(values):
+        car_index, speed, throttle, brake, steer, clutch, gear, tire_type, fl, fr, rl, rr = values
+        return [
+            car_index,
+            round(speed, 1),
+            round(throttle, 2),
+            round(brake, 2),
+            round(steer, 2),
+            round(clutch, 2),
+            gear,
+            TYRE_COMPOUND_MAP.get(tire_type, f"Type {tire_type}"),
+            round(fl, 1),
+            round(fr, 1),
+            round(rl, 1),
+            round(rr, 1)
+        ]
+
+    def _enqueue(self, kind, payload):
+        if self.closed:
+            raise ValueError("Telemetry logger is closed.")
+        try:
+            self.queue.put_nowait((kind, payload))
+        except queue.Full:
+            self.dropped_rows += len(payload)  # Rows, or samples for a lap chunk
+
+    def flush(self, timeout=None):
+        """Blocks until every row queued so far is written to disk. False on timeout or if the writer died."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        if not self._put((FLUSH, done), deadline):
+            return False
+        while not done.is_set():
+            if not self.writer_thread.is_alive():
+                return False
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+            done.wait(wait)
+        return True
+
+    def close(self, timeout=None):
+        if self.closed:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for chunk in self.lap_chunks.values():
+            if not self._put((LAP_CHUNK, chunk), deadline):
+                self.dropped_rows += len(chunk)
+        self.lap_chunks.clear()
+        self.closed = True
+        self._put((CLOSE, None), deadline)
+        self.writer_thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def _put(self, item, deadline):
+        # Waits for queue space only while the writer thread is alive to make it
+        while self.writer_thread.is_alive():
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+            try:
+                self.queue.put(item, timeout=wait)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _write_failed(self, lost, error):
+        self.write_errors += lost
+        self.last_write_error = error
+        print(f"Telemetry logger write failed: {error}")
+
+    def _writer_loop(self):
+        files = {}
+        writers = {}
+        pending = {LAP_LOG: [], INPUT_LOG: []}
+        pending_count = 0
+        last_flush = time.monotonic()
+
+        def write_pending():
+            for kind, rows in pending.items():
+                if not rows:
+                    continue
+                try:
+                    if kind not in files:
+                        path, header = ((self.lap_file_path, LAP_LOG_HEADER) if kind == LAP_LOG
+                                        else (self.input_file_path, INPUT_LOG_HEADER))
+                        files[kind] = open(path, mode='a', newline='')
+                        writers[kind] = csv.writer(files[kind])
+                        writers[kind].writerow(header)
+                    writers[kind].writerows(rows if kind == LAP_LOG else map(self.input_row, rows))
+                    files[kind].flush()
+                except OSError as e:
+                    self._write_failed(len(rows), e)
+                    # Reopen the file on the next batch rather than keep writing to a broken handle
+                    file = files.pop(kind, None)
+                    writers.pop(kind, None)
+                    if file is not None:
+                        try:
+                            file.close()
+                        except OSError:
+                            pass
+                rows.clear()
+
+        try:
+            while True:
+                try:
+                    kind, payload = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    kind, payload = None, None
+
+                if kind in pending:
+                    pending[kind].extend(payload)
+                    pending_count += len(payload)
+                elif kind == LAP_CHUNK:
+                    try:
+                        payload.write(self.columnar_dir)
+                    except OSError as e:
+                        self._write_failed(len(payload), e)
+
+                now = time.monotonic()
+                if kind in (FLUSH, CLOSE) or pending_count >= self.flush_rows or \
+                   now - last_flush >= self.flush_interval:
+                    write_pending()
+                    pending_count = 0
+                    last_flush = now
+
+                if kind == FLUSH:
+                    payload.set()
+                elif kind == CLOSE:
+                    break
+        finally:
+            for file in files.values():
+                try:
+                    file.close()
+                except OSError:
+                    pass
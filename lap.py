@@ -1,12 +1,16 @@
 from constants import *
 
 class SectorClass:
+    __slots__ = ('sector_number', 'time', 'tire_wear')
+
     def __init__(self, sector_number):
         self.sector_number = sector_number
         self.time = 0.0
         self.tire_wear = [0.0, 0.0, 0.0, 0.0]
 
 class LapClass:
+    __slots__ = ('lap_number', 'time', 'tire_wear', 'tire_type', 'sectors')
+
     def __init__(self, lap_number):
         self.lap_number = lap_number
         self.time = 0.0
@@ -0,0 +1,117 @@
+import math
+from array import array
+from bisect import bisect_right
+
+from constants import *
+
+# Live delta to the best lap for every car. While a car drives, each lap data
+# packet adds a (lapDistance, currentLapTime) point to its current lap. When a
+# valid lap that was driven from the start line completes faster than the best
+# so far, those points become the new reference curve; the reference object is
+# replaced in one assignment, so readers never see a half-built curve.
+#
+# The delta is the car's current lap time minus the reference's time at the
+# same distance, found by bisecting the reference distances and interpolating
+# between the two neighbouring points. Positive means slower than the best.
+
+
+class DeltaReference:
+    __slots__ = ('car_index', 'lap_number', 'lap_time', 'distance', 'time')
+
+    def __init__(self, car_index, lap_number, lap_time, distance, time):
+        self.car_index = car_index
+        self.lap_number = lap_number
+        self.lap_time = lap_time
+        self.distance = distance
+        self.time = time
+
+    def time_at(self, lap_distance):
+        distance = self.distance
+        i = bisect_right(distance, lap_distance)
+        if i == 0:
+            return self.time[0]
+        if i == len(distance):
+            return self.time[-1]
+        d0 = distance[i - 1]
+        t0 = self.time[i - 1]
+        return t0 + (self.time[i] - t0) * (lap_distance - d0) / (distance[i] - d0)
+
+
+class LapDeltaTracker:
+    def __init__(self, state):
+        self.state = state
+        self.session_uid = None
+        self.reset()
+
+    def reset(self, session_uid=None):
+        self.session_uid = session_uid
+        self.lap_num = array('B', bytes(MAX_CARS))
+        self.lap_distances = [array('f') for _ in range(MAX_CARS)]
+        self.lap_times = [array('f') for _ in range(MAX_CARS)]
+        self.lap_valid = [True] * MAX_CARS
+        self.best = [None] * MAX_CARS  # Each car's own best lap
+        self.session_best = None  # Fastest lap of any car
+        self.delta = array('f', [math.nan] * MAX_CARS)
+        self.session_delta = array('f', [math.nan] * MAX_CARS)
+
+    def update(self, packet=None):
+        """Lap data hook, run after SessionState has taken the packet."""
+        state = self.state
+        if state.session_uid != self.session_uid:
+            self.reset(state.session_uid)
+        current_lap_num = state.current_lap_num
+        lap_distances = state.lap_distance
+        lap_times = state.current_lap_time
+        session_best = self.session_best
+        for car_index in state.active_cars:
+            lap_num = current_lap_num[car_index]
+            if lap_num != self.lap_num[car_index]:
+                self.complete_lap(car_index, state.last_lap_time[car_index], state.track_length)
+                self.lap_num[car_index] = lap_num
+                session_best = self.session_best
+
+            lap_distance = lap_distances[car_index]
+            lap_time = lap_times[car_index]
+            distances = self.lap_distances[car_index]
+            if lap_distance >= 0 and (not distances or lap_distance > distances[-1]):
+                distances.append(lap_distance)
+                self.lap_times[car_index].append(lap_time)
+            if state.lap_invalid[car_index]:
+                self.lap_valid[car_index] = False
+
+            # A car without a valid lap of its own still gets a delta to the session best
+            best = self.best[car_index]
+            delta = math.nan
+            if best is not None:
+                delta = self.delta[car_index] = lap_time - best.time_at(lap_distance)
+            if session_best is not None:
+                self.session_delta[car_index] = (delta if session_best is best
+                                                 else lap_time - session_best.time_at(lap_distance))
+
+    def complete_lap(self, car_index, lap_time, track_length):
+        distances = self.lap_distances[car_index]
+        times = self.lap_times[car_index]
+        valid = self.lap_valid[car_index]
+        self.lap_distances[car_index] = array('f')
+        self.lap_times[car_index] = array('f')
+        self.lap_valid[car_index] = True
+
+        # Only laps seen from the start line can serve as a reference
+        if not valid or lap_time <= 0 or len(distances) < 2 or distances[0] > LAP_TRACE_MAX_GAP:
+            return
+        best = self.best[car_index]
+        if best is not None and lap_time >= best.lap_time:
+            return
+        if track_length > distances[-1]:
+            distances.append(track_length)
+            times.append(lap_time)
+        reference = DeltaReference(car_index, self.lap_num[car_index], lap_time, distances, times)
+        self.best[car_index] = reference
+        if self.session_best is None or lap_time < self.session_best.lap_time:
+            self.session_best = reference
+
+
+def format_delta(delta):
+    if math.isnan(delta):
+        return "--.---"
+    return f"{delta:+.3f}"
@@ -0,0 +1,215 @@
+from constants import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only lap traces need it
+    np = None
+
+# Completed laps resampled onto a fixed distance grid (every `step` metres from
+# the start line), so that any two laps line up sample for sample and can be
+# compared with plain array arithmetic. Time and the analog inputs are
+# interpolated linearly; gear is taken from the last sample before each grid
+# point. All laps of one track share the grid, and a LapTraceStore keeps them
+# as rows of 2D arrays so a whole session is compared in one operation.
+
+TRACE_CHANNELS = ['time', 'speed', 'throttle', 'brake', 'steer', 'gear']
+INTERPOLATED_CHANNELS = ['speed', 'throttle', 'brake', 'steer']
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Lap traces require numpy.")
+
+
+def distance_grid(track_length, step=LAP_TRACE_STEP):
+    _require_numpy()
+    return np.arange(0.0, float(track_length), step, dtype=np.float32)
+
+
+def lap_samples(car_data, start, stop):
+    """Returns the samples [start, stop) of a CarDataBuffer (absolute sample
+    numbers) as NumPy arrays, or None once they have been overwritten."""
+    _require_numpy()
+    first = car_data.total_samples - len(car_data)
+    if start < first or stop > car_data.total_samples or stop - start < 2:
+        return None
+    return {name: car_data.window_array(name, start - first, stop - first).copy()
+            for name in ['distance_around_track', 'lap_time', *INTERPOLATED_CHANNELS, 'gear']}
+
+
+class LapTrace:
+    __slots__ = ('car_index', 'lap_number', 'lap_time', 'distance', 'channels')
+
+    def __init__(self, car_index, lap_number, lap_time, distance, channels):
+        self.car_index = car_index
+        self.lap_number = lap_number
+        self.lap_time = lap_time
+        self.distance = distance
+        self.channels = channels
+
+    def __getattr__(self, name):
+        if name == 'channels':
+            raise AttributeError(name)
+        try:
+            return self.channels[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @classmethod
+    def resample(cls, car_index, lap_number, samples, grid, track_length, lap_time=None):
+        """Builds a trace from raw lap samples, or returns None if they do not cover the lap."""
+        distance = samples['distance_around_track'].astype(np.float64)
+        # Telemetry that arrived before the first lap data of the lap still has
+        # the previous lap's distance; skip it, then keep only forward progress
+        fresh = np.nonzero(distance < track_length / 2)[0]
+        if len(fresh) == 0:
+            return None
+        keep = np.arange(fresh[0], len(distance))
+        keep = keep[distance[keep] >= 0]
+        if len(keep) < 2:
+            return None
+        forward = np.concatenate(([True], np.diff(np.maximum.accumulate(distance[keep])) > 0))
+        keep = keep[forward]
+        distance = distance[keep]
+        if distance[0] > grid[0] + LAP_TRACE_MAX_GAP or distance[-1] < grid[-1] - LAP_TRACE_MAX_GAP:
+            return None  # Joined mid-lap or lost the end of it
+
+        channels = {'time': np.interp(grid, distance, samples['lap_time'][keep]).astype(np.float32)}
+        for name in INTERPOLATED_CHANNELS:
+            channels[name] = np.interp(grid, distance, samples[name][keep]).astype(np.float32)
+        previous = np.clip(np.searchsorted(distance, grid, side='right') - 1, 0, len(distance) - 1)
+        channels['gear'] = samples['gear'][keep][previous]
+        lap_time = lap_time if lap_time else float(channels['time'][-1])
+        return cls(car_index, lap_number, lap_time, grid, channels)
+
+    @classmethod
+    def from_car(cls, car, track_length, step=LAP_TRACE_STEP):
+        """Resamples the lap `car` is completing; call it before car.started_new_lap."""
+        if car.car_data is None:
+            return None  # Never on track, so no history
+        samples = lap_samples(car.car_data, car.lap_start_sample, car.car_data.total_samples)
+        if samples is None:
+            return None
+        return cls.resample(car.car_index, car.lap.lap_number, samples, distance_grid(track_length, step),
+                            track_length, car.lap.time)
+
+
+class LapComparison:
+    """Lap `other` against `reference`; positive deltas mean other is slower."""
+
+    def __init__(self, reference, other):
+        if len(reference.distance) != len(other.distance):
+            raise ValueError("Lap traces are on different distance grids.")
+        self.reference = reference
+        self.other = other
+        self.distance = reference.distance
+        self.delta = other.time - reference.time  # seconds behind at each grid point
+
+    def time_lost(self, segment_length=LAP_TRACE_SEGMENT):
+        """Seconds lost (positive) or gained per segment_length metres of track."""
+        step = float(self.distance[1] - self.distance[0])
+        per_segment = max(1, int(round(segment_length / step)))
+        edges = np.append(self.delta[::per_segment], self.delta[-1])
+        return self.distance[::per_segment], np.diff(edges)
+
+    def worst_segments(self, count=5, segment_length=LAP_TRACE_SEGMENT):
+        starts, lost = self.time_lost(segment_length)
+        order = np.argsort(lost)[::-1][:count]
+        return [(float(starts[i]), float(lost[i])) for i in order if lost[i] > 0]
+
+    def braking_points(self, threshold=0.2):
+        """Braking points of both laps as (reference_m, other_m) for the braking zones they share."""
+        reference = braking_points(self.reference, threshold)
+        other = braking_points(self.other, threshold)
+        if len(reference) == 0 or len(other) == 0:
+            return []
+        nearest = np.clip(np.searchsorted(other, reference), 1, len(other) - 1)
+        nearest -= (reference - other[nearest - 1]) < (other[nearest] - reference)
+        return [(float(r), float(o)) for r, o in zip(reference, other[nearest])
+                if abs(o - r) < LAP_TRACE_SEGMENT]
+
+    def corner_speeds(self, window=LAP_TRACE_CORNER_WINDOW):
+        """Minimum speeds of the reference lap's corners with the other lap's speed there."""
+        corners = minimum_speeds(self.reference, window)
+        return [(float(self.distance[i]), float(self.reference.speed[i]), float(self.other.speed[i]))
+                for i in corners]
+
+
+def braking_points(trace, threshold=0.2):
+    """Distances where the brake rises through threshold."""
+    braking = trace.brake >= threshold
+    starts = np.nonzero(braking[1:] & ~braking[:-1])[0] + 1
+    return trace.distance[starts]
+
+
+def minimum_speeds(trace, window=LAP_TRACE_CORNER_WINDOW):
+    """Grid indices of local speed minima, the slowest point within +-window metres."""
+    step = float(trace.distance[1] - trace.distance[0])
+    half = max(1, int(window / step))
+    speed = trace.speed
+    padded = np.pad(speed, half, mode='edge')
+    lowest = np.lib.stride_tricks.sliding_window_view(padded, 2 * half + 1).min(axis=1)
+    minima = np.nonzero((speed == lowest) & (speed < speed.max()))[0]
+    # A flat minimum spans several points, keep the first of each run
+    return minima[np.concatenate(([True], np.diff(minima) > half))] if len(minima) else minima
+
+
+# All traces of a session; channels are stacked into (laps, grid points) arrays
+class LapTraceStore:
+    def __init__(self, step=LAP_TRACE_STEP, car_indices=None):
+        _require_numpy()
+        self.step = step
+        self.car_indices = set(car_indices) if car_indices is not None else None
+        self.traces = []
+        self.grid = None
+        self._stacked = None
+
+    def add_lap(self, car, track_length):
+        """Lap completion hook: resamples the lap the car is finishing."""
+        if self.car_indices is not None and car.car_index not in self.car_indices:
+            return None
+        trace = LapTrace.from_car(car, track_length, self.step)
+        if trace is not None:
+            self.add(trace)
+        return trace
+
+    def add(self, trace):
+        if self.grid is None:
+            self.grid = trace.distance
+        elif len(trace.distance) != len(self.grid):
+            raise ValueError("Lap trace is on a different distance grid, use one store per track.")
+        self.traces.append(trace)
+        self._stacked = None
+
+    def laps(self, car_index=None):
+        return [trace for trace in self.traces if car_index is None or trace.car_index == car_index]
+
+    def stacked(self, channel):
+        """One channel of every stored lap as a (laps, grid points) array."""
+        if self._stacked is None:
+            self._stacked = {}
+        if channel not in self._stacked:
+            self._stacked[channel] = np.stack([trace.channels[channel] for trace in self.traces])
+        return self._stacked[channel]
+
+    def best(self, car_index=None):
+        laps = self.laps(car_index)
+        return min(laps, key=lambda trace: trace.lap_time) if laps else None
+
+    def compare(self, reference, other):
+        return LapComparison(reference, other)
+
+    def deltas_to_best(self):
+        """Time delta of every stored lap to the session best at every grid point."""
+        if not self.traces:
+            return None
+        times = self.stacked('time')
+        best = int(np.argmin(times[:, -1]))
+        return times - times[best]
+
+    def time_lost_to_best(self, segment_length=LAP_TRACE_SEGMENT):
+        """(segment starts, seconds lost per lap and segment) against the session best."""
+        deltas = self.deltas_to_best()
+        per_segment = max(1, int(round(segment_length / self.step)))
+        edges = np.concatenate((deltas[:, ::per_segment], deltas[:, -1:]), axis=1)
+        return self.grid[::per_segment], np.diff(edges, axis=1)
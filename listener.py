@@ -6,93 +6,180 @@ import csv
 
 from datetime import datetime
 from constants import *
-from packet_parsers import F1PacketParser
+from packet_bus import PacketBus
 
-from car import Car
+from session_state import SessionState
+from lap_delta import LapDeltaTracker
+from session_history import SessionHistoryStore
+from race_analysis_logic import RaceStrategyAdvisor
 from data_logging import TelemetryLogger
 
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-sock.bind((UDP_IP, UDP_PORT))
-print(f"Listening for F1 25 telemetry on port {UDP_PORT}...")
+def open_socket(ip=UDP_IP, port=UDP_PORT, rcvbuf=UDP_RCVBUF, blocking=True):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if rcvbuf:
+        # The OS may clamp this (net.core.rmem_max on Linux), so report what we got
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.setblocking(blocking)
+    sock.bind((ip, port))
+    actual_rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    print(f"Listening for F1 25 telemetry on port {port} (receive buffer {actual_rcvbuf} bytes)...")
+    return sock
 
-data_logger = TelemetryLogger()
-parser = F1PacketParser()
+# Everything done with a datagram after it is received: recording, decoding into
+# the session state and logging. Shared by the blocking and asyncio listeners.
+# Every received datagram is handed to recorder.write() when a recorder is given.
+# Decoding goes through a PacketBus, so packet types nothing subscribes to are
+# dropped after a one byte peek; other components can subscribe via .bus.
+# Without a logger, the pipeline creates its own columnar TelemetryLogger.
+# With a gui, the player's tyre wear is posted to it after every damage packet.
+# The player's practice and race laps feed a RaceStrategyAdvisor (.strategy);
+# with a gui, the projected end of the race stint is posted as a strategy tip.
+# With stats (a telemetry_stats.PipelineStats), every datagram is counted and timed.
+# With lap_traces (a lap_traces.LapTraceStore), completed laps are resampled into it;
+# laps it rejects are counted in lap_trace_errors. With a gui too, the segment where the
+# player's lap lost most time to their best lap is posted as a lap tip.
+# With live (a live_server.LiveTelemetryServer), the session state is served to dashboards.
+# With relay (a udp_relay.UdpRelay), every datagram is forwarded before it is decoded.
+# With catalogue (a session_catalogue.SessionCatalogue), sessions, laps and stints are indexed.
+class TelemetryPipeline:
+    def __init__(self, recorder=None, logger=None, gui=None, stats=None, lap_traces=None, live=None,
+                 relay=None, catalogue=None):
+        self.recorder = recorder
+        self.relay = relay
+        self.lap_traces = lap_traces
+        self.lap_trace_errors = 0
+        self.logger = logger if logger is not None else TelemetryLogger(columnar=True)
+        self.last_log_time = 0
+        self.state = SessionState(on_lap_completed=self.log_completed_lap)
+        self.stats = stats
+        if stats is not None:
+            stats.add_gauge("log_queue_depth", self.logger.queue.qsize)
+            stats.add_gauge("log_dropped_rows", lambda: self.logger.dropped_rows)
+            if lap_traces is not None:
+                stats.add_gauge("lap_trace_errors", lambda: self.lap_trace_errors)
+        self.bus = PacketBus(stats)
+        self.bus.subscribe(tuple(self.state.handlers), self.state.update, name="SessionState.update")
+        self.lap_delta = LapDeltaTracker(self.state)
+        self.strategy = RaceStrategyAdvisor()
+        self.bus.subscribe(2, self.lap_delta.update, name="LapDeltaTracker.update")
+        self.catalogue = catalogue
+        self.rig = None  # Rig name recorded in the catalogue, set by the multi-rig listener
+        self.session_history = SessionHistoryStore(self.catalogue_history if catalogue is not None else None)
+        self.bus.subscribe(11, self.session_history.update, name="SessionHistoryStore.update")
+        if catalogue is not None:
+            self.bus.subscribe(1, self.catalogue_session, name="SessionCatalogue.record_session")
+        self.bus.subscribe(6, self.log_sample, name="TelemetryLogger.log_sample")
+        if live is not None:
+            live.attach(self.state, self.lap_delta)
+        self.gui = gui
+        if gui is not None:
+            self.bus.subscribe(10, self.post_to_gui, name="TelemetryGUI.post")
 
-def udp_listener(gui):
-    last_log_time = 0
+    def log_completed_lap(self, car):
+        if self.lap_traces is not None:
+            try:
+                trace = self.lap_traces.add_lap(car, self.state.track_length)
+            except ValueError as e:
+                # e.g. a lap from a different track on the store's distance grid
+                trace = None
+                self.lap_trace_errors += 1
+                if DEBUG_PRINT:
+                    print(f"Lap trace for car {car.car_index} rejected: {e}")
+            if trace is not None and self.gui is not None and car.car_index == self.state.player_index:
+                self.post_lap_tip(trace)
+        if car.car_index == self.state.player_index:
+            self.logger.log_lap(car)
+            self.add_strategy_lap(car)
 
-    player_car = Car(-1)
-    player_index = 0
+    def add_strategy_lap(self, car):
+        # The lap's own tire_type is only set on the lap the compound changed, so
+        # take the car's current compound; lap 0 is the placeholder before the first lap
+        lap_number = car.lap.lap_number
+        tire_type = self.state.tire_type[car.car_index]
+        if lap_number <= 0 or not tire_type:
+            return
+        session_type = self.state.session_type
+        tire_wear = self.state.car_tire_wear(car.car_index)
+        if session_type in PRACTICE_SESSION_TYPES:
+            self.strategy.add_practice_lap(lap_number, tire_type, tire_wear)
+        elif session_type in RACE_SESSION_TYPES:
+            self.strategy.add_race_lap(lap_number, tire_type, tire_wear)
+            projection = self.strategy.project_stint()
+            if self.gui is not None and projection is not None:
+                self.gui.post({"Strategy Tip": f"Tyres projected to last until lap {projection.end_lap:.0f}"})
 
-    track_length = 5000  # Default fallback value
-    distance_around_track = 0.0
+    def post_lap_tip(self, trace):
+        best = self.lap_traces.best(trace.car_index)
+        if best is None or best is trace:
+            return
+        worst = self.lap_traces.compare(best, trace).worst_segments(1)
+        if worst:
+            start, lost = worst[0]
+            self.gui.post({"Lap Tip": f"Lost {lost:.2f}s to your best lap at {start:.0f}-{start + LAP_TRACE_SEGMENT:.0f}m"})
 
-    while True:
-        data, _ = sock.recvfrom(2048)
+    def catalogue_session(self, packet):
+        session = packet.record('session')
+        self.catalogue.record_session(packet.session_uid, session.trackId, session.sessionType,
+                                       rig=self.rig, logger=self.logger)
+
+    def catalogue_history(self, change):
+        self.catalogue.record_history_change(self.session_history.session_uid, change, self.session_history)
+
+    def log_sample(self, packet):
+        state = self.state
+        player_index = state.player_index
+        self.logger.log_sample(
+            state.player_car, state.session_uid, packet.session_time, state.current_lap_num[player_index],
+            state.current_lap_time[player_index], state.lap_distance[player_index]
+        )
+        self.last_log_time = time.time()
+
+    def post_to_gui(self, packet):
+        front_left, front_right, rear_left, rear_right = self.state.car_tire_wear(self.state.player_index)
+        self.gui.post({"FL": front_left, "FR": front_right, "RL": rear_left, "RR": rear_right})
+
+    def process_batch(self, datagrams):
+        for data in datagrams:
+            self.process(data)
+
+    def process(self, data):
+        state = self.state
+        if self.recorder is not None:
+            self.recorder.write(data)
+        if self.relay is not None:
+            self.relay.forward(data)
         if len(data) < HEADER_SIZE:
-            continue  # Ignore incomplete headers
+            if self.stats is not None:
+                self.stats.short_packets += 1
+            return  # Ignore incomplete headers
 
-        try:
-            parse_result = parser.parse_packet(data, car_index=player_index)
-        except (ValueError, struct.error) as e:
-            print(f"Skipping packet due to error: {e}")
-            continue
-
-        parse_result = parser.parse_packet(data, car_index=player_index)
-        header = parse_result['header']
-        packet_id = header.m_packetId
-        player_index = header.m_playerCarIndex
-
-        # Initialize player car if not already set
-        if player_car.car_index != player_index:
-            player_car = Car(player_index)
-
-        if packet_id == 1:
-            session_data = parser.parse_session(header, data)
-            track_length = session_data["trackLength"]
-        elif packet_id == 2:
-            lap_info = parser.parse_lap_data(header, data, car_index=player_index)['lapData']
-            lap_time = lap_info['currentLapTimeInMS'] / 1000.0
-            distance_around_track = lap_info['lapDistance']
-            player_car.update_lap_time(lap_time)
-            if lap_info['sector'] != player_car.sector_number:
-                player_car.started_new_sector(lap_info['sector'])
-            if lap_info['currentLapNum'] != player_car.lap.lap_number:
-                data_logger.log_lap(player_car)
-                player_car.started_new_lap(lap_info['currentLapNum'])
-        elif packet_id == 10:
-            try:
-                car_damage_data = parser.parse_car_damage(header, data, car_index=player_index)
-                current_tire_wear = car_damage_data['carDamageData'][0]['tyresWear']
-                player_car.update_car_damage(current_tire_wear)
-            except struct.error:
-                continue
-        elif packet_id == 7:
-            try:
-                car_status = parser.parse_car_status(header, data, car_index=player_index)
-                tire_type = car_status['carStatusData'][0]['visualTyreCompound']
-                player_car.update_car_status(tire_type)
-            except struct.error:
-                continue
-        elif packet_id == 6:
-            try:
-                car_telemetry_data = parser.parse_car_telemetry(header, data, car_index=player_index)
-                data = car_telemetry_data['carTelemetryData']
-                player_car.update_car_inputs(
-                    data['speed'], data['throttle'], data['brake'],
-                    data['steer'], data['clutch'], data['gear'], 
-                    distance_around_track, track_length
-                )
-                now = time.time()
-                last_log_time = now
-            except struct.error:
-                continue
+        if self.stats is None:
+            self.bus.publish(data)
+        else:
+            start = time.perf_counter_ns()
+            self.bus.publish(data)
+            self.stats.record(data, time.perf_counter_ns() - start)
 
         if DEBUG_PRINT:
-            print(f"Distance: {distance_around_track:.2f}m | Track Length: {track_length}m")
+            print(f"Distance: {state.lap_distance[state.player_index]:.2f}m | Track Length: {state.track_length}m")
 
         now = time.time()
-        if now - last_log_time > LOG_INTERVAL:
+        if now - self.last_log_time > LOG_INTERVAL:
             # Log the current lap data
-            data_logger.log_car_status(player_car)
-            last_log_time = now
+            self.logger.log_car_status(state.player_car)
+            self.last_log_time = now
+
+# source is anything with a socket-like recvfrom(), e.g. a capture.ReplaySource.
+def udp_listener(gui, source=None, recorder=None, stats=None, live=None, relay=None, catalogue=None,
+                 logger=None, lap_traces=None):
+    sock = source if source is not None else open_socket()
+    pipeline = TelemetryPipeline(recorder, logger, gui=gui, stats=stats, lap_traces=lap_traces, live=live,
+                                 relay=relay, catalogue=catalogue)
+
+    while True:
+        try:
+            data, _ = sock.recvfrom(UDP_MAX_PACKET_SIZE)
+        except EOFError:
+            print("Replay finished.")
+            break
+        pipeline.process(data)
@@ -0,0 +1,294 @@
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import struct
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from constants import *
+
+# Live telemetry for any number of dashboards. The server runs its own asyncio
+# loop on a daemon thread and never touches the ingest path: instead of the
+# listener pushing updates, every client task reads the SessionState arrays
+# itself at the client's own rate. Snapshots are built at most once per
+# LIVE_SNAPSHOT_INTERVAL and shared by all clients.
+#
+# A WebSocket client (ws://host:port/ws?rate=10) first gets the full state and
+# then only the fields that changed since the last frame it was sent. When a
+# client's socket still holds more than LIVE_CLIENT_BUFFER_LIMIT unsent bytes,
+# frames are skipped rather than queued; the next frame it does get is a delta
+# against what it last received, so it catches up with one message. Plain HTTP
+# GET /state returns the current snapshot as JSON.
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B65"
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+def _rounded(value, digits):
+    return None if math.isnan(value) else round(value, digits)
+
+
+def state_snapshot(state, lap_delta=None):
+    """Plain dict of the session and of every active car, rounded so that noise
+    below display precision does not show up as a change."""
+    cars = []
+    for i in range(min(state.num_active_cars, MAX_CARS)):
+        best_lap_time = state.performance.best_lap_time[i]
+        car = {
+            'position': state.position[i],
+            'lap': state.current_lap_num[i],
+            'sector': state.sector[i],
+            'lap_distance': round(state.lap_distance[i], 1),
+            'lap_time': round(state.current_lap_time[i], 3),
+            'last_lap_time': round(state.last_lap_time[i], 3),
+            'best_lap_time': round(best_lap_time, 3) if best_lap_time < math.inf else None,
+            'speed': state.speed[i],
+            'throttle': round(state.throttle[i], 2),
+            'brake': round(state.brake[i], 2),
+            'gear': state.gear[i],
+            'tyre': TYRE_COMPOUND_MAP.get(state.tire_type[i], 'Unknown'),
+            'tyre_age': state.tire_age_laps[i],
+            'tyre_wear': [round(wear, 1) for wear in state.car_tire_wear(i)],
+        }
+        if lap_delta is not None:
+            car['delta'] = _rounded(lap_delta.delta[i], 3)
+        cars.append(car)
+    return {
+        'session': {
+            'session_uid': state.session_uid,
+            'track_length': state.track_length,
+            'player_index': state.player_index,
+            'num_active_cars': state.num_active_cars,
+        },
+        'cars': cars,
+    }
+
+
+def snapshot_delta(previous, current):
+    """Only what changed from previous to current, None if nothing did."""
+    delta = {}
+    session = {key: value for key, value in current['session'].items() if previous['session'].get(key) != value}
+    if session:
+        delta['session'] = session
+    cars = {}
+    previous_cars = previous['cars']
+    for i, car in enumerate(current['cars']):
+        if i >= len(previous_cars):
+            cars[str(i)] = car
+            continue
+        old = previous_cars[i]
+        changed = {key: value for key, value in car.items() if old.get(key) != value}
+        if changed:
+            cars[str(i)] = changed
+    if cars:
+        delta['cars'] = cars
+    if len(previous_cars) > len(current['cars']):
+        delta['removed'] = list(range(len(current['cars']), len(previous_cars)))
+    return delta or None
+
+
+def websocket_frame(payload, opcode=OPCODE_TEXT):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_websocket_frame(reader):
+    """Returns (opcode, payload) of the next client frame; client frames are always masked."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+
+class LiveClient:
+    __slots__ = ('address', 'rate', 'last_sent', 'frames', 'dropped', 'bytes')
+
+    def __init__(self, address, rate):
+        self.address = address
+        self.rate = rate
+        self.last_sent = None
+        self.frames = 0
+        self.dropped = 0  # Frames skipped because the client was not keeping up
+        self.bytes = 0
+
+
+class LiveTelemetryServer:
+    def __init__(self, host='127.0.0.1', port=LIVE_PORT, max_rate=LIVE_CLIENT_RATE):
+        self.host = host
+        self.port = port
+        self.max_rate = max_rate
+        self.state = None
+        self.lap_delta = None
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.start_error = None  # Exception from binding the port, raised by start()
+        self._snapshot = None
+        self._snapshot_time = 0.0
+
+    def attach(self, state, lap_delta=None):
+        """Publishes the given SessionState (and LapDeltaTracker); called by TelemetryPipeline."""
+        self.state = state
+        self.lap_delta = lap_delta
+        self._snapshot = None
+
+    def snapshot(self):
+        now = time.monotonic()
+        if self._snapshot is None or now - self._snapshot_time >= LIVE_SNAPSHOT_INTERVAL:
+            if self.state is None:
+                return {'session': {}, 'cars': []}
+            self._snapshot = state_snapshot(self.state, self.lap_delta)
+            self._snapshot_time = now
+        return self._snapshot
+
+    def start(self):
+        """Starts serving from a daemon thread, returns once the port is bound.
+        Raises the OSError from binding when the port cannot be used."""
+        ready = threading.Event()
+        threading.Thread(target=self._run, args=(ready,), name="LiveTelemetryServer", daemon=True).start()
+        ready.wait()
+        if self.start_error is not None:
+            raise self.start_error
+        print(f"Live telemetry on ws://{self.host}:{self.port}/ws and http://{self.host}:{self.port}/state")
+        return self
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except Exception as e:
+            self.start_error = e
+            self.loop.close()
+            return
+        finally:
+            ready.set()
+        try:
+            self.loop.run_until_complete(self.server.serve_forever())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Connected dashboards still have handlers running; let them unwind before the loop goes
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def stop(self):
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                await self._respond(writer, 405, b'')
+                return
+            url = urlsplit(request_line[1])
+            if url.path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                try:
+                    rate = float(parse_qs(url.query).get('rate', [self.max_rate])[0])
+                except ValueError:
+                    rate = math.nan
+                if not math.isfinite(rate) or 'sec-websocket-key' not in headers:
+                    await self._respond(writer, 400, b'')
+                    return
+                await self._serve_websocket(reader, writer, headers, min(max(rate, 0.1), self.max_rate))
+            elif url.path == '/state':
+                await self._respond(writer, 200, json.dumps(self.snapshot()).encode(), 'application/json')
+            elif url.path == '/clients':
+                await self._respond(writer, 200, json.dumps(self.client_stats()).encode(), 'application/json')
+            else:
+                await self._respond(writer, 404, b'')
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, body, content_type='text/plain'):
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _serve_websocket(self, reader, writer, headers, rate):
+        accept = base64.b64encode(hashlib.sha1(headers['sec-websocket-key'].encode() + WEBSOCKET_GUID).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+
+        client = LiveClient(writer.get_extra_info('peername'), rate)
+        self.clients.add(client)
+        receiver = asyncio.ensure_future(self._read_client(reader, writer))
+        try:
+            while not receiver.done():
+                self._send_frame(client, writer)
+                await asyncio.wait([receiver], timeout=1.0 / client.rate)
+        finally:
+            self.clients.discard(client)
+            if receiver.done() and not receiver.cancelled():
+                receiver.exception()  # Client went away, nothing to report
+            receiver.cancel()
+
+    def _send_frame(self, client, writer):
+        if writer.transport.get_write_buffer_size() > LIVE_CLIENT_BUFFER_LIMIT:
+            client.dropped += 1
+            return
+        snapshot = self.snapshot()
+        previous = client.last_sent
+        if previous is None or previous['session'].get('session_uid') != snapshot['session'].get('session_uid'):
+            message = {'type': 'full', **snapshot}
+        else:
+            changes = snapshot_delta(previous, snapshot)
+            if changes is None:
+                return
+            message = {'type': 'delta', **changes}
+        frame = websocket_frame(json.dumps(message, separators=(',', ':')).encode())
+        writer.write(frame)
+        client.last_sent = snapshot
+        client.frames += 1
+        client.bytes += len(frame)
+
+    @staticmethod
+    async def _read_client(reader, writer):
+        while True:
+            opcode, payload = await read_websocket_frame(reader)
+            if opcode == OPCODE_CLOSE:
+                writer.write(websocket_frame(payload[:2], OPCODE_CLOSE))
+                return
+            if opcode == OPCODE_PING:
+                writer.write(websocket_frame(payload, OPCODE_PONG))
+
+    def client_stats(self):
+        return [{'address': str(client.address), 'rate': client.rate, 'frames': client.frames,
+                 'dropped': client.dropped, 'bytes': client.bytes} for client in list(self.clients)]
@@ -1,9 +1,135 @@
 
 from telemetry_gui import TelemetryGUI
 from listener import udp_listener
+from async_listener import async_udp_listener
+from capture import CaptureWriter, ReplaySource
+from shm_pipeline import run_shm_pipeline
+from multi_rig import run_multi_rig
+from telemetry_stats import PipelineStats
+from live_server import LiveTelemetryServer
+from udp_relay import UdpRelay, relay_listener, parse_destination, is_local_address
+from session_catalogue import SessionCatalogue
+from data_logging import TelemetryLogger
+from lap_traces import LapTraceStore
+from constants import STATS_PORT, STATS_INTERVAL, MULTI_RIG_WORKERS, LIVE_PORT, CATALOGUE_PATH
+import argparse
+import multiprocessing
 import threading
 
+
+def relay_destination(text):
+    try:
+        destination = parse_destination(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    if is_local_address(destination.address):
+        raise argparse.ArgumentTypeError(f"{text!r} is the listener's own port and would relay packets to itself")
+    return destination
+
+
 if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="F1 25 telemetry listener")
+    arg_parser.add_argument('--record', metavar='PATH', help="Capture raw packets to PATH.f1cap")
+    arg_parser.add_argument('--replay', metavar='PATH', help="Replay a .f1cap capture instead of listening")
+    arg_parser.add_argument('--speed', type=float, default=1.0,
+                            help="Replay speed multiplier, 0 for as fast as possible")
+    arg_parser.add_argument('--asyncio', action='store_true',
+                            help="Receive with the asyncio listener and batched, preallocated buffers")
+    arg_parser.add_argument('--processes', action='store_true',
+                            help="Receive and decode in separate processes over a shared-memory ring")
+    arg_parser.add_argument('--stats', nargs='?', type=int, const=STATS_PORT, metavar='PORT',
+                            help=f"Count and time every packet, served as JSON on localhost:PORT ({STATS_PORT})")
+    arg_parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL,
+                            help="Seconds between printed stats reports with --stats, 0 to disable")
+    arg_parser.add_argument('--live', nargs='?', type=int, const=LIVE_PORT, metavar='PORT',
+                            help=f"Serve live state to dashboards on ws://localhost:PORT/ws ({LIVE_PORT})")
+    arg_parser.add_argument('--relay', nargs='+', type=relay_destination, metavar='HOST:PORT[:IDS]',
+                            help="Forward every datagram unchanged to these UDP destinations, "
+                                 "optionally only packet ids IDS (comma separated)")
+    arg_parser.add_argument('--relay-only', action='store_true',
+                            help="Headless relay mode: forward to the --relay destinations without decoding")
+    arg_parser.add_argument('--catalogue', nargs='?', const=CATALOGUE_PATH, metavar='PATH',
+                            help=f"Index sessions, laps and stints in the SQLite catalogue at PATH ({CATALOGUE_PATH})")
+    arg_parser.add_argument('--lap-traces', nargs='*', type=int, metavar='CAR',
+                            help="Keep completed laps of these car indices (every car when none are given) as "
+                                 "distance-aligned traces and show where the player lost time to their best lap; "
+                                 "needs numpy")
+    arg_parser.add_argument('--rigs', nargs='+', type=int, metavar='PORT',
+                            help="Headless multi-rig mode: receive on every PORT, one session per rig and session UID")
+    arg_parser.add_argument('--workers', type=int, default=MULTI_RIG_WORKERS,
+                            help="Session worker processes with --rigs")
+    args = arg_parser.parse_args()
+    if args.relay_only and not args.relay:
+        arg_parser.error("--relay-only needs --relay destinations")
+    if args.lap_traces is not None:
+        try:
+            import numpy
+        except ImportError:
+            arg_parser.error("--lap-traces needs numpy")
+
+    if args.rigs:
+        try:
+            run_multi_rig(args.rigs, args.workers, catalogue_path=args.catalogue)
+        except KeyboardInterrupt:
+            pass
+        raise SystemExit
+    if args.relay_only:
+        try:
+            relay_listener(args.relay)
+        except KeyboardInterrupt:
+            pass
+        raise SystemExit
+
+    source = ReplaySource(args.replay, speed=args.speed) if args.replay else None
+    use_processes = args.processes and source is None
+    # In process mode the decoder process owns the recorder
+    recorder = CaptureWriter(args.record) if args.record and not use_processes else None
+    stop_event = multiprocessing.Event()
+    stats = None  # In process mode the decoder process counts and serves the stats
+    if args.stats is not None and not use_processes:
+        stats = PipelineStats()
+        stats.serve(args.stats)
+        if args.stats_interval > 0:
+            stats.start_reporter(args.stats_interval)
+    live = None  # In process mode the decoder process runs the live server
+    if args.live is not None and not use_processes:
+        live = LiveTelemetryServer(port=args.live).start()
+    relay = UdpRelay(args.relay) if args.relay and not use_processes else None
+    catalogue = SessionCatalogue(args.catalogue) if args.catalogue and not use_processes else None
+    # In process mode the decoder process creates its own logger and lap trace store
+    logger = TelemetryLogger(columnar=True) if not use_processes else None
+    lap_traces = None
+    if args.lap_traces is not None and not use_processes:
+        lap_traces = LapTraceStore(car_indices=args.lap_traces or None)
+
     gui = TelemetryGUI()
-    threading.Thread(target=udp_listener, args=(gui,), daemon=True).start()
-    gui.run()
+    if use_processes:
+        listener_thread = threading.Thread(target=run_shm_pipeline, args=(gui, args.record),
+                                           kwargs={'stop_event': stop_event, 'relay_destinations': args.relay,
+                                                   'catalogue_path': args.catalogue, 'live_port': args.live,
+                                                   'stats_port': args.stats, 'stats_interval': args.stats_interval,
+                                                   'lap_traces': args.lap_traces},
+                                           daemon=True)
+    elif args.asyncio and source is None:
+        listener_thread = threading.Thread(target=async_udp_listener, args=(gui, recorder),
+                                           kwargs={'stats': stats, 'live': live, 'relay': relay,
+                                                   'catalogue': catalogue, 'logger': logger,
+                                                   'lap_traces': lap_traces}, daemon=True)
+    else:
+        listener_thread = threading.Thread(target=udp_listener, args=(gui, source, recorder),
+                                           kwargs={'stats': stats, 'live': live, 'relay': relay,
+                                                   'catalogue': catalogue, 'logger': logger,
+                                                   'lap_traces': lap_traces}, daemon=True)
+    listener_thread.start()
+    try:
+        gui.run()
+    finally:
+        stop_event.set()
+        if use_processes:
+            listener_thread.join()
+        if recorder is not None:
+            recorder.close()
+        if catalogue is not None:
+            catalogue.close()
+        if logger is not None:
+            logger.close()
@@ -0,0 +1,220 @@
+import multiprocessing
+import os
+import selectors
+import socket
+import struct
+import time
+
+from constants import *
+from packet_views import SESSION_UID_STRUCT, SESSION_UID_OFFSET
+from shm_pipeline import SharedPacketRing, READER_IDLE_SLEEP
+
+# Ingest for several sim rigs on one host. A receiver binds any number of ports
+# and tags every datagram with the rig it came from (source IPv4 address and
+# port). Each (rig, m_sessionUID) pair is a session of its own and is pinned to
+# one of several worker processes, the one with the fewest sessions when it is
+# first seen. The receiver writes the tagged datagram into that worker's own
+# shared-memory ring, so a worker busy with one rig never delays the others.
+# The receiver forgets a pairing that has been silent for the session timeout,
+# so the worker session counts follow the sessions the workers still hold.
+#
+# A worker keeps a fully separate TelemetryPipeline (SessionState, cars, lap
+# delta, logger writing under its own directory) per session, and closes
+# sessions that have been silent for MULTI_RIG_SESSION_TIMEOUT seconds.
+
+SOURCE_HEADER = struct.Struct('<4sH')  # source IPv4 address, source port
+
+
+def rig_name(address, port):
+    return f"{socket.inet_ntoa(address)}_{port}"
+
+
+class RigSession:
+    def __init__(self, rig, session_uid, log_dir, catalogue=None):
+        from data_logging import TelemetryLogger
+        from listener import TelemetryPipeline
+
+        self.rig = rig
+        self.session_uid = session_uid
+        self.logger = TelemetryLogger(os.path.join(log_dir, f"rig_{rig}", f"session_{session_uid}"))
+        self.pipeline = TelemetryPipeline(logger=self.logger, catalogue=catalogue)
+        self.pipeline.rig = rig
+        self.packets = 0
+        self.last_packet_time = time.monotonic()
+
+    def process(self, data):
+        self.packets += 1
+        self.last_packet_time = time.monotonic()
+        self.pipeline.process(data)
+
+    def close(self):
+        self.logger.close()
+
+
+# Worker side consumer: demuxes tagged datagrams into RigSessions, which share
+# the worker's SessionCatalogue when a catalogue_path is given
+class RigSessionConsumer:
+    def __init__(self, log_dir="logs", session_timeout=MULTI_RIG_SESSION_TIMEOUT, catalogue_path=None):
+        from session_catalogue import SessionCatalogue
+
+        self.log_dir = log_dir
+        self.session_timeout = session_timeout
+        self.catalogue = SessionCatalogue(catalogue_path) if catalogue_path else None
+        self.sessions = {}  # (source address, source port, session uid) -> RigSession
+        self.last_expiry_check = time.monotonic()
+
+    def process_batch(self, batch):
+        sessions = self.sessions
+        for tagged in batch:
+            address, port = SOURCE_HEADER.unpack_from(tagged, 0)
+            data = memoryview(tagged)[SOURCE_HEADER.size:]
+            if len(data) < HEADER_SIZE:
+                continue
+            session_uid = SESSION_UID_STRUCT.unpack_from(data, SESSION_UID_OFFSET)[0]
+            key = (address, port, session_uid)
+            session = sessions.get(key)
+            if session is None:
+                session = sessions[key] = RigSession(rig_name(address, port), session_uid, self.log_dir,
+                                                           self.catalogue)
+            session.process(data)
+        self.expire_sessions()
+
+    def expire_sessions(self):
+        now = time.monotonic()
+        if now - self.last_expiry_check < 1.0:
+            return
+        self.last_expiry_check = now
+        for key, session in list(self.sessions.items()):
+            if now - session.last_packet_time > self.session_timeout:
+                session.close()
+                del self.sessions[key]
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions.clear()
+        if self.catalogue is not None:
+            self.catalogue.close()
+
+
+def rig_worker_main(ring_name, stop_event, consumer_class=RigSessionConsumer, consumer_args=()):
+    ring = SharedPacketRing(ring_name)
+    reader = ring.reader()
+    consumer = consumer_class(*consumer_args)
+    try:
+        while not stop_event.is_set():
+            batch = reader.read_batch()
+            if batch:
+                consumer.process_batch(batch)
+            else:
+                consumer.expire_sessions()
+                time.sleep(READER_IDLE_SLEEP)
+            reader.report_overruns("Rig worker")
+    finally:
+        if reader.lost_packets:
+            print(f"Rig worker lost {reader.lost_packets} packets to ring overruns")
+        consumer.close()
+        ring.close()
+
+
+class MultiRigReceiver:
+    def __init__(self, rings, ports=(UDP_PORT,), ip=UDP_IP, sockets=(), rcvbuf=UDP_RCVBUF,
+                 session_timeout=MULTI_RIG_SESSION_TIMEOUT):
+        from listener import open_socket
+
+        self.rings = rings
+        self.sockets = list(sockets) + [open_socket(ip, port, rcvbuf, blocking=False) for port in ports]
+        self.selector = selectors.DefaultSelector()
+        for sock in self.sockets:
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ)
+        self.assignments = {}  # (source address, session uid) -> worker index
+        self.last_seen = {}  # (source address, session uid) -> time of its last datagram
+        self.worker_sessions = [0] * len(rings)
+        self.session_timeout = session_timeout
+        self.last_expiry_check = time.monotonic()
+        self.packets = {}  # source address -> datagrams received
+        # One reused receive buffer, the datagram lands right after the source tag
+        self.buffer = bytearray(SOURCE_HEADER.size + UDP_MAX_PACKET_SIZE)
+        self.view = memoryview(self.buffer)
+
+    def worker_for(self, source, session_uid, now=None):
+        key = (source, session_uid)
+        self.last_seen[key] = now if now is not None else time.monotonic()
+        worker = self.assignments.get(key)
+        if worker is None:
+            worker = min(range(len(self.rings)), key=self.worker_sessions.__getitem__)
+            self.assignments[key] = worker
+            self.worker_sessions[worker] += 1
+        return worker
+
+    def expire_assignments(self, now):
+        if now - self.last_expiry_check < 1.0:
+            return
+        self.last_expiry_check = now
+        for key, last_seen in list(self.last_seen.items()):
+            if now - last_seen > self.session_timeout:
+                del self.last_seen[key]
+                self.worker_sessions[self.assignments.pop(key)] -= 1
+
+    def receive(self, timeout=0.5):
+        """Drains every readable socket once, returns the number of datagrams forwarded."""
+        forwarded = 0
+        datagram = self.view[SOURCE_HEADER.size:]
+        ready = self.selector.select(timeout)
+        now = time.monotonic()
+        for key, _ in ready:
+            sock = key.fileobj
+            while True:
+                try:
+                    size, source = sock.recvfrom_into(datagram)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionResetError:
+                    continue  # Windows reports ICMP port unreachable on UDP sockets
+                if size < HEADER_SIZE:
+                    continue
+                self.packets[source] = self.packets.get(source, 0) + 1
+                session_uid = SESSION_UID_STRUCT.unpack_from(datagram, SESSION_UID_OFFSET)[0]
+                ring = self.rings[self.worker_for(source, session_uid, now)]
+                SOURCE_HEADER.pack_into(self.buffer, 0, socket.inet_aton(source[0]), source[1])
+                ring.write(self.view[:SOURCE_HEADER.size + size])
+                forwarded += 1
+        self.expire_assignments(now)
+        return forwarded
+
+    def close(self):
+        self.selector.close()
+        for sock in self.sockets:
+            sock.close()
+
+
+def run_multi_rig(ports=(UDP_PORT,), workers=MULTI_RIG_WORKERS, log_dir="logs", stop_event=None,
+                  consumer_class=RigSessionConsumer, consumer_args=None, ip=UDP_IP, catalogue_path=None):
+    """Receives on every port and runs `workers` session worker processes until stop_event is set.
+
+    The receiver runs in the calling thread; each worker process gets its own ring
+    and a consumer_class(*consumer_args), by default a RigSessionConsumer(log_dir)
+    indexing into the catalogue at catalogue_path when one is given.
+    """
+    if consumer_args is None:
+        consumer_args = (log_dir, MULTI_RIG_SESSION_TIMEOUT, catalogue_path)
+    stop_event = stop_event if stop_event is not None else multiprocessing.Event()
+    rings = [SharedPacketRing(slot_size=SOURCE_HEADER.size + UDP_MAX_PACKET_SIZE) for _ in range(workers)]
+    processes = [multiprocessing.Process(target=rig_worker_main,
+                                         args=(ring.name, stop_event, consumer_class, consumer_args),
+                                         name=f"F1TelemetryRigWorker{i}", daemon=True)
+                 for i, ring in enumerate(rings)]
+    for process in processes:
+        process.start()
+    receiver = MultiRigReceiver(rings, ports, ip)
+    try:
+        while not stop_event.is_set():
+            receiver.receive()
+    finally:
+        stop_event.set()
+        receiver.close()
+        for process in processes:
+            process.join(timeout=5)
+        for ring in rings:
+            ring.close()
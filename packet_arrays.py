@@ -0,0 +1,59 @@
+from packet_layouts import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only the vectorized mode needs it
+    np = None
+
+# Multi-car packet ids decoded as record arrays, with the result key used by the dict parsers
+CAR_ARRAY_FIELDS = {
+    packet_id: (key, RECORD_FIELDS[packet_id]['car'])
+    for packet_id, key in [
+        (0, 'carMotionData'), (2, 'lapData'), (4, 'participants'),
+        (6, 'carTelemetryData'), (7, 'carStatusData'), (10, 'carDamageData'),
+    ]
+}
+
+_NUMPY_CODES = {'B': 'u1', 'b': 'i1', 'H': 'u2', 'h': 'i2', 'I': 'u4', 'i': 'i4',
+                'Q': 'u8', 'q': 'i8', 'f': 'f4', 'd': 'f8'}
+
+
+def _numpy_code(code):
+    if code.endswith('s'):
+        return 'S' + code[:-1]
+    return '<' + _NUMPY_CODES[code]
+
+
+def dtype_from_layout(layout, fields):
+    names, formats, offsets = [], [], []
+    for name, code, count, offset in field_offsets(layout, fields):
+        names.append(name)
+        formats.append(_numpy_code(code) if count == 1 else (_numpy_code(code), (count,)))
+        offsets.append(offset)
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': layout.size})
+
+
+def build_car_dtypes(layouts):
+    return {
+        packet_id: dtype_from_layout(layouts[packet_id]['car'], fields)
+        for packet_id, (_, fields) in CAR_ARRAY_FIELDS.items()
+    }
+
+
+CAR_DTYPES = {
+    packet_format: build_car_dtypes(layouts)
+    for packet_format, layouts in DECODER_REGISTRY.items()
+} if np is not None else {}
+
+
+def get_car_dtypes(packet_format):
+    return CAR_DTYPES.get(packet_format, CAR_DTYPES[PACKET_FORMAT_2025])
+
+
+def decode_all_cars(header, buffer):
+    """Decodes every car of a multi-car packet into one record array, one row per car."""
+    layout = get_layouts(header.m_packetFormat)[header.m_packetId]['car']
+    dtype = get_car_dtypes(header.m_packetFormat)[header.m_packetId]
+    num_cars = min(layout.count, max(0, (len(buffer) - layout.offset) // layout.size))
+    cars = np.frombuffer(buffer, dtype=dtype, count=num_cars, offset=layout.offset)
+    return cars.view(np.recarray)
@@ -0,0 +1,136 @@
+import struct
+import time
+
+from constants import *
+from packet_layouts import HEADER_SIZE
+from packet_views import PACKET_ID_OFFSET, PacketView
+
+# Publish/subscribe dispatch of raw datagrams. Components subscribe to the
+# packet ids they consume; the bus peeks at the packet id byte and drops every
+# datagram nobody subscribed to without building a view or unpacking anything.
+# Subscribers of one packet share a single lazy PacketView, so only the fields
+# they actually read get decoded. Each subscriber's wall time is accumulated
+# so the cost of every consumer can be reported.
+
+DECODE_ERRORS = (ValueError, IndexError, struct.error)
+
+
+class Subscription:
+    __slots__ = ('name', 'callback', 'packet_ids', 'record', 'fields',
+                 'calls', 'errors', 'total_ns', 'max_ns')
+
+    def __init__(self, name, callback, packet_ids, record=None, fields=None):
+        self.name = name
+        self.callback = callback
+        self.packet_ids = tuple(packet_ids)
+        self.record = record
+        self.fields = tuple(fields) if fields else None
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def deliver(self, packet):
+        if self.fields is None:
+            self.callback(packet)
+        else:
+            # Field subscriptions get only the requested fields of each record
+            fields = self.fields
+            self.callback(packet, [{name: getattr(record, name) for name in fields}
+                                   for record in packet.records(self.record)])
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'packet_ids': self.packet_ids,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total_ns / 1e6,
+            'mean_us': self.total_ns / self.calls / 1e3 if self.calls else 0.0,
+            'max_us': self.max_ns / 1e3,
+        }
+
+
+class PacketBus:
+    def __init__(self, stats=None):
+        self.pipeline_stats = stats  # PipelineStats counting decode errors, printed when None
+        self.subscribers = {}
+        self.published = 0
+        self.skipped = {}  # packet id -> datagrams dropped for lack of subscribers
+
+    def subscribe(self, packet_ids, callback, name=None, record='car', fields=None):
+        """Calls callback(packet_view) for every datagram with one of packet_ids.
+
+        With fields, callback(packet_view, rows) gets a dict of just those fields
+        for every entry of the given record instead of reading the view itself.
+        """
+        if isinstance(packet_ids, int):
+            packet_ids = (packet_ids,)
+        name = name or getattr(callback, '__qualname__', repr(callback))
+        subscription = Subscription(name, callback, packet_ids, record, fields)
+        for packet_id in subscription.packet_ids:
+            self.subscribers.setdefault(packet_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for packet_id in subscription.packet_ids:
+            subscribers = self.subscribers.get(packet_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self.subscribers.pop(packet_id, None)
+
+    def wants(self, packet_id):
+        return packet_id in self.subscribers
+
+    def publish(self, data):
+        """Dispatches one datagram, returns the PacketView or None if nobody wanted it."""
+        if len(data) < HEADER_SIZE:
+            return None
+        packet_id = data[PACKET_ID_OFFSET]
+        subscribers = self.subscribers.get(packet_id)
+        if not subscribers:
+            self.skipped[packet_id] = self.skipped.get(packet_id, 0) + 1
+            return None
+
+        self.published += 1
+        packet = PacketView(data)
+        for subscription in subscribers:
+            start = time.perf_counter_ns()
+            try:
+                subscription.deliver(packet)
+            except DECODE_ERRORS as e:
+                subscription.errors += 1
+                if self.pipeline_stats is not None:
+                    self.pipeline_stats.parse_error(packet_id, e)
+                else:
+                    print(f"Skipping packet due to error: {e}")
+            elapsed = time.perf_counter_ns() - start
+            subscription.calls += 1
+            subscription.total_ns += elapsed
+            if elapsed > subscription.max_ns:
+                subscription.max_ns = elapsed
+        return packet
+
+    def subscriptions(self):
+        seen = []
+        for subscribers in self.subscribers.values():
+            for subscription in subscribers:
+                if subscription not in seen:
+                    seen.append(subscription)
+        return seen
+
+    def stats(self):
+        return [subscription.stats() for subscription in self.subscriptions()]
+
+    def report(self):
+        lines = [f"{'Subscriber':<40} {'Packets':>14} {'Calls':>8} {'Errors':>6} "
+                 f"{'Total ms':>10} {'Mean us':>9} {'Max us':>9}"]
+        for stats in sorted(self.stats(), key=lambda s: s['total_ms'], reverse=True):
+            packet_ids = ','.join(str(packet_id) for packet_id in stats['packet_ids'])
+            lines.append(f"{stats['name']:<40} {packet_ids:>14} {stats['calls']:>8} {stats['errors']:>6} "
+                         f"{stats['total_ms']:>10.2f} {stats['mean_us']:>9.1f} {stats['max_us']:>9.1f}")
+        skipped = sum(self.skipped.values())
+        lines.append(f"Dispatched {self.published} packets, skipped {skipped} without subscribers "
+                     f"(ids {sorted(self.skipped)})")
+        return '\n'.join(lines)
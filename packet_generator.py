@@ -0,0 +1,188 @@
+import random
+
+from constants import *
+from packet_layouts import *
+
+# Synthetic F1 25 datagrams for benchmarks and replay tests. Every packet id the
+# parser knows gets a header and records built from LAYOUTS_2025 with random
+# values; fields whose value other code depends on (counts, indices, compounds,
+# event codes, names) are kept within their valid range. Datagrams are padded
+# to the size the game sends.
+#
+# Lap data is not random: every car drives laps of a fixed pace around a track
+# of trackLength metres, so lap numbers, lap times, sectors and distances move
+# forward consistently as the generator advances, like they do in a session.
+
+PACKET_SIZES_2025 = {
+    0: 1349, 1: 753, 2: 1285, 3: 45, 4: 1284, 5: 1133, 6: 1352, 7: 1239,
+    8: 1042, 9: 954, 10: 1041, 11: 1460, 12: 231, 13: 273, 14: 101, 15: 1131,
+}
+
+EVENT_CODES = [b'SSTA', b'SEND', b'FTLP', b'RTMT', b'DRSE', b'DRSD', b'CHQF', b'RCWN',
+               b'PENA', b'SPTP', b'STLG', b'LGOT', b'DTSV', b'SGSV', b'FLBK', b'BUTN',
+               b'RDFL', b'OVTK', b'SCAR', b'COLL']
+
+VISUAL_COMPOUNDS = [16, 17, 18, 7, 8]
+ACTUAL_COMPOUNDS = [16, 17, 18, 19, 20, 21, 22, 7, 8]
+
+# Inclusive value ranges for fields that must stay valid
+FIELD_RANGES = {
+    'numActiveCars': (1, MAX_CARS),
+    'numCars': (1, MAX_CARS),
+    'carIdx': (0, MAX_CARS - 1),
+    'numLaps': (0, LAP_POSITIONS_COUNT),
+    'numTyreStints': (0, TYRE_STINT_COUNT),
+    'lapStart': (0, 1),
+    'carPosition': (1, MAX_CARS),
+    'currentLapNum': (1, 70),
+    'sector': (0, 2),
+    'gear': (-1, 8),
+    'throttle': (0.0, 1.0),
+    'brake': (0.0, 1.0),
+    'steer': (-1.0, 1.0),
+    'clutch': (0, 100),
+    'speed': (0, 350),
+    'lapDistance': (0.0, 7000.0),
+    'tyresWear': (0.0, 100.0),
+    'tyresAgeLaps': (0, 40),
+    'visualTyreCompound': VISUAL_COMPOUNDS,
+    'actualTyreCompound': ACTUAL_COMPOUNDS,
+    'visualTyre': VISUAL_COMPOUNDS,
+    'actualTyre': ACTUAL_COMPOUNDS,
+    'visualCompound': VISUAL_COMPOUNDS,
+    'actualCompound': ACTUAL_COMPOUNDS,
+    'positionForVehicleIdx': (0, MAX_CARS),
+}
+
+INTEGER_RANGES = {
+    'b': (-2 ** 7, 2 ** 7 - 1), 'B': (0, 2 ** 8 - 1),
+    'h': (-2 ** 15, 2 ** 15 - 1), 'H': (0, 2 ** 16 - 1),
+    'i': (-2 ** 31, 2 ** 31 - 1), 'I': (0, 2 ** 32 - 1),
+    'q': (-2 ** 63, 2 ** 63 - 1), 'Q': (0, 2 ** 64 - 1),
+}
+
+
+def item_names(fields):
+    """Expands RECORD_FIELDS entries to one name (or None) per struct item."""
+    names = []
+    for field in fields:
+        name, count = field if isinstance(field, tuple) else (field, 1)
+        names.extend([name] * count)
+    return names
+
+
+class PacketGenerator:
+    def __init__(self, seed=None, num_cars=MAX_CARS, session_uid=None, player_car_index=None,
+                 packet_format=PACKET_FORMAT_2025):
+        self.random = random.Random(seed)
+        self.num_cars = num_cars
+        self.session_uid = session_uid if session_uid is not None else self.random.getrandbits(64)
+        self.player_car_index = (player_car_index if player_car_index is not None
+                                 else self.random.randrange(num_cars))
+        self.packet_format = packet_format
+        self.layouts = get_layouts(packet_format)
+        self.session_time = 0.0
+        self.frame = 0
+
+        self.track_length = self.random.randint(3000, 7000)
+        self.lap_durations = [self.random.uniform(80.0, 100.0) for _ in range(MAX_CARS)]  # seconds
+        # Spread the cars around the track
+        self.lap_elapsed = [self.random.uniform(0.0, duration) for duration in self.lap_durations]
+        self.lap_numbers = [1] * MAX_CARS
+        self.last_lap_times = [0.0] * MAX_CARS
+
+    def random_value(self, code, name=None):
+        rng = self.random
+        valid = FIELD_RANGES.get(name)
+        if code.endswith('s'):
+            if name == 'eventCode':
+                return rng.choice(EVENT_CODES)
+            length = int(code[:-1] or 1)
+            return bytes(rng.choice(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rng.randint(1, length - 1)))
+        if isinstance(valid, list):
+            return rng.choice(valid)
+        if code in 'fd':
+            low, high = valid if valid is not None else (-1000.0, 1000.0)
+            return rng.uniform(low, high)
+        if code == '?':
+            return rng.random() < 0.5
+        low, high = INTEGER_RANGES[code]
+        if valid is not None:
+            low, high = max(low, int(valid[0])), min(high, int(valid[1]))
+        return rng.randint(low, high)
+
+    def advance(self, frames=1):
+        self.frame += frames
+        self.session_time += frames / 60
+        for car_index, duration in enumerate(self.lap_durations):
+            elapsed = self.lap_elapsed[car_index] + frames / 60
+            while elapsed >= duration:
+                elapsed -= duration
+                self.lap_numbers[car_index] += 1
+                self.last_lap_times[car_index] = duration
+            self.lap_elapsed[car_index] = elapsed
+
+    def lap_values(self, car_index):
+        """Lap data fields of car_index that follow from its progress around the track."""
+        elapsed = self.lap_elapsed[car_index]
+        progress = elapsed / self.lap_durations[car_index]
+        lap_distance = progress * self.track_length
+        return {
+            'lastLapTimeInMS': int(self.last_lap_times[car_index] * 1000),
+            'currentLapTimeInMS': int(elapsed * 1000),
+            'lapDistance': lap_distance,
+            'totalDistance': (self.lap_numbers[car_index] - 1) * self.track_length + lap_distance,
+            'currentLapNum': self.lap_numbers[car_index],
+            'sector': min(2, int(progress * 3)),
+            'currentLapInvalid': 0,
+            'resultStatus': RESULT_STATUS_ACTIVE if car_index < self.num_cars else 1,
+        }
+
+    def header(self, packet_id):
+        return HEADER_STRUCT.pack(self.packet_format, 25, 1, 0, 1, packet_id, self.session_uid,
+                                  self.session_time, self.frame, self.frame, self.player_car_index, 255)
+
+    def packet(self, packet_id):
+        size = PACKET_SIZES_2025.get(packet_id, HEADER_SIZE)
+        layouts = self.layouts.get(packet_id, {})
+        for layout in layouts.values():
+            size = max(size, layout.record_offset(layout.count))
+
+        buffer = bytearray(size)
+        buffer[:HEADER_SIZE] = self.header(packet_id)
+        if not layouts:
+            # No layout (car setups, lobby info): random payload of the right size
+            buffer[HEADER_SIZE:] = self.random.randbytes(size - HEADER_SIZE)
+        for record, layout in layouts.items():
+            codes = format_items(layout.struct.format)
+            names = item_names(RECORD_FIELDS[packet_id][record])
+            for index in range(layout.count):
+                fixed = self.lap_values(index) if packet_id == 2 else {'trackLength': self.track_length}
+                values = [fixed[name] if name in fixed else self.random_value(code, name)
+                          for code, name in zip(codes, names)]
+                layout.struct.pack_into(buffer, layout.record_offset(index), *values)
+        return bytes(buffer)
+
+    def packets(self, count, packet_ids=None):
+        """Returns count datagrams cycling through packet_ids (default: every known id)."""
+        packet_ids = list(packet_ids) if packet_ids is not None else sorted(PACKET_SIZES_2025)
+        datagrams = []
+        for i in range(count):
+            self.advance()
+            datagrams.append(self.packet(packet_ids[i % len(packet_ids)]))
+        return datagrams
+
+    def frames(self, count, packet_ids=(0, 2, 6, 7, 10)):
+        """Returns count frames of the packets the game sends at the telemetry rate.
+
+        Every 60th frame also carries the lower rate packets (session, participants,
+        session history, tyre sets, motion ex, lap positions) and an event.
+        """
+        datagrams = []
+        for frame in range(count):
+            self.advance()
+            ids = list(packet_ids)
+            if frame % 60 == 0:
+                ids += [1, 3, 4, 11, 12, 13, 15]
+            datagrams.extend(self.packet(packet_id) for packet_id in ids)
+        return datagrams
@@ -0,0 +1,205 @@
+import re
+import struct
+from constants import *
+
+# Precompiled struct layouts for every packet type, built once at import time.
+# Registry is keyed by m_packetFormat, then by packet id, then by record name.
+
+HEADER_STRUCT = struct.Struct('<HBBBBBQfIIBB')
+HEADER_SIZE = HEADER_STRUCT.size
+
+PACKET_FORMAT_2025 = 2025
+
+
+class PacketLayout:
+    def __init__(self, fmt, offset=HEADER_SIZE, count=1):
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+        self.offset = offset
+        self.count = count
+
+    def record_offset(self, index=0):
+        return self.offset + index * self.size
+
+    def unpack(self, buffer, index=0):
+        return self.struct.unpack_from(buffer, self.offset + index * self.size)
+
+    def fits(self, buffer, index=0):
+        return self.offset + (index + 1) * self.size <= len(buffer)
+
+
+LAP_DATA_FIELDS = [
+    'lastLapTimeInMS', 'currentLapTimeInMS', 'sector1TimeMS', 'sector1TimeMin',
+    'sector2TimeMS', 'sector2TimeMin', 'deltaToCarInFrontMS', 'deltaToCarInFrontMin',
+    'deltaToRaceLeaderMS', 'deltaToRaceLeaderMin', 'lapDistance', 'totalDistance',
+    'safetyCarDelta', 'carPosition', 'currentLapNum', 'pitStatus', 'numPitStops',
+    'sector', 'currentLapInvalid', 'penalties', 'totalWarnings', 'cornerCuttingWarnings',
+    'numUnservedDriveThroughPens', 'numUnservedStopGoPens', 'gridPosition', 'driverStatus',
+    'resultStatus', 'pitLaneTimerActive', 'pitLaneTimeInLaneInMS', 'pitStopTimerInMS',
+    'pitStopShouldServePen', 'speedTrapFastestSpeed', 'speedTrapFastestLap'
+]
+
+LAP_HISTORY_FIELDS = [
+    'lapTimeInMS', 'sector1MS', 'sector1Min', 'sector2MS', 'sector2Min',
+    'sector3MS', 'sector3Min', 'lapValidFlags'
+]
+
+TYRE_STINT_FIELDS = ['endLap', 'actualTyre', 'visualTyre']
+
+LAP_HISTORY_COUNT = 100
+TYRE_STINT_COUNT = 8
+LAP_POSITIONS_COUNT = 50
+
+_SESSION_HISTORY_OFFSET = HEADER_SIZE + 7
+_LAP_HISTORY_SIZE = struct.calcsize('<I H B H B H B B')
+
+LAYOUTS_2025 = {
+    0: {'car': PacketLayout('<fff fff hhh hhh fff fff', count=MAX_CARS)},
+    1: {'session': PacketLayout('<BbbBHBHBBfBBBBBBB')},
+    2: {'car': PacketLayout('<IIH B H B H B H B f f f B B B B B B B B B B B B B B B H H B f B', count=MAX_CARS)},
+    3: {'eventCode': PacketLayout('<4s')},
+    4: {
+        'numActiveCars': PacketLayout('<B'),
+        'car': PacketLayout('<BBBBBBB32sBBHB4B', HEADER_SIZE + 1, MAX_CARS),
+    },
+    6: {'car': PacketLayout('<HfffBbhBBH4H4B4BH4f4B', count=MAX_CARS)},
+    7: {'car': PacketLayout('<BBBBBfffHHBBHBBbfffBff', count=MAX_CARS)},
+    8: {
+        'numCars': PacketLayout('<B'),
+        'car': PacketLayout('<BBBBBBIdBBB8B8B8B', HEADER_SIZE + 1, MAX_CARS),
+    },
+    10: {'car': PacketLayout('<4f4B4B3B6B2B8B2B', count=MAX_CARS)},
+    11: {
+        'summary': PacketLayout('<BBBBBBB'),
+        'lap': PacketLayout('<I H B H B H B B', _SESSION_HISTORY_OFFSET, LAP_HISTORY_COUNT),
+        'stint': PacketLayout('<BBB', _SESSION_HISTORY_OFFSET + LAP_HISTORY_COUNT * _LAP_HISTORY_SIZE,
+                              TYRE_STINT_COUNT),
+    },
+    12: {
+        'carIdx': PacketLayout('<B'),
+        'tyreSet': PacketLayout('<BBBBBBBhB', HEADER_SIZE + 1, 20),
+    },
+    13: {'motionEx': PacketLayout('<' + 'f' * 88)},
+    14: {'dataSet': PacketLayout('<B B 4I 6B', count=3)},
+    15: {
+        'summary': PacketLayout('<BB'),
+        'lap': PacketLayout('<22B', HEADER_SIZE + 2, LAP_POSITIONS_COUNT),
+    },
+}
+
+# Field names for every record in LAYOUTS_2025, in struct order. A (name, n)
+# entry groups n items into one list field; None skips an item that the dict
+# parsers do not expose either.
+RECORD_FIELDS = {
+    0: {'car': [
+        'worldPositionX', 'worldPositionY', 'worldPositionZ',
+        'worldVelocityX', 'worldVelocityY', 'worldVelocityZ',
+        'worldForwardDirX', 'worldForwardDirY', 'worldForwardDirZ',
+        'worldRightDirX', 'worldRightDirY', 'worldRightDirZ',
+        'gForceLateral', 'gForceLongitudinal', 'gForceVertical',
+        'yaw', 'pitch', 'roll'
+    ]},
+    1: {'session': [
+        'weather', 'trackTemperature', 'airTemperature', 'totalLaps', 'trackLength',
+        'sessionType', 'trackId', 'formula', 'sessionTimeLeft', 'sessionDuration',
+        'pitSpeedLimit', 'gamePaused', 'isSpectating', 'spectatorCarIndex',
+        'sliProNativeSupport', 'numMarshalZones', None
+    ]},
+    2: {'car': LAP_DATA_FIELDS},
+    3: {'eventCode': ['eventCode']},
+    4: {
+        'numActiveCars': ['numActiveCars'],
+        'car': [
+            'aiControlled', 'driverId', 'networkId', 'teamId', 'myTeam', 'raceNumber',
+            'nationality', 'name', 'yourTelemetry', 'showOnlineNames', 'techLevel',
+            'platform', 'numColours', ('liveryColours', 3)
+        ],
+    },
+    6: {'car': [
+        'speed', 'throttle', 'steer', 'brake', 'clutch', 'gear', 'engineRPM', 'drs',
+        'revLightsPercent', 'revLightsBitValue', ('brakesTemperature', 4),
+        ('tyresSurfaceTemperature', 4), ('tyresInnerTemperature', 4), 'engineTemperature',
+        ('tyresPressure', 4), ('surfaceType', 4)
+    ]},
+    7: {'car': [
+        'tractionControl', 'antiLockBrakes', 'fuelMix', 'frontBrakeBias', 'pitLimiterStatus',
+        'fuelInTank', 'fuelCapacity', 'fuelRemainingLaps', 'maxRPM', 'idleRPM', 'maxGears',
+        'drsAllowed', 'drsActivationDistance', 'actualTyreCompound', 'visualTyreCompound',
+        'tyresAgeLaps', 'vehicleFiaFlags', 'enginePowerICE', 'enginePowerMGUK',
+        'ersStoreEnergy', 'ersDeployMode', None
+    ]},
+    8: {
+        'numCars': ['numCars'],
+        'car': [
+            'position', 'numLaps', 'gridPosition', 'points', 'numPitStops', 'resultStatus',
+            'resultReason', 'bestLapTimeInMS', 'totalRaceTime', 'penaltiesTime', 'numPenalties',
+            'numTyreStints', ('tyreStintsActual', 8), ('tyreStintsVisual', 8), ('tyreStintsEndLaps', 7)
+        ],
+    },
+    10: {'car': [
+        ('tyresWear', 4), ('tyresDamage', 4), ('brakesDamage', 4), ('tyreBlisters', 3),
+        'frontLeftWingDamage', 'frontRightWingDamage', 'rearWingDamage', 'floorDamage',
+        'diffuserDamage', 'sidepodDamage', 'drsFault', 'ersFault', 'gearBoxDamage',
+        'engineDamage', 'engineMGUHWear', 'engineESWear', 'engineCEWear', 'engineICEWear',
+        'engineMGUKWear', 'engineTCWear', 'engineBlown', 'engineSeized'
+    ]},
+    11: {
+        'summary': [
+            'carIdx', 'numLaps', 'numTyreStints', 'bestLapTimeLapNum',
+            'bestSector1LapNum', 'bestSector2LapNum', 'bestSector3LapNum'
+        ],
+        'lap': LAP_HISTORY_FIELDS,
+        'stint': TYRE_STINT_FIELDS,
+    },
+    12: {
+        'carIdx': ['carIdx'],
+        'tyreSet': [
+            'actualCompound', 'visualCompound', 'wear', 'available', 'recommendedSession',
+            'lifeSpan', 'usableLife', 'lapDeltaTime', 'fitted'
+        ],
+    },
+    13: {'motionEx': [('values', 88)]},
+    14: {'dataSet': [
+        'carIdx', 'teamId', 'lapTime', 's1Time', 's2Time', 's3Time', 'tractionControl',
+        'gearboxAssist', 'antiLockBrakes', 'equalCarPerformance', 'customSetup', 'valid'
+    ]},
+    15: {
+        'summary': ['numLaps', 'lapStart'],
+        'lap': [('positionForVehicleIdx', 22)],
+    },
+}
+
+DECODER_REGISTRY = {
+    PACKET_FORMAT_2025: LAYOUTS_2025,
+}
+
+
+def get_layouts(packet_format):
+    return DECODER_REGISTRY.get(packet_format, LAYOUTS_2025)
+
+
+def format_items(fmt):
+    """Splits a struct format into one code per unpacked item, e.g. '<2Bf' -> ['B', 'B', 'f']."""
+    items = []
+    for count, code in re.findall(r'(\d*)([a-zA-Z])', fmt.lstrip('<')):
+        count = int(count) if count else 1
+        if code == 's':
+            items.append(f'{count}s')
+        else:
+            items.extend([code] * count)
+    return items
+
+
+def field_offsets(layout, fields):
+    """Yields (name, code, count, offset) for every named field of a record layout."""
+    items = format_items(layout.struct.format)
+    index = 0
+    offset = 0
+    for field in fields:
+        name, count = field if isinstance(field, tuple) else (field, 1)
+        if name is not None:
+            yield name, items[index], count, offset
+        offset += sum(struct.calcsize('<' + code) for code in items[index:index + count])
+        index += count
+    if index != len(items):
+        raise ValueError(f"{len(items)} items in layout '{layout.struct.format}', {index} covered by field names")
@@ -2,9 +2,11 @@ import struct
 from constants import *
 from dataclasses import dataclass
 from typing import List
+from packet_layouts import *
+from packet_arrays import np, CAR_ARRAY_FIELDS, decode_all_cars
 
 HEADER_FORMAT = '<HBBBBBQfIIBB'
-HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_SIZE = HEADER_STRUCT.size
 
 @dataclass
 class PacketHeader:
@@ -23,11 +25,11 @@ class PacketHeader:
 
     @classmethod
     def from_buffer(cls, buffer: bytes):
-        return cls(*struct.unpack_from(HEADER_FORMAT, buffer, 0))
+        return cls(*HEADER_STRUCT.unpack_from(buffer, 0))
 
 
 class F1PacketParser:
-    def __init__(self):
+    def __init__(self, vectorized=False):
         self.parsers = {
             0: self.parse_motion,
             1: self.parse_session,
@@ -47,11 +49,30 @@ class F1PacketParser:
             15: self.parse_lap_positions,
         }
 
-    def parse_packet(self, buffer: bytes, car_index: int = 0):
-        header = PacketHeader.from_buffer(buffer)
+        # Vectorized mode decodes every car of a multi-car packet in one call
+        if vectorized:
+            if np is None:
+                raise ImportError("Vectorized packet decoding requires numpy.")
+            for packet_id in CAR_ARRAY_FIELDS:
+                self.parsers[packet_id] = self.parse_all_cars
+
+    def parse_header(self, buffer: bytes):
+        return PacketHeader.from_buffer(buffer)
+
+    def dispatch(self, header: PacketHeader, buffer: bytes, car_index: int = 0):
         parser = self.parsers.get(header.m_packetId, self.unknown_packet)
         return parser(header, buffer, car_index)
 
+    def parse_packet(self, buffer: bytes, car_index: int = 0):
+        return self.dispatch(self.parse_header(buffer), buffer, car_index)
+
+    def parse_all_cars(self, header: PacketHeader, buffer: bytes, *_):
+        key = CAR_ARRAY_FIELDS[header.m_packetId][0]
+        result = {'header': header, key: decode_all_cars(header, buffer)}
+        if header.m_packetId == 4:
+            result['numActiveCars'] = get_layouts(header.m_packetFormat)[4]['numActiveCars'].unpack(buffer)[0]
+        return result
+
     def unknown_packet(self, header: PacketHeader, buffer: bytes, *_):
         return {'header': header, 'data': None, 'note': 'Unknown packet ID'}
 
@@ -89,10 +110,7 @@ class F1PacketParser:
         return {'header': header, 'data': 'Parsed packet type 15'}
 
     def parse_motion(self, header: PacketHeader, buffer: bytes, car_index: int = 0):
-        car_format = '<fff fff hhh hhh fff fff'
-        car_size = struct.calcsize(car_format)
-        offset = HEADER_SIZE + car_index * car_size
-        data = struct.unpack_from(car_format, buffer, offset)
+        data = get_layouts(header.m_packetFormat)[0]['car'].unpack(buffer, car_index)
         return {
             'header': header,
             'carMotionData': [{
@@ -107,8 +125,7 @@ class F1PacketParser:
 
     def parse_session(self, header: PacketHeader, buffer: bytes, *_):
         # Based on F1 25 UDP spec from the uploaded document
-        session_format = '<BbbBHBHBBfBBBBBBB'
-        data = struct.unpack_from(session_format, buffer, HEADER_SIZE)
+        data = get_layouts(header.m_packetFormat)[1]['session'].unpack(buffer)
         return {
             'header': header,
             'weather': data[0],
@@ -130,11 +147,8 @@ class F1PacketParser:
         }
 
     def parse_car_telemetry(self, header: PacketHeader, buffer: bytes, car_index: int = 0):
-        car_format = '<HfffBbhBBH4H4B4BH4f4B'  # 32 bytes per car
-        car_size = struct.calcsize(car_format)
-        offset = HEADER_SIZE + car_index * car_size
-        data = struct.unpack_from(car_format, buffer, offset)
-    
+        data = get_layouts(header.m_packetFormat)[6]['car'].unpack(buffer, car_index)
+
         return {
             'header': header,
             'carTelemetryData': {
@@ -159,54 +173,29 @@ class F1PacketParser:
     
     
     def parse_lap_data(self, header: PacketHeader, buffer: bytes, car_index: int = None):
-        lap_format = '<IIH B H B H B H B f f f B B B B B B B B B B B B B B B H H B f B'
-        lap_size = struct.calcsize(lap_format)
+        layout = get_layouts(header.m_packetFormat)[2]['car']
 
         if car_index is not None:
-            offset = HEADER_SIZE + car_index * lap_size
-            if offset + lap_size > len(buffer):
+            if not layout.fits(buffer, car_index):
                 raise IndexError(f"car_index {car_index} out of bounds for lap data packet size {len(buffer)}")
-            data = struct.unpack_from(lap_format, buffer, offset)
+            data = layout.unpack(buffer, car_index)
             return {
                 'header': header,
-                'lapData': dict(zip([
-                    'lastLapTimeInMS', 'currentLapTimeInMS', 'sector1TimeMS', 'sector1TimeMin',
-                    'sector2TimeMS', 'sector2TimeMin', 'deltaToCarInFrontMS', 'deltaToCarInFrontMin',
-                    'deltaToRaceLeaderMS', 'deltaToRaceLeaderMin', 'lapDistance', 'totalDistance',
-                    'safetyCarDelta', 'carPosition', 'currentLapNum', 'pitStatus', 'numPitStops',
-                    'sector', 'currentLapInvalid', 'penalties', 'totalWarnings', 'cornerCuttingWarnings',
-                    'numUnservedDriveThroughPens', 'numUnservedStopGoPens', 'gridPosition', 'driverStatus',
-                    'resultStatus', 'pitLaneTimerActive', 'pitLaneTimeInLaneInMS', 'pitStopTimerInMS',
-                    'pitStopShouldServePen', 'speedTrapFastestSpeed', 'speedTrapFastestLap'
-                ], data))
+                'lapData': dict(zip(LAP_DATA_FIELDS, data))
             }
 
         # If no car index is provided, return all cars' data
         lap_data = []
-        for i in range(22):  # max cars
-            offset = HEADER_SIZE + i * lap_size
-            if offset + lap_size > len(buffer):
+        for i in range(layout.count):
+            if not layout.fits(buffer, i):
                 break
-            data = struct.unpack_from(lap_format, buffer, offset)
-            lap_data.append(dict(zip([
-                'lastLapTimeInMS', 'currentLapTimeInMS', 'sector1TimeMS', 'sector1TimeMin',
-                'sector2TimeMS', 'sector2TimeMin', 'deltaToCarInFrontMS', 'deltaToCarInFrontMin',
-                'deltaToRaceLeaderMS', 'deltaToRaceLeaderMin', 'lapDistance', 'totalDistance',
-                'safetyCarDelta', 'carPosition', 'currentLapNum', 'pitStatus', 'numPitStops',
-                'sector', 'currentLapInvalid', 'penalties', 'totalWarnings', 'cornerCuttingWarnings',
-                'numUnservedDriveThroughPens', 'numUnservedStopGoPens', 'gridPosition', 'driverStatus',
-                'resultStatus', 'pitLaneTimerActive', 'pitLaneTimeInLaneInMS', 'pitStopTimerInMS',
-                'pitStopShouldServePen', 'speedTrapFastestSpeed', 'speedTrapFastestLap'
-            ], data)))
+            lap_data.append(dict(zip(LAP_DATA_FIELDS, layout.unpack(buffer, i))))
 
         return {'header': header, 'lapData': lap_data}
 
     def parse_car_status(self, header: PacketHeader, buffer: bytes, car_index: int = 0):
         # Adjusted to correct field count (F1 25 spec)
-        car_format = '<BBBBBfffHHBBHBBbfffBff'
-        car_size = struct.calcsize(car_format)
-        offset = HEADER_SIZE + car_index * car_size
-        data = struct.unpack_from(car_format, buffer, offset)
+        data = get_layouts(header.m_packetFormat)[7]['car'].unpack(buffer, car_index)
         return {
             'header': header,
             'carStatusData': [{
@@ -235,13 +224,12 @@ class F1PacketParser:
         }
     
     def parse_participants(self, header: PacketHeader, buffer: bytes, *_):
-        num_active_cars = struct.unpack_from('<B', buffer, HEADER_SIZE)[0]
-        participant_format = '<BBBBBBB32sBBHB4B'
-        participant_size = struct.calcsize(participant_format)
+        layouts = get_layouts(header.m_packetFormat)[4]
+        num_active_cars = layouts['numActiveCars'].unpack(buffer)[0]
+        layout = layouts['car']
         participants = []
-        for i in range(22):
-            offset = HEADER_SIZE + 1 + i * participant_size
-            data = struct.unpack_from(participant_format, buffer, offset)
+        for i in range(layout.count):
+            data = layout.unpack(buffer, i)
             participants.append({
                 'aiControlled': data[0],
                 'driverId': data[1],
@@ -261,15 +249,13 @@ class F1PacketParser:
         return {'header': header, 'numActiveCars': num_active_cars, 'participants': participants}
 
     def parse_event(self, header: PacketHeader, buffer: bytes, *_):
-        event_code = struct.unpack_from('<4s', buffer, HEADER_SIZE)[0].decode('utf-8')
+        event_code = get_layouts(header.m_packetFormat)[3]['eventCode'].unpack(buffer)[0].decode('utf-8')
         return {'header': header, 'eventCode': event_code}
 
     def parse_final_classification(self, header: PacketHeader, buffer: bytes, car_index: int = 0):
-        class_format = '<BBBBBBIdBBB8B8B8B'
-        class_size = struct.calcsize(class_format)
-        offset = HEADER_SIZE + 1 + car_index * class_size
-        num_cars = struct.unpack_from('<B', buffer, HEADER_SIZE)[0]
-        data = struct.unpack_from(class_format, buffer, offset)
+        layouts = get_layouts(header.m_packetFormat)[8]
+        num_cars = layouts['numCars'].unpack(buffer)[0]
+        data = layouts['car'].unpack(buffer, car_index)
         return {
             'header': header,
             'numCars': num_cars,
@@ -293,10 +279,7 @@ class F1PacketParser:
         }
 
     def parse_car_damage(self, header: PacketHeader, buffer: bytes, car_index: int = 0):
-        car_format = '<4f4B4B3B6B2B8B2B'
-        car_size = struct.calcsize(car_format)
-        offset = HEADER_SIZE + car_index * car_size
-        data = struct.unpack_from(car_format, buffer, offset)
+        data = get_layouts(header.m_packetFormat)[10]['car'].unpack(buffer, car_index)
         return {
             'header': header,
             'carDamageData': [{
@@ -326,25 +309,19 @@ class F1PacketParser:
         }
 
     def parse_session_history(self, header: PacketHeader, buffer: bytes, *_):
-        car_idx, num_laps, num_stints, best_lap, best_s1, best_s2, best_s3 = struct.unpack_from('<BBBBBBB', buffer, HEADER_SIZE)
-        lap_data_format = '<I H B H B H B B'
-        lap_data_size = struct.calcsize(lap_data_format)
-        lap_offset = HEADER_SIZE + 7
+        layouts = get_layouts(header.m_packetFormat)[11]
+        car_idx, num_laps, num_stints, best_lap, best_s1, best_s2, best_s3 = layouts['summary'].unpack(buffer)
 
+        lap_layout = layouts['lap']
         laps = [
-            dict(zip([
-                'lapTimeInMS', 'sector1MS', 'sector1Min', 'sector2MS', 'sector2Min',
-                'sector3MS', 'sector3Min', 'lapValidFlags'
-            ], struct.unpack_from(lap_data_format, buffer, lap_offset + i * lap_data_size)))
-            for i in range(100)
+            dict(zip(LAP_HISTORY_FIELDS, lap_layout.unpack(buffer, i)))
+            for i in range(lap_layout.count)
         ]
 
-        stint_format = '<BBB'
-        stint_offset = lap_offset + 100 * lap_data_size
+        stint_layout = layouts['stint']
         stints = [
-            dict(zip(['endLap', 'actualTyre', 'visualTyre'],
-                     struct.unpack_from(stint_format, buffer, stint_offset + i * 3)))
-            for i in range(8)
+            dict(zip(TYRE_STINT_FIELDS, stint_layout.unpack(buffer, i)))
+            for i in range(stint_layout.count)
         ]
 
         return {
@@ -362,11 +339,9 @@ class F1PacketParser:
 
 
     def parse_tyre_sets(self, header: PacketHeader, buffer: bytes, car_index: int = 0):
-        tyre_format = '<BBBBBBBhB'
-        tyre_size = struct.calcsize(tyre_format)
-        offset = HEADER_SIZE + 1 + car_index * tyre_size
-        car_idx = struct.unpack_from('<B', buffer, HEADER_SIZE)[0]
-        data = struct.unpack_from(tyre_format, buffer, offset)
+        layouts = get_layouts(header.m_packetFormat)[12]
+        car_idx = layouts['carIdx'].unpack(buffer)[0]
+        data = layouts['tyreSet'].unpack(buffer, car_index)
         return {
             'header': header,
             'carIdx': car_idx,
@@ -385,26 +360,23 @@ class F1PacketParser:
         }
 
     def parse_motion_ex(self, header: PacketHeader, buffer: bytes, *_):
-        format_str = '<' + 'f'*88  # 88 floats
-        expected_size = HEADER_SIZE + struct.calcsize(format_str)
+        layout = get_layouts(header.m_packetFormat)[13]['motionEx']  # 88 floats
 
-        if len(buffer) < expected_size:
-            #print(f"Skipping packet due to error: MotionEx packet too short: expected {expected_size}, got {len(buffer)}")
+        if not layout.fits(buffer):
+            #print(f"Skipping packet due to error: MotionEx packet too short: expected {layout.record_offset(1)}, got {len(buffer)}")
             return {'header': header, 'motionEx': []}
 
-        data = struct.unpack_from(format_str, buffer, HEADER_SIZE)
+        data = layout.unpack(buffer)
         return {
             'header': header,
             'motionEx': list(data)
         }
 
     def parse_time_trial(self, header: PacketHeader, buffer: bytes, *_):
-        car_format = '<B B 4I 5B'
-        section_size = struct.calcsize(car_format)
+        layout = get_layouts(header.m_packetFormat)[14]['dataSet']
         result = {'header': header}
         for i, name in enumerate(['playerSessionBest', 'personalBest', 'rival']):
-            offset = HEADER_SIZE + i * section_size
-            d = struct.unpack_from(car_format, buffer, offset)
+            d = layout.unpack(buffer, i)
             result[name] = {
                 'carIdx': d[0],
                 'teamId': d[1],
@@ -422,10 +394,11 @@ class F1PacketParser:
         return result
 
     def parse_lap_positions(self, header: PacketHeader, buffer: bytes, *_):
-        num_laps, lap_start = struct.unpack_from('<BB', buffer, HEADER_SIZE)
-        base = HEADER_SIZE + 2
+        layouts = get_layouts(header.m_packetFormat)[15]
+        num_laps, lap_start = layouts['summary'].unpack(buffer)
+        lap_layout = layouts['lap']
         positions = [
-            list(struct.unpack_from('22B', buffer, base + i * 22)) for i in range(50)
+            list(lap_layout.unpack(buffer, i)) for i in range(lap_layout.count)
         ]
         return {
             'header': header,
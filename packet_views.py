@@ -0,0 +1,142 @@
+import struct
+from constants import *
+from packet_layouts import *
+from packet_parsers import PacketHeader
+
+# Lazy, zero-copy views over a datagram. Nothing is unpacked until a field is
+# read, and record views share the packet's memoryview instead of slicing it.
+# A view is only valid while the underlying buffer is unchanged, so do not keep
+# views over a receive buffer that gets reused for the next datagram.
+
+PACKET_ID_OFFSET = struct.calcsize('<HBBBB')
+PLAYER_CAR_INDEX_OFFSET = struct.calcsize('<HBBBBBQfII')
+SESSION_UID_STRUCT = struct.Struct('<Q')
+SESSION_UID_OFFSET = struct.calcsize('<HBBBBB')
+SESSION_TIME_STRUCT = struct.Struct('<f')
+SESSION_TIME_OFFSET = struct.calcsize('<HBBBBBQ')
+
+
+class FieldView:
+    def __init__(self, code, count, offset):
+        self.struct = struct.Struct(f'<{count}{code}' if count > 1 else '<' + code)
+        self.offset = offset
+        self.is_list = count > 1
+        self.is_string = code.endswith('s')
+
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        values = self.struct.unpack_from(record._buffer, record._offset + self.offset)
+        if self.is_list:
+            return list(values)
+        if self.is_string:
+            return values[0].decode('utf-8', errors='ignore').strip('\x00')
+        return values[0]
+
+
+class RecordView:
+    __slots__ = ('_buffer', '_offset')
+    field_names = ()
+
+    def __init__(self, buffer, offset):
+        self._buffer = buffer
+        self._offset = offset
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.field_names}
+
+    def __getitem__(self, name):
+        if name not in self.field_names:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+def make_view_class(name, layout, fields):
+    attrs = {'__slots__': (), 'layout': layout, 'field_names': ()}
+    for field_name, code, count, offset in field_offsets(layout, fields):
+        attrs[field_name] = FieldView(code, count, offset)
+        attrs['field_names'] += (field_name,)
+    return type(name, (RecordView,), attrs)
+
+
+def build_view_classes(layouts):
+    return {
+        packet_id: {
+            record: make_view_class(f"Packet{packet_id}{record[0].upper()}{record[1:]}View",
+                                    layouts[packet_id][record], fields)
+            for record, fields in records.items()
+        }
+        for packet_id, records in RECORD_FIELDS.items()
+    }
+
+
+VIEW_CLASSES = {
+    packet_format: build_view_classes(layouts)
+    for packet_format, layouts in DECODER_REGISTRY.items()
+}
+
+
+def get_view_classes(packet_format):
+    return VIEW_CLASSES.get(packet_format, VIEW_CLASSES[PACKET_FORMAT_2025])
+
+
+class PacketView:
+    __slots__ = ('_buffer', '_header')
+
+    def __init__(self, buffer):
+        if len(buffer) < HEADER_SIZE:
+            raise ValueError(f"Packet too short for header: {len(buffer)} bytes")
+        self._buffer = buffer if isinstance(buffer, memoryview) else memoryview(buffer)
+        self._header = None
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    @property
+    def header(self):
+        if self._header is None:
+            self._header = PacketHeader.from_buffer(self._buffer)
+        return self._header
+
+    @property
+    def packet_format(self):
+        return self._buffer[0] | (self._buffer[1] << 8)
+
+    @property
+    def packet_id(self):
+        return self._buffer[PACKET_ID_OFFSET]
+
+    @property
+    def session_uid(self):
+        return SESSION_UID_STRUCT.unpack_from(self._buffer, SESSION_UID_OFFSET)[0]
+
+    @property
+    def session_time(self):
+        return SESSION_TIME_STRUCT.unpack_from(self._buffer, SESSION_TIME_OFFSET)[0]
+
+    @property
+    def player_car_index(self):
+        return self._buffer[PLAYER_CAR_INDEX_OFFSET]
+
+    def record(self, name, index=0):
+        view_class = get_view_classes(self.packet_format)[self.packet_id][name]
+        layout = view_class.layout
+        if not 0 <= index < layout.count or not layout.fits(self._buffer, index):
+            raise IndexError(f"{name} index {index} out of bounds for packet {self.packet_id} "
+                             f"of size {len(self._buffer)}")
+        return view_class(self._buffer, layout.offset + index * layout.size)
+
+    def records(self, name):
+        layout = get_view_classes(self.packet_format)[self.packet_id][name].layout
+        count = min(layout.count, max(0, (len(self._buffer) - layout.offset) // layout.size))
+        return [self.record(name, i) for i in range(count)]
+
+    def car(self, car_index):
+        return self.record('car', car_index)
+
+    def cars(self):
+        return self.records('car')
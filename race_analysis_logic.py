@@ -1,51 +1,194 @@
+import math
+
+from constants import *
+
+# Tyre wear is tracked as running least-squares fits of average wear against
+# lap number. Each stint gets its own fit; a compound pools the fits of all its
+# stints (the within-stint slope, so stints starting at different wear levels
+# do not skew it). Every lap is an O(1) update of a few sums, and wear rates,
+# stint life projections and their confidence come straight from those sums.
+
+
+def average_wear(tire_snapshot):
+    """Average wear of a snapshot with average_front()/average_rear(), or of [FL, FR, RL, RR]."""
+    if hasattr(tire_snapshot, 'average_front'):
+        return (tire_snapshot.average_front() + tire_snapshot.average_rear()) / 2
+    return sum(tire_snapshot) / len(tire_snapshot)
+
+
+class WearFit:
+    """Running least-squares line wear = intercept + slope * lap."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_lap = 0.0
+        self.mean_wear = 0.0
+        self.sxx = 0.0  # Sums of products of deviations from the means
+        self.sxy = 0.0
+        self.syy = 0.0
+        self.last_lap = None
+        self.last_wear = None
+
+    def add(self, lap, wear):
+        self.n += 1
+        dx = lap - self.mean_lap
+        dy = wear - self.mean_wear
+        self.mean_lap += dx / self.n
+        self.mean_wear += dy / self.n
+        self.sxx += dx * (lap - self.mean_lap)
+        self.sxy += dx * (wear - self.mean_wear)
+        self.syy += dy * (wear - self.mean_wear)
+        self.last_lap = lap
+        self.last_wear = wear
+
+    @property
+    def slope(self):
+        return self.sxy / self.sxx if self.sxx > 0 else 0.0
+
+    @property
+    def slope_error(self):
+        """Standard error of the slope, None until there are more than two points."""
+        if self.sxx <= 0 or self.n <= 2:
+            return None
+        residual = max(0.0, self.syy - self.slope * self.sxy) / (self.n - 2)
+        return math.sqrt(residual / self.sxx)
+
+    @property
+    def r_squared(self):
+        if self.sxx <= 0 or self.syy <= 0:
+            return 0.0
+        return min(1.0, self.sxy * self.sxy / (self.sxx * self.syy))
+
+    def predict(self, lap):
+        return self.mean_wear + self.slope * (lap - self.mean_lap)
+
+
+class CompoundWear:
+    """Pooled within-stint fit over every stint on one compound."""
+
+    def __init__(self, tire_type):
+        self.tire_type = tire_type
+        self.stints = []
+        self.n = 0
+        self.sxx = 0.0
+        self.sxy = 0.0
+        self.syy = 0.0
+
+    def start_stint(self):
+        self.stints.append(WearFit())
+
+    def add(self, lap, wear):
+        stint = self.stints[-1]
+        # Swap the stint's old contribution to the pooled sums for its new one
+        self.sxx -= stint.sxx
+        self.sxy -= stint.sxy
+        self.syy -= stint.syy
+        stint.add(lap, wear)
+        self.sxx += stint.sxx
+        self.sxy += stint.sxy
+        self.syy += stint.syy
+        self.n += 1
+
+    @property
+    def wear_rate(self):
+        """Wear per lap in percentage points."""
+        return self.sxy / self.sxx if self.sxx > 0 else 0.0
+
+    @property
+    def degrees_of_freedom(self):
+        return self.n - len(self.stints) - 1
+
+    @property
+    def wear_rate_error(self):
+        """Standard error of wear_rate, None until there are more points than lines to fit."""
+        if self.sxx <= 0 or self.degrees_of_freedom <= 0:
+            return None
+        residual = max(0.0, self.syy - self.wear_rate * self.sxy) / self.degrees_of_freedom
+        return math.sqrt(residual / self.sxx)
+
+    @property
+    def r_squared(self):
+        if self.sxx <= 0 or self.syy <= 0:
+            return 0.0
+        return min(1.0, self.sxy * self.sxy / (self.sxx * self.syy))
+
+
+class StintProjection:
+    def __init__(self, tire_type, lap, wear, wear_rate, wear_rate_error, r_squared):
+        self.tire_type = tire_type
+        self.wear_rate = wear_rate
+        self.wear_rate_error = wear_rate_error
+        self.r_squared = r_squared
+        self.laps_left = (100 - wear) / wear_rate
+        self.end_lap = lap + self.laps_left
+        # 95% range of the end lap from the uncertainty in the wear rate
+        if wear_rate_error is not None:
+            fastest = wear_rate + 1.96 * wear_rate_error
+            slowest = wear_rate - 1.96 * wear_rate_error
+            self.end_lap_low = lap + (100 - wear) / fastest
+            self.end_lap_high = lap + (100 - wear) / slowest if slowest > 0 else math.inf
+        else:
+            self.end_lap_low = self.end_lap_high = None
+
+    @property
+    def confidence(self):
+        """Share of the wear variation the fit explains, 0 to 1."""
+        return self.r_squared
+
+
 class RaceStrategyAdvisor:
     def __init__(self):
-        self.practice_data = []  # stores (lap, tire_type, avg_wear)
-        self.race_data = []      # stores (lap, tire_type, avg_wear)
+        self.practice_wear = {}  # tire type -> CompoundWear
+        self.race_wear = {}      # tire type -> CompoundWear
+        self.practice_compound = None  # CompoundWear of the last practice lap
+        self.race_stint = None         # CompoundWear of the race stint being driven
+
+    @staticmethod
+    def _add(compounds, current, lap, tire_type, wear):
+        compound = compounds.get(tire_type)
+        if compound is None:
+            compound = compounds[tire_type] = CompoundWear(tire_type)
+        stint = compound.stints[-1] if compound.stints else None
+        # A new stint starts after another compound, when the wear drops (fresh
+        # set) and when the lap count goes back (new session)
+        if compound is not current or stint is None or wear < stint.last_wear or lap <= stint.last_lap:
+            compound.start_stint()
+        compound.add(lap, wear)
+        return compound
 
     def add_practice_lap(self, lap, tire_type, tire_snapshot):
-        avg_wear = (tire_snapshot.average_front() + tire_snapshot.average_rear()) / 2
-        self.practice_data.append((lap, tire_type, avg_wear))
+        self.practice_compound = self._add(self.practice_wear, self.practice_compound,
+                                           lap, tire_type, average_wear(tire_snapshot))
 
     def add_race_lap(self, lap, tire_type, tire_snapshot):
-        avg_wear = (tire_snapshot.average_front() + tire_snapshot.average_rear()) / 2
-        self.race_data.append((lap, tire_type, avg_wear))
+        self.race_stint = self._add(self.race_wear, self.race_stint, lap, tire_type, average_wear(tire_snapshot))
 
     def estimate_wear_rates(self):
         """Estimates wear per lap for each tire type from practice data."""
-        wear_rates = {}
-        type_data = {}
-        for _, tire_type, wear in self.practice_data:
-            if tire_type not in type_data:
-                type_data[tire_type] = []
-            type_data[tire_type].append(wear)
-
-        for tire_type, wears in type_data.items():
-            if len(wears) > 1:
-                avg_delta = (max(wears) - min(wears)) / len(wears)
-                wear_rates[tire_type] = avg_delta
-            else:
-                wear_rates[tire_type] = 0.0
-
-        return wear_rates
+        return {tire_type: compound.wear_rate for tire_type, compound in self.practice_wear.items()}
+
+    def project_stint(self):
+        """StintProjection for the current race stint, None without a usable wear rate."""
+        if self.race_stint is None:
+            return None
+        stint = self.race_stint.stints[-1]
+        if stint.n < 2 or stint.slope <= 0:
+            return None
+        return StintProjection(self.race_stint.tire_type, stint.last_lap, stint.last_wear,
+                               stint.slope, stint.slope_error, stint.r_squared)
 
     def check_race_strategy(self, current_lap, pit_window_start, pit_window_end):
-        if not self.race_data:
+        if self.race_stint is None:
             return "Not enough data yet."
 
-        last_lap, tire_type, last_avg = self.race_data[-1]
-        previous = [entry for entry in self.race_data if entry[1] == tire_type]
-
-        if len(previous) < 2:
+        stint = self.race_stint.stints[-1]
+        if stint.n < 2:
             return "Collecting more data to provide tips..."
 
-        wear_deltas = [j[2] - i[2] for i, j in zip(previous[:-1], previous[1:]) if j[2] > i[2]]
-        avg_wear_per_lap = sum(wear_deltas) / len(wear_deltas)
-
-        if avg_wear_per_lap == 0:
+        if stint.slope <= 0:
             return "Tire wear stable."
 
-        projected_life = (100 - last_avg) / avg_wear_per_lap
+        projected_life = (100 - stint.last_wear) / stint.slope
 
         if current_lap + projected_life < pit_window_start:
             return "You're wearing tires too fast! You won't reach the pit window."
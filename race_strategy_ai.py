@@ -1,3 +1,9 @@
+import math
+
+from constants import *
+from strategy_simulator import CompoundModel, rank_strategies
+
+
 class RaceStrategyAI:
     def __init__(self):
         self.stint_wear = {}  # compound -> [wear per lap values]
@@ -24,6 +30,42 @@ class RaceStrategyAI:
         stint_lengths = self.simulate_stint_lengths()
         return sorted(stint_lengths.items(), key=lambda x: -x[1])  # longest first
 
+    def compound_models(self, pace_offsets=None):
+        """CompoundModels from the practice wear rates. Without explicit pace_offsets
+        (seconds per lap), compounds that wear faster are assumed to be faster."""
+        rates = {}
+        for compound, wears in self.stint_wear.items():
+            if not wears or sum(wears) <= 0:
+                continue
+            mean = sum(wears) / len(wears)
+            variance = sum((w - mean) ** 2 for w in wears) / (len(wears) - 1) if len(wears) > 1 else 0.0
+            rates[compound] = (mean, math.sqrt(variance))
+        if not rates:
+            return []
+        slowest_wear = min(mean for mean, _ in rates.values())
+        models = []
+        for compound, (mean, std) in rates.items():
+            if pace_offsets is not None and compound in pace_offsets:
+                pace = pace_offsets[compound]
+            else:
+                pace = -(mean - slowest_wear) * STRATEGY_PACE_PER_WEAR
+            models.append(CompoundModel(compound, mean, std, pace))
+        return models
+
+    def plan_race(self, total_laps, base_lap_time, current_lap=1, current_compound=None, current_wear=0.0,
+                  used_compounds=(), pace_offsets=None, **options):
+        """Ranked StrategyResults for the rest of the race, from current_lap to total_laps.
+
+        Extra options (max_stops, samples, pit_loss, safety_car_probability, workers, ...)
+        are passed on to strategy_simulator.rank_strategies.
+        """
+        models = self.compound_models(pace_offsets)
+        if not models:
+            return []
+        return rank_strategies(models, total_laps, base_lap_time, start_lap=current_lap,
+                               current_compound=current_compound, current_wear=current_wear,
+                               used_compounds=used_compounds, **options)
+
     def adapt_strategy(self, current_lap, current_wear, compound):
         # crude logic: warn if wear rate too high compared to practice
         practice_rates = self.stint_wear.get(compound, [])
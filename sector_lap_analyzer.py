@@ -1,26 +1,103 @@
+import math
+from array import array
+from collections import deque
+
+from constants import *
+
+# All statistics are kept as running accumulators so every update is O(1) and
+# every query is O(1), however long the session runs: Welford's mean/variance
+# over all laps, monotonic deques for the min/max of the last `window` laps,
+# and best sector times with their sum (the theoretical best lap).
+
+
+class RollingMinMax:
+    """Min and max of the last `size` values, each deque holding candidates in order."""
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.minimum = deque()  # (index, value), values increasing
+        self.maximum = deque()  # (index, value), values decreasing
+
+    def add(self, value):
+        index = self.count
+        self.count += 1
+        while self.minimum and self.minimum[-1][1] >= value:
+            self.minimum.pop()
+        self.minimum.append((index, value))
+        while self.maximum and self.maximum[-1][1] <= value:
+            self.maximum.pop()
+        self.maximum.append((index, value))
+        oldest = index - self.size + 1
+        if self.minimum[0][0] < oldest:
+            self.minimum.popleft()
+        if self.maximum[0][0] < oldest:
+            self.maximum.popleft()
+
+    def min(self):
+        return self.minimum[0][1] if self.minimum else None
+
+    def max(self):
+        return self.maximum[0][1] if self.maximum else None
+
+    def range(self):
+        return self.maximum[0][1] - self.minimum[0][1] if self.minimum else 0.0
+
+
 class PerformanceAnalyzer:
-    def __init__(self):
+    def __init__(self, window=CONSISTENCY_WINDOW):
         self.best_sector_times = {}  # key: sector number, value: time in seconds
         self.best_lap_time = float('inf')
         self.last_lap_time = 0.0
-        self.lap_times = []
+        self.lap_count = 0
+        self.mean_lap_time = 0.0
+        self._m2 = 0.0  # Welford sum of squared differences from the mean
+        self.recent = RollingMinMax(window)
+        self._report = None
 
     def update_sector(self, sector_snapshot):
-        if sector_snapshot.sector not in self.best_sector_times or \
-           sector_snapshot.time < self.best_sector_times[sector_snapshot.sector]:
-            self.best_sector_times[sector_snapshot.sector] = sector_snapshot.time
+        self.update_sector_time(sector_snapshot.sector, sector_snapshot.time)
+
+    def update_sector_time(self, sector, time):
+        if time <= 0:
+            return
+        if sector not in self.best_sector_times or time < self.best_sector_times[sector]:
+            self.best_sector_times[sector] = time
+            self._report = None
 
     def update_lap(self, lap_snapshot):
-        self.last_lap_time = lap_snapshot.time
-        self.lap_times.append(lap_snapshot.time)
-        if lap_snapshot.time < self.best_lap_time:
-            self.best_lap_time = lap_snapshot.time
+        self.update_lap_time(lap_snapshot.time)
+
+    def update_lap_time(self, lap_time):
+        self.last_lap_time = lap_time
+        self.lap_count += 1
+        delta = lap_time - self.mean_lap_time
+        self.mean_lap_time += delta / self.lap_count
+        self._m2 += delta * (lap_time - self.mean_lap_time)
+        self.recent.add(lap_time)
+        if lap_time < self.best_lap_time:
+            self.best_lap_time = lap_time
+            self._report = None
+
+    @property
+    def lap_time_variance(self):
+        return self._m2 / (self.lap_count - 1) if self.lap_count > 1 else 0.0
+
+    @property
+    def lap_time_stddev(self):
+        return math.sqrt(self.lap_time_variance)
+
+    @property
+    def theoretical_best(self):
+        """Sum of the best sector times, once all three sectors have one."""
+        if len(self.best_sector_times) < 3:
+            return None
+        return sum(self.best_sector_times.values())
 
     def get_consistency_tip(self):
-        if len(self.lap_times) < 3:
+        if self.lap_count < 3:
             return "Need more laps to judge consistency."
-        avg = sum(self.lap_times) / len(self.lap_times)
-        variance = max(self.lap_times) - min(self.lap_times)
+        variance = self.recent.range()
         if variance < 0.3:
             return "Very consistent lap times. Good job!"
         elif variance < 1.0:
@@ -29,7 +106,49 @@ class PerformanceAnalyzer:
             return "High lap time variance. Focus on braking and throttle points."
 
     def report_best_times(self):
-        sector_report = ", ".join([
-            f"S{sector}: {time:.3f}s" for sector, time in sorted(self.best_sector_times.items())
-        ])
-        return f"Best Lap: {self.best_lap_time:.3f}s | Sectors: {sector_report}"
+        # Only rebuilt when a best time changed
+        if self._report is None:
+            sector_report = ", ".join([
+                f"S{sector}: {time:.3f}s" for sector, time in sorted(self.best_sector_times.items())
+            ])
+            self._report = f"Best Lap: {self.best_lap_time:.3f}s | Sectors: {sector_report}"
+        return self._report
+
+
+# One PerformanceAnalyzer per car, plus grid-wide arrays the GUI can read every
+# frame and the session's best sectors across all cars
+class GridPerformanceAnalyzer:
+    def __init__(self, num_cars=MAX_CARS, window=CONSISTENCY_WINDOW):
+        self.cars = [PerformanceAnalyzer(window) for _ in range(num_cars)]
+        self.best_lap_time = array('f', [math.inf] * num_cars)
+        self.last_lap_time = array('f', bytes(4 * num_cars))
+        self.mean_lap_time = array('f', bytes(4 * num_cars))
+        self.lap_time_stddev = array('f', bytes(4 * num_cars))
+        self.session_best = PerformanceAnalyzer(window)  # Best laps and sectors of any car
+
+    def update_lap_time(self, car_index, lap_time):
+        analyzer = self.cars[car_index]
+        analyzer.update_lap_time(lap_time)
+        self.best_lap_time[car_index] = analyzer.best_lap_time
+        self.last_lap_time[car_index] = lap_time
+        self.mean_lap_time[car_index] = analyzer.mean_lap_time
+        self.lap_time_stddev[car_index] = analyzer.lap_time_stddev
+        if lap_time < self.session_best.best_lap_time:
+            self.session_best.update_lap_time(lap_time)
+
+    def update_sector_time(self, car_index, sector, time):
+        self.cars[car_index].update_sector_time(sector, time)
+        self.session_best.update_sector_time(sector, time)
+
+    def update_from_lap(self, car_index, lap, lap_time):
+        """Feeds a completed LapClass, whose sector times are lap times at each sector start,
+        with its official lap time (lastLapTimeInMS) rather than the last current lap time seen."""
+        if lap_time <= 0:
+            return
+        sector2_start = lap.sectors[1].time
+        sector3_start = lap.sectors[2].time
+        if 0 < sector2_start < sector3_start < lap_time:
+            self.update_sector_time(car_index, 1, sector2_start)
+            self.update_sector_time(car_index, 2, sector3_start - sector2_start)
+            self.update_sector_time(car_index, 3, lap_time - sector3_start)
+        self.update_lap_time(car_index, lap_time)
@@ -0,0 +1,346 @@
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from constants import *
+
+# Index of every logged session in one SQLite database (WAL mode, so queries
+# can run while the listener writes). Sessions are recorded with their track,
+# session type and the paths of their log files; laps come from the game's own
+# session history (lap and sector times in ms, validity flags) with the visual
+# compound of the stint each lap was driven in, and stints are kept as well.
+#
+# Writes never touch the caller's thread: rows go onto a bounded queue and a
+# writer thread inserts them in batches of up to LOG_FLUSH_ROWS, one transaction
+# each. Track and session type are copied onto every lap row so the common
+# queries ("fastest S2 on C4", optionally at one track) are answered from a
+# single index in order, without a join or a sort. Session history often arrives
+# before the first session packet; those rows are written with a NULL track and
+# session type and filled in when the session row is written.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_uid INTEGER PRIMARY KEY,
+    track_id INTEGER,
+    session_type INTEGER,
+    started_at REAL,
+    rig TEXT,
+    lap_log TEXT,
+    input_log TEXT
+);
+CREATE TABLE IF NOT EXISTS laps (
+    session_uid INTEGER,
+    car_index INTEGER,
+    lap_number INTEGER,
+    track_id INTEGER,
+    session_type INTEGER,
+    compound INTEGER,
+    lap_time_ms INTEGER,
+    sector1_ms INTEGER,
+    sector2_ms INTEGER,
+    sector3_ms INTEGER,
+    valid_flags INTEGER,
+    PRIMARY KEY (session_uid, car_index, lap_number)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stints (
+    session_uid INTEGER,
+    car_index INTEGER,
+    stint_index INTEGER,
+    track_id INTEGER,
+    session_type INTEGER,
+    end_lap INTEGER,
+    actual_compound INTEGER,
+    compound INTEGER,
+    PRIMARY KEY (session_uid, car_index, stint_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_by_track ON sessions (track_id, session_type);
+CREATE INDEX IF NOT EXISTS stints_by_compound ON stints (compound, track_id, session_type);
+"""
+
+TIME_COLUMNS = {0: 'lap_time_ms', 1: 'sector1_ms', 2: 'sector2_ms', 3: 'sector3_ms'}
+# lapValidFlags bits: lap, sector 1, sector 2, sector 3
+VALID_BITS = {0: 0x1, 1: 0x2, 2: 0x4, 3: 0x8}
+# Per time column: any compound, and by track
+INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS laps_{column} ON laps (compound, {column});\n"
+    f"CREATE INDEX IF NOT EXISTS laps_track_{column} ON laps (track_id, compound, {column});"
+    for column in TIME_COLUMNS.values()
+]
+
+CATALOGUE_SESSION = 'session'
+CATALOGUE_LAP = 'lap'
+CATALOGUE_STINT = 'stint'
+FLUSH = 'flush'
+CLOSE = 'close'
+
+BACKFILL = [
+    "UPDATE laps SET track_id = ?, session_type = ? WHERE session_uid = ? AND track_id IS NULL",
+    "UPDATE stints SET track_id = ?, session_type = ? WHERE session_uid = ? AND track_id IS NULL",
+]
+
+
+def _sql_uid(session_uid):
+    """m_sessionUID is unsigned 64 bit, SQLite integers are signed."""
+    return session_uid - 2 ** 64 if session_uid >= 2 ** 63 else session_uid
+
+
+def _session_uid(value):
+    return value + 2 ** 64 if value < 0 else value
+
+
+def compound_id(compound):
+    """Visual compound id from an id or a name such as 'C3' or 'Wet'."""
+    if compound is None or isinstance(compound, int):
+        return compound
+    for compound_id, name in TYRE_COMPOUND_MAP.items():
+        if name.lower() == compound.lower():
+            return compound_id
+    raise ValueError(f"Unknown tyre compound {compound!r}")
+
+
+def sector_ms(row, sector):
+    return row[f'sector{sector}MS'] + row[f'sector{sector}Min'] * 60000
+
+
+class SessionCatalogue:
+    def __init__(self, path=CATALOGUE_PATH, queue_size=LOG_QUEUE_SIZE, flush_rows=LOG_FLUSH_ROWS,
+                 flush_interval=LOG_FLUSH_INTERVAL):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.dropped_rows = 0
+        self.closed = False
+        self.sessions = {}  # session uid -> (track id, session type) of sessions seen by this process
+        self._local = threading.local()
+
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA + '\n'.join(INDEXES))
+        connection.commit()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="SessionCatalogue", daemon=True)
+        self.writer_thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @property
+    def connection(self):
+        """Read connection of the calling thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    # Recording, safe to call from the receive loop
+
+    def record_session(self, session_uid, track_id, session_type, rig=None, logger=None):
+        """Adds or updates a session; logger (a TelemetryLogger) links its CSV files."""
+        if self.sessions.get(session_uid) == (track_id, session_type):
+            return
+        self.sessions[session_uid] = (track_id, session_type)
+        lap_log = logger.lap_file_path if logger is not None else None
+        input_log = logger.input_file_path if logger is not None else None
+        self._enqueue(CATALOGUE_SESSION, (_sql_uid(session_uid), track_id, session_type, time.time(),
+                                          rig, lap_log, input_log))
+
+    def record_lap(self, session_uid, car_index, lap_number, row, compound):
+        """Adds or replaces a lap from a session history lap row (see LAP_HISTORY_FIELDS)."""
+        track_id, session_type = self.sessions.get(session_uid, (None, None))
+        self._enqueue(CATALOGUE_LAP, (
+            _sql_uid(session_uid), car_index, lap_number, track_id, session_type, compound,
+            row['lapTimeInMS'], sector_ms(row, 1), sector_ms(row, 2), sector_ms(row, 3), row['lapValidFlags']
+        ))
+
+    def record_stint(self, session_uid, car_index, stint_index, row):
+        track_id, session_type = self.sessions.get(session_uid, (None, None))
+        self._enqueue(CATALOGUE_STINT, (
+            _sql_uid(session_uid), car_index, stint_index, track_id, session_type,
+            row['endLap'], row['actualTyre'], row['visualTyre']
+        ))
+
+    def record_history_change(self, session_uid, change, history):
+        """SessionHistoryStore change hook: completed laps and stints go into the catalogue."""
+        if change.kind == 'lap':
+            if change.row['lapTimeInMS'] > 0:
+                self.record_lap(session_uid, change.car_index, change.index, change.row,
+                                self.lap_compound(history.stints[change.car_index], change.index))
+        elif change.kind == 'stint' and change.row['visualTyre']:
+            self.record_stint(session_uid, change.car_index, change.index, change.row)
+
+    @staticmethod
+    def lap_compound(stints, lap_number):
+        """Visual compound of the stint a lap was driven in; the last stint's endLap is 255."""
+        for stint in stints:
+            if lap_number <= stint['endLap']:
+                return stint['visualTyre']
+        return stints[-1]['visualTyre'] if stints else None
+
+    def _enqueue(self, kind, row):
+        if self.closed:
+            raise ValueError("Session catalogue is closed.")
+        try:
+            self.queue.put_nowait((kind, row))
+        except queue.Full:
+            self.dropped_rows += 1
+
+    def flush(self, timeout=None):
+        """Blocks until every row queued so far is committed."""
+        done = threading.Event()
+        self.queue.put((FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put((CLOSE, None))
+        self.writer_thread.join(timeout)
+
+    def _writer_loop(self):
+        connection = self._connect()
+        statements = {
+            CATALOGUE_SESSION: "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            CATALOGUE_LAP: "INSERT OR REPLACE INTO laps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            CATALOGUE_STINT: "INSERT OR REPLACE INTO stints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        }
+        pending = {kind: [] for kind in statements}
+        pending_count = 0
+        last_flush = time.monotonic()
+
+        def write_pending():
+            backfill = [(track_id, session_type, session_uid)
+                        for session_uid, track_id, session_type, *_ in pending[CATALOGUE_SESSION]]
+            with connection:
+                for kind, rows in pending.items():
+                    if rows:
+                        connection.executemany(statements[kind], rows)
+                        rows.clear()
+                if backfill:
+                    for statement in BACKFILL:
+                        connection.executemany(statement, backfill)
+
+        try:
+            while True:
+                try:
+                    kind, payload = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    kind, payload = None, None
+
+                if kind in pending:
+                    pending[kind].append(payload)
+                    pending_count += 1
+
+                now = time.monotonic()
+                if kind in (FLUSH, CLOSE) or pending_count >= self.flush_rows or \
+                   now - last_flush >= self.flush_interval:
+                    if pending_count:
+                        write_pending()
+                    pending_count = 0
+                    last_flush = now
+
+                if kind == FLUSH:
+                    payload.set()
+                elif kind == CLOSE:
+                    break
+        finally:
+            connection.close()
+
+    # Queries
+
+    def fastest(self, sector=0, compound=None, track_id=None, session_type=None, valid_only=True, limit=1):
+        """Fastest laps (sector 0) or sector times as dicts, optionally on one compound,
+        track and session type. Only times the game flagged valid unless valid_only is False."""
+        column = TIME_COLUMNS[sector]
+        compound = compound_id(compound)
+        if compound is None:
+            # The indexes lead with the compound: read the best of every compound
+            # in index order and merge, instead of sorting the whole table
+            rows = []
+            for compound in TYRE_COMPOUND_MAP:
+                rows.extend(self.fastest(sector, compound, track_id, session_type, valid_only, limit))
+            return sorted(rows, key=lambda row: row[column])[:limit]
+
+        conditions = [f"{column} > 0", "compound = ?"]
+        params = [compound]
+        if track_id is not None:
+            conditions.append("track_id = ?")
+            params.append(track_id)
+        if session_type is not None:
+            conditions.append("session_type = ?")
+            params.append(session_type)
+        if valid_only:
+            conditions.append(f"valid_flags & {VALID_BITS[sector]}")
+        cursor = self.connection.execute(
+            f"SELECT * FROM laps WHERE {' AND '.join(conditions)} ORDER BY {column} LIMIT ?", (*params, limit)
+        )
+        return self._rows(cursor)
+
+    def find_sessions(self, track_id=None, session_type=None):
+        conditions = []
+        params = []
+        if track_id is not None:
+            conditions.append("track_id = ?")
+            params.append(track_id)
+        if session_type is not None:
+            conditions.append("session_type = ?")
+            params.append(session_type)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._rows(self.connection.execute(f"SELECT * FROM sessions {where} ORDER BY started_at", params))
+
+    def find_stints(self, compound, track_id=None, session_type=None):
+        """Every stint on a compound, e.g. find_stints('C3', track_id=10, session_type=8)."""
+        conditions = ["compound = ?"]
+        params = [compound_id(compound)]
+        if track_id is not None:
+            conditions.append("track_id = ?")
+            params.append(track_id)
+        if session_type is not None:
+            conditions.append("session_type = ?")
+            params.append(session_type)
+        return self._rows(self.connection.execute(
+            f"SELECT * FROM stints WHERE {' AND '.join(conditions)}", params
+        ))
+
+    def session_laps(self, session_uid, car_index=None):
+        query = "SELECT * FROM laps WHERE session_uid = ?"
+        params = [_sql_uid(session_uid)]
+        if car_index is not None:
+            query += " AND car_index = ?"
+            params.append(car_index)
+        return self._rows(self.connection.execute(query + " ORDER BY car_index, lap_number", params))
+
+    @staticmethod
+    def _rows(cursor):
+        names = [column[0] for column in cursor.description]
+        rows = []
+        for values in cursor:
+            row = dict(zip(names, values))
+            row['session_uid'] = _session_uid(row['session_uid'])
+            rows.append(row)
+        return rows
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Query the session catalogue")
+    arg_parser.add_argument('--db', default=CATALOGUE_PATH)
+    arg_parser.add_argument('--sector', type=int, default=0, choices=[0, 1, 2, 3], help="0 for whole laps")
+    arg_parser.add_argument('--compound', help="Visual compound, e.g. C4")
+    arg_parser.add_argument('--track', type=int, help="Track id")
+    arg_parser.add_argument('--session-type', type=int)
+    arg_parser.add_argument('--limit', type=int, default=10)
+    args = arg_parser.parse_args()
+
+    catalogue = SessionCatalogue(args.db)
+    for row in catalogue.fastest(args.sector, args.compound, args.track, args.session_type, limit=args.limit):
+        print(row)
+    catalogue.close()
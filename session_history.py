@@ -0,0 +1,112 @@
+from constants import *
+from packet_layouts import get_layouts, LAP_HISTORY_FIELDS, TYRE_STINT_FIELDS
+from packet_views import PACKET_ID_OFFSET, SESSION_UID_STRUCT, SESSION_UID_OFFSET
+
+# Session history packets (id 11) carry the whole lap and stint history of one
+# car, and the game cycles them through every car all session long. Usually at
+# most the last lap row has changed since that car's previous packet, so the
+# store keeps each car's raw lap and stint bytes and compares them first: only
+# the used rows (numLaps, numTyreStints) are looked at, rows before the last
+# cached one are checked with a single bytes comparison, and only rows that are
+# new or differ are unpacked into dicts and reported as HistoryChanges.
+
+SESSION_HISTORY_ID = 11
+
+
+class HistoryChange:
+    __slots__ = ('kind', 'car_index', 'index', 'row', 'new')
+
+    def __init__(self, kind, car_index, index, row, new):
+        self.kind = kind  # 'lap', 'stint' or 'best'
+        self.car_index = car_index
+        self.index = index  # Lap number (from 1) or stint index (from 0)
+        self.row = row
+        self.new = new  # False when an existing row was updated
+
+    def __repr__(self):
+        state = "new" if self.new else "updated"
+        return f"HistoryChange({self.kind} {self.index} of car {self.car_index}, {state}: {self.row})"
+
+
+class SessionHistoryStore:
+    def __init__(self, on_change=None):
+        self.on_change = on_change  # Called with every HistoryChange
+        self.packets = 0
+        self.rows_decoded = 0
+        self.reset()
+
+    def reset(self, session_uid=None):
+        self.session_uid = session_uid
+        self.laps = [[] for _ in range(MAX_CARS)]  # Decoded lap rows per car, lap n at n - 1
+        self.stints = [[] for _ in range(MAX_CARS)]
+        self.best = [None] * MAX_CARS  # (bestLapTimeLapNum, bestSector1LapNum, ...)
+        self._lap_bytes = [b''] * MAX_CARS
+        self._stint_bytes = [b''] * MAX_CARS
+
+    def update(self, packet):
+        """Bus hook for session history PacketViews."""
+        return self.update_buffer(packet.buffer)
+
+    def update_buffer(self, buffer):
+        """Takes one session history datagram, returns the list of HistoryChanges."""
+        if buffer[PACKET_ID_OFFSET] != SESSION_HISTORY_ID:
+            return []
+        session_uid = SESSION_UID_STRUCT.unpack_from(buffer, SESSION_UID_OFFSET)[0]
+        if session_uid != self.session_uid:
+            self.reset(session_uid)
+        self.packets += 1
+        layouts = get_layouts(buffer[0] | (buffer[1] << 8))[SESSION_HISTORY_ID]
+        car_index, num_laps, num_stints, *best = layouts['summary'].unpack(buffer)
+        if car_index >= MAX_CARS:
+            raise ValueError(f"Session history for car {car_index} out of range")
+
+        changes = []
+        self._update_rows('lap', car_index, layouts['lap'], LAP_HISTORY_FIELDS,
+                          num_laps, buffer, self.laps, self._lap_bytes, changes)
+        self._update_rows('stint', car_index, layouts['stint'], TYRE_STINT_FIELDS,
+                          num_stints, buffer, self.stints, self._stint_bytes, changes)
+        best = tuple(best)
+        if best != self.best[car_index]:
+            changes.append(HistoryChange('best', car_index, None, best, self.best[car_index] is None))
+            self.best[car_index] = best
+
+        if self.on_change is not None:
+            for change in changes:
+                self.on_change(change)
+        return changes
+
+    def _update_rows(self, kind, car_index, layout, fields, count, buffer, rows, cached_bytes, changes):
+        count = min(count, layout.count, max(0, (len(buffer) - layout.offset) // layout.size))
+        size = layout.size
+        current = memoryview(buffer)[layout.offset:layout.offset + count * size]
+        cached = cached_bytes[car_index]
+        if current == cached:
+            return
+
+        car_rows = rows[car_index]
+        if count < len(car_rows):
+            del car_rows[count:]  # History got shorter, e.g. after a restart
+        # Common case: every row but the last cached one is unchanged, so only
+        # that row and any new ones need comparing
+        first = max(0, min(len(cached), len(current)) // size - 1)
+        if current[:first * size] != cached[:first * size]:
+            first = 0
+
+        index_base = 1 if kind == 'lap' else 0
+        for i in range(first, count):
+            start = i * size
+            if i < len(car_rows) and current[start:start + size] == cached[start:start + size]:
+                continue
+            row = dict(zip(fields, layout.unpack(buffer, i)))
+            self.rows_decoded += 1
+            new = i >= len(car_rows)
+            if new:
+                car_rows.append(row)
+            else:
+                car_rows[i] = row
+            changes.append(HistoryChange(kind, car_index, i + index_base, row, new))
+        cached_bytes[car_index] = current.tobytes()
+
+    def lap(self, car_index, lap_number):
+        laps = self.laps[car_index]
+        return laps[lap_number - 1] if 0 < lap_number <= len(laps) else None
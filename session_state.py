@@ -0,0 +1,155 @@
+from array import array
+
+from constants import *
+from car import Car
+from sector_lap_analyzer import GridPerformanceAnalyzer
+
+
+def _grid_array(typecode, width=1):
+    return array(typecode, bytes(MAX_CARS * width * array(typecode).itemsize))
+
+
+# Live state for every car on the grid. The latest value of each channel is
+# kept struct-of-arrays (one typed array per channel, indexed by car index) so
+# strategy code can compare the whole grid cheaply; lap, sector and input
+# history stays on the per-car Car objects. A car's input history (retention
+# samples, ~1 MB at the default) is only allocated once lap data shows it on
+# track, so a reset or an idle multi-rig session does not pay for 22 of them.
+class SessionState:
+    def __init__(self, retention=CAR_DATA_RETENTION, on_lap_completed=None):
+        self.retention = retention
+        self.on_lap_completed = on_lap_completed
+        self.session_uid = None
+        self.reset()
+
+    def reset(self, session_uid=None):
+        self.session_uid = session_uid
+        self.player_index = 0
+        self.num_active_cars = MAX_CARS
+        self.track_length = 5000  # Default fallback value
+        self.session_type = 0  # Unknown until the first session packet
+        self.cars = [Car(car_index, self.retention) for car_index in range(MAX_CARS)]
+        self.performance = GridPerformanceAnalyzer()
+
+        self.current_lap_time = _grid_array('f')
+        self.last_lap_time = _grid_array('f')
+        self.lap_invalid = _grid_array('B')
+        self.lap_distance = _grid_array('f')
+        self.current_lap_num = _grid_array('B')
+        self.sector = _grid_array('B')
+        self.position = _grid_array('B')
+        self.speed = _grid_array('f')
+        self.throttle = _grid_array('f')
+        self.brake = _grid_array('f')
+        self.steer = _grid_array('f')
+        self.clutch = _grid_array('B')
+        self.gear = _grid_array('b')
+        self.tire_type = _grid_array('B')
+        self.tire_age_laps = _grid_array('b')
+        self.tire_wear = _grid_array('f', 4)  # FL, FR, RL, RR for each car
+        self.result_status = _grid_array('B')
+        self.active_cars = []  # Indices of cars with a resultStatus of RESULT_STATUS_ACTIVE or later
+
+        self.handlers = {
+            1: self.update_session,
+            2: self.update_lap_data,
+            4: self.update_participants,
+            6: self.update_car_telemetry,
+            7: self.update_car_status,
+            10: self.update_car_damage,
+        }
+
+    @property
+    def player_car(self):
+        return self.cars[self.player_index]
+
+    def car_tire_wear(self, car_index):
+        return self.tire_wear[car_index * 4:car_index * 4 + 4]
+
+    def update(self, packet):
+        session_uid = packet.session_uid
+        if session_uid != self.session_uid:
+            self.reset(session_uid)
+        player_index = packet.player_car_index
+        if player_index < MAX_CARS:  # 255 while spectating
+            self.player_index = player_index
+
+        handler = self.handlers.get(packet.packet_id)
+        if handler is not None:
+            handler(packet)
+
+    def update_session(self, packet):
+        session = packet.record('session')
+        self.track_length = session.trackLength
+        self.session_type = session.sessionType
+
+    def update_participants(self, packet):
+        self.num_active_cars = packet.record('numActiveCars').numActiveCars
+
+    def update_lap_data(self, packet):
+        active_cars = []
+        for car_index, record in enumerate(packet.cars()):
+            car = self.cars[car_index]
+            lap_time = record.currentLapTimeInMS / 1000.0
+            sector = record.sector
+            current_lap_num = record.currentLapNum
+            lap_was_invalid = self.lap_invalid[car_index]  # Of the lap before this packet
+
+            self.current_lap_time[car_index] = lap_time
+            self.last_lap_time[car_index] = record.lastLapTimeInMS / 1000.0
+            self.lap_invalid[car_index] = record.currentLapInvalid
+            self.lap_distance[car_index] = record.lapDistance
+            self.position[car_index] = record.carPosition
+            self.sector[car_index] = sector
+            self.current_lap_num[car_index] = current_lap_num
+            result_status = self.result_status[car_index] = record.resultStatus
+            if result_status >= RESULT_STATUS_ACTIVE:
+                active_cars.append(car_index)
+                car.activate()
+
+            car.update_lap_time(lap_time)
+            if sector != car.sector_number:
+                car.started_new_sector(sector)
+            if current_lap_num != car.lap.lap_number:
+                if car.lap.lap_number > 0 and not lap_was_invalid:
+                    self.performance.update_from_lap(car_index, car.lap, self.last_lap_time[car_index])
+                try:
+                    if self.on_lap_completed is not None:
+                        self.on_lap_completed(car)
+                finally:
+                    # A failing hook must not leave the car stuck on its old lap
+                    car.started_new_lap(current_lap_num)
+        self.active_cars = active_cars
+
+    def update_car_damage(self, packet):
+        for car_index, record in enumerate(packet.cars()):
+            tire_wear = record.tyresWear
+            self.tire_wear[car_index * 4:car_index * 4 + 4] = array('f', tire_wear)
+            self.cars[car_index].update_car_damage(tire_wear)
+
+    def update_car_status(self, packet):
+        for car_index, record in enumerate(packet.cars()):
+            self.tire_type[car_index] = record.visualTyreCompound
+            self.tire_age_laps[car_index] = record.tyresAgeLaps
+            self.cars[car_index].update_car_status(record.visualTyreCompound)
+
+    def update_car_telemetry(self, packet):
+        track_length = self.track_length
+        for car_index, record in enumerate(packet.cars()):
+            speed = record.speed
+            throttle = record.throttle
+            brake = record.brake
+            steer = record.steer
+            clutch = record.clutch
+            gear = record.gear
+
+            self.speed[car_index] = speed
+            self.throttle[car_index] = throttle
+            self.brake[car_index] = brake
+            self.steer[car_index] = steer
+            self.clutch[car_index] = clutch
+            self.gear[car_index] = gear
+            self.cars[car_index].update_car_inputs(
+                speed, throttle, brake, steer, clutch, gear,
+                self.lap_distance[car_index], track_length
+            )
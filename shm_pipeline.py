@@ -0,0 +1,292 @@
+import multiprocessing
+import socket
+import struct
+import time
+from multiprocessing import shared_memory
+from queue import Full
+
+from constants import *
+
+# Multi-process pipeline. A receiver process does nothing but recv_into the next
+# slot of a shared-memory ring; decoder processes each follow the ring with their
+# own cursor and feed a consumer, by default the normal TelemetryPipeline, so
+# e.g. logging and a second analysis can run on separate cores. Nothing ever waits on a
+# consumer: a reader that falls more than a full ring behind skips ahead and
+# counts the skipped datagrams as lost.
+#
+# Ring layout: header (write sequence, slot count, slot size), then fixed-size
+# slots of (sequence, length, datagram). A slot's sequence is set to SLOT_BUSY
+# while it is written and to the datagram's sequence number once complete, so
+# a reader can tell a finished slot from one overwritten while it was copied.
+
+RING_HEADER = struct.Struct('<QII')
+SLOT_HEADER = struct.Struct('<QH')
+SLOT_BUSY = 2 ** 64 - 1
+SLOT_SEQUENCE = struct.Struct('<Q')
+READER_IDLE_SLEEP = 0.0005  # seconds to sleep when the ring is empty
+
+
+class SharedPacketRing:
+    def __init__(self, name=None, slots=SHM_RING_SLOTS, slot_size=UDP_MAX_PACKET_SIZE):
+        """Creates a new ring, or attaches to an existing one when name is given."""
+        if name is None:
+            self.slot_stride = SLOT_HEADER.size + slot_size
+            self.shm = shared_memory.SharedMemory(create=True, size=RING_HEADER.size + slots * self.slot_stride)
+            self.owner = True
+            RING_HEADER.pack_into(self.shm.buf, 0, 0, slots, slot_size)
+        else:
+            # Child processes share the owner's resource tracker, so attaching does
+            # not make the segment go away when a child exits
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        _, self.slots, self.slot_size = RING_HEADER.unpack_from(self.shm.buf, 0)
+        self.slot_stride = SLOT_HEADER.size + self.slot_size
+        self.name = self.shm.name
+
+    @property
+    def write_sequence(self):
+        return RING_HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def _slot_offset(self, sequence):
+        return RING_HEADER.size + (sequence % self.slots) * self.slot_stride
+
+    def receive_from(self, sock):
+        """Receives one datagram from sock straight into the next slot."""
+        sequence = self.write_sequence
+        offset = self._slot_offset(sequence)
+        buf = self.shm.buf
+        SLOT_SEQUENCE.pack_into(buf, offset, SLOT_BUSY)
+        data_offset = offset + SLOT_HEADER.size
+        size = sock.recv_into(buf[data_offset:data_offset + self.slot_size])
+        self._publish(offset, sequence, size)
+        return size
+
+    def write(self, data):
+        sequence = self.write_sequence
+        offset = self._slot_offset(sequence)
+        buf = self.shm.buf
+        SLOT_SEQUENCE.pack_into(buf, offset, SLOT_BUSY)
+        size = min(len(data), self.slot_size)
+        data_offset = offset + SLOT_HEADER.size
+        buf[data_offset:data_offset + size] = data[:size]
+        self._publish(offset, sequence, size)
+
+    def _publish(self, offset, sequence, size):
+        SLOT_HEADER.pack_into(self.shm.buf, offset, sequence, size)
+        SLOT_SEQUENCE.pack_into(self.shm.buf, 0, sequence + 1)
+
+    def reader(self):
+        return RingReader(self)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Starts at the oldest datagram still in the ring, so a decoder that attaches a
+# moment after the receiver has started does not miss the first datagrams.
+class RingReader:
+    def __init__(self, ring):
+        self.ring = ring
+        self.next_sequence = max(0, ring.write_sequence - ring.slots)
+        self.lost_packets = 0
+        self.reported_lost = 0
+        self.last_report = time.monotonic()
+
+    @property
+    def backlog(self):
+        return self.ring.write_sequence - self.next_sequence
+
+    def read_batch(self, max_packets=UDP_BUFFER_POOL_SIZE):
+        """Copies out up to max_packets datagrams that have not been read yet."""
+        ring = self.ring
+        buf = ring.shm.buf
+        write_sequence = ring.write_sequence
+        if write_sequence - self.next_sequence > ring.slots:
+            # Lapped by the receiver: everything older than one ring is gone
+            skip_to = write_sequence - ring.slots
+            self.lost_packets += skip_to - self.next_sequence
+            self.next_sequence = skip_to
+
+        batch = []
+        while self.next_sequence < write_sequence and len(batch) < max_packets:
+            sequence = self.next_sequence
+            offset = ring._slot_offset(sequence)
+            slot_sequence, size = SLOT_HEADER.unpack_from(buf, offset)
+            data_offset = offset + SLOT_HEADER.size
+            data = bytes(buf[data_offset:data_offset + size])
+            if slot_sequence != sequence or SLOT_SEQUENCE.unpack_from(buf, offset)[0] != sequence:
+                self.lost_packets += 1  # Overwritten before or while it was copied
+            else:
+                batch.append(data)
+            self.next_sequence += 1
+        return batch
+
+    def report_overruns(self, name, interval=SHM_OVERRUN_REPORT_INTERVAL):
+        """Prints the datagrams lost since the last report, at most every interval seconds."""
+        now = time.monotonic()
+        if now - self.last_report < interval:
+            return
+        self.last_report = now
+        lost = self.lost_packets - self.reported_lost
+        if lost:
+            self.reported_lost = self.lost_packets
+            print(f"{name} lost {lost} packets to ring overruns in the last {interval:.0f}s "
+                  f"({self.lost_packets} in total)")
+
+    def add_gauges(self, stats):
+        stats.add_gauge("ring_lost_packets", lambda: self.lost_packets)
+        stats.add_gauge("ring_backlog", lambda: self.backlog)
+
+
+def receiver_main(ring_name, stop_event, ip=UDP_IP, port=UDP_PORT, rcvbuf=UDP_RCVBUF):
+    from listener import open_socket
+
+    ring = SharedPacketRing(ring_name)
+    sock = open_socket(ip, port, rcvbuf)
+    sock.settimeout(0.5)  # Wake up now and then to check stop_event
+    try:
+        while not stop_event.is_set():
+            try:
+                ring.receive_from(sock)
+            except socket.timeout:
+                continue
+            except ConnectionResetError:
+                continue  # Windows reports ICMP port unreachable on UDP sockets
+    finally:
+        sock.close()
+        ring.close()
+
+
+# Default decoder: the listener's TelemetryPipeline, logging and optional recording,
+# relaying (udp_relay.RelayDestinations or parse_destination strings) and cataloguing.
+# The logger is created here, in the decoder process, so its writer thread runs there.
+# With gui_queue (a multiprocessing.Queue), GUI updates go to the parent's TelemetryGUI.
+# With live_port, the decoder process serves its session state to dashboards on that port,
+# and with stats_port it counts and times every datagram and serves the stats there.
+# With lap_traces (car indices, empty for every car), completed laps are kept as lap traces.
+class TelemetryConsumer:
+    def __init__(self, record_path=None, relay_destinations=None, catalogue_path=None, gui_queue=None,
+                 live_port=None, stats_port=None, stats_interval=STATS_INTERVAL, lap_traces=None):
+        from capture import CaptureWriter
+        from data_logging import TelemetryLogger
+        from lap_traces import LapTraceStore
+        from listener import TelemetryPipeline
+        from live_server import LiveTelemetryServer
+        from session_catalogue import SessionCatalogue
+        from telemetry_stats import PipelineStats
+        from udp_relay import UdpRelay
+
+        self.logger = TelemetryLogger(columnar=True)
+        self.recorder = CaptureWriter(record_path) if record_path else None
+        self.relay = UdpRelay(relay_destinations) if relay_destinations else None
+        self.catalogue = SessionCatalogue(catalogue_path) if catalogue_path else None
+        self.live = LiveTelemetryServer(port=live_port).start() if live_port is not None else None
+        self.stats = None
+        self.stats_server = None
+        if stats_port is not None:
+            self.stats = PipelineStats()
+            self.stats_server = self.stats.serve(stats_port)
+            if stats_interval > 0:
+                self.stats.start_reporter(stats_interval)
+        self.lap_traces = LapTraceStore(car_indices=lap_traces or None) if lap_traces is not None else None
+        gui = GuiQueue(gui_queue) if gui_queue is not None else None
+        self.pipeline = TelemetryPipeline(self.recorder, self.logger, gui=gui, stats=self.stats,
+                                          lap_traces=self.lap_traces, live=self.live, relay=self.relay,
+                                          catalogue=self.catalogue)
+
+    def process_batch(self, batch):
+        self.pipeline.process_batch(batch)
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.relay is not None:
+            self.relay.close()
+        if self.catalogue is not None:
+            self.catalogue.close()
+        if self.live is not None:
+            self.live.stop()
+        if self.stats_server is not None:
+            self.stats_server.shutdown()
+        self.logger.close()
+
+
+# Stands in for the TelemetryGUI in a decoder process. Updates are dropped while
+# the queue is full rather than stalling the decoder on a slow GUI.
+class GuiQueue:
+    def __init__(self, queue):
+        self.queue = queue
+        self.dropped_updates = 0
+        # Exit without waiting for the GUI to take the last updates
+        queue.cancel_join_thread()
+
+    def post(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except Full:
+            self.dropped_updates += 1
+
+
+def decoder_main(ring_name, stop_event, consumer_class, consumer_args=()):
+    ring = SharedPacketRing(ring_name)
+    reader = ring.reader()
+    try:
+        consumer = consumer_class(*consumer_args)
+    except Exception:
+        # e.g. the live server port is taken: stop the whole pipeline rather than run without a decoder
+        stop_event.set()
+        ring.close()
+        raise
+    stats = getattr(consumer, 'stats', None)
+    if stats is not None:
+        reader.add_gauges(stats)
+    try:
+        while not stop_event.is_set():
+            batch = reader.read_batch()
+            if batch:
+                consumer.process_batch(batch)
+            else:
+                time.sleep(READER_IDLE_SLEEP)
+            reader.report_overruns(consumer_class.__name__)
+    finally:
+        if reader.lost_packets:
+            print(f"{consumer_class.__name__} lost {reader.lost_packets} packets to ring overruns")
+        consumer.close()
+        ring.close()
+
+
+def run_shm_pipeline(gui=None, record_path=None, consumers=None, stop_event=None, relay_destinations=None,
+                     catalogue_path=None, live_port=None, stats_port=None, stats_interval=STATS_INTERVAL,
+                     lap_traces=None):
+    """Runs the receiver and one process per (consumer_class, args) until stop_event is set.
+
+    Consumer classes must be importable by the child processes and provide
+    process_batch(datagrams) and close(). By default one TelemetryConsumer runs,
+    sending its GUI updates to gui when one is given.
+    """
+    gui_queue = None
+    if consumers is None:
+        if gui is not None:
+            gui_queue = multiprocessing.Queue(GUI_PENDING_UPDATES)
+            gui.add_source(gui_queue)
+        consumers = [(TelemetryConsumer, (record_path, relay_destinations, catalogue_path, gui_queue, live_port,
+                                           stats_port, stats_interval, lap_traces))]
+    ring = SharedPacketRing()
+    stop_event = stop_event if stop_event is not None else multiprocessing.Event()
+    processes = [multiprocessing.Process(target=receiver_main, args=(ring.name, stop_event),
+                                         name="F1TelemetryReceiver", daemon=True)]
+    for consumer_class, consumer_args in consumers:
+        processes.append(multiprocessing.Process(target=decoder_main,
+                                                 args=(ring.name, stop_event, consumer_class, consumer_args),
+                                                 name=f"F1Telemetry{consumer_class.__name__}", daemon=True))
+    for process in processes:
+        process.start()
+    try:
+        stop_event.wait()
+    finally:
+        stop_event.set()
+        for process in processes:
+            process.join(timeout=5)
+        ring.close()
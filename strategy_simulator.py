@@ -0,0 +1,205 @@
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only the strategy simulator needs it
+    np = None
+
+# Monte Carlo pit strategy simulator. Every candidate strategy (stop laps and
+# the compound of each stint) is one row of an array, and every simulated race
+# (sampled wear rates, pit loss and safety car laps) one column, so the race
+# time of all candidates in all races is computed with a handful of array
+# operations. All candidates see the same sampled races, which makes the
+# ranking far less noisy than the sample count alone would suggest.
+#
+# Lap time on a stint grows linearly with tyre wear: lap i of a stint starting
+# at wear w0 with wear rate r costs base + pace + degradation * (w0 + r * i),
+# plus a cliff penalty for every lap driven above STRATEGY_CLIFF_WEAR. Sums
+# over a stint are taken in closed form, so the cost does not depend on race
+# length. A stop made under the safety car costs only a fraction of the pit
+# loss.
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The strategy simulator requires numpy.")
+
+
+class CompoundModel:
+    def __init__(self, compound, wear_rate, wear_rate_std=0.0, pace_offset=0.0,
+                 degradation=STRATEGY_DEGRADATION):
+        self.compound = compound
+        self.wear_rate = wear_rate  # % per lap
+        self.wear_rate_std = wear_rate_std
+        self.pace_offset = pace_offset  # seconds per lap relative to the base lap time
+        self.degradation = degradation  # seconds per lap per % of wear
+
+
+class StrategyResult:
+    __slots__ = ('stop_laps', 'compounds', 'expected_time', 'std_time', 'p10_time', 'p90_time')
+
+    def __init__(self, stop_laps, compounds, expected_time, std_time, p10_time, p90_time):
+        self.stop_laps = stop_laps
+        self.compounds = compounds
+        self.expected_time = expected_time
+        self.std_time = std_time
+        self.p10_time = p10_time
+        self.p90_time = p90_time
+
+    def __repr__(self):
+        stops = ", ".join(f"L{lap}" for lap in self.stop_laps) or "no stop"
+        compounds = "-".join(TYRE_COMPOUND_MAP.get(compound, str(compound)) for compound in self.compounds)
+        return (f"{compounds} ({stops}): {self.expected_time:.1f}s "
+                f"+-{self.std_time:.1f} [{self.p10_time:.1f}, {self.p90_time:.1f}]")
+
+
+def _stop_lap_choices(start_lap, total_laps, stops, min_stint, lap_step):
+    """All combinations of `stops` stop laps leaving every stint at least min_stint laps."""
+    choices = range(start_lap + min_stint - 1, total_laps - min_stint + 1, lap_step)
+    combinations = list(itertools.combinations(choices, stops))
+    combinations = np.array(combinations, dtype=np.int32).reshape(len(combinations), stops)
+    if stops > 1:
+        combinations = combinations[(np.diff(combinations, axis=1) >= min_stint).all(axis=1)]
+    return combinations
+
+
+def _count_stop_laps(start_lap, total_laps, stops, min_stint, lap_step):
+    choices = len(range(start_lap + min_stint - 1, total_laps - min_stint + 1, lap_step))
+    return math.comb(choices, stops)
+
+
+def generate_candidates(compounds, start_lap, total_laps, max_stops=STRATEGY_MAX_STOPS, min_stint=STRATEGY_MIN_STINT,
+                        lap_step=None, current_compound=None, used_compounds=(), two_compound_rule=True):
+    """Returns (stop_laps, stint_compounds) arrays of shape (candidates, max_stops) and
+    (candidates, max_stops + 1), unused stops marked -1 and padded with the last compound.
+
+    Without a lap_step, stop laps are spaced as closely as STRATEGY_MAX_CANDIDATES allows.
+    """
+    if lap_step is None:
+        lap_step = 1
+        while sum(_count_stop_laps(start_lap, total_laps, stops, min_stint, lap_step)
+                  * len(compounds) ** (stops + 1) for stops in range(max_stops + 1)) > STRATEGY_MAX_CANDIDATES:
+            lap_step += 1
+    stop_blocks = []
+    compound_blocks = []
+    for stops in range(max_stops + 1):
+        stop_laps = _stop_lap_choices(start_lap, total_laps, stops, min_stint, lap_step)
+        sequences = [sequence for sequence in itertools.product(compounds, repeat=stops + 1)
+                     if (current_compound is None or sequence[0] == current_compound)
+                     and (not two_compound_rule or len(set(sequence) | set(used_compounds)) >= 2)]
+        if len(stop_laps) == 0 or not sequences:
+            continue
+        sequences = np.array([list(sequence) + [sequence[-1]] * (max_stops - stops) for sequence in sequences])
+        padding = np.full((len(stop_laps), max_stops - stops), -1, dtype=np.int32)
+        stop_laps = np.concatenate([stop_laps, padding], axis=1)
+        # Every stop lap combination with every compound sequence
+        stop_blocks.append(np.repeat(stop_laps, len(sequences), axis=0))
+        compound_blocks.append(np.tile(sequences, (len(stop_laps), 1)))
+    if not stop_blocks:
+        return np.zeros((0, max_stops), dtype=np.int32), np.zeros((0, max_stops + 1), dtype=np.int32)
+    return np.concatenate(stop_blocks), np.concatenate(compound_blocks)
+
+
+def sample_races(models, total_laps, samples, pit_loss, pit_loss_std, safety_car_probability, seed=None):
+    """Draws the random part of `samples` races: wear rate per compound, pit loss and safety car laps."""
+    rng = np.random.default_rng(seed)
+    wear_rates = np.stack([
+        np.maximum(rng.normal(model.wear_rate, model.wear_rate_std, samples), 0.01 * model.wear_rate + 1e-6)
+        for model in models
+    ])  # (compounds, samples)
+    pit_losses = np.maximum(rng.normal(pit_loss, pit_loss_std, samples), 0.0)
+    safety_car = rng.random((samples, total_laps + 1)) < safety_car_probability
+    return wear_rates, pit_losses, safety_car
+
+
+def simulate(stop_laps, stint_compounds, models, start_lap, total_laps, base_lap_time,
+             wear_rates, pit_losses, safety_car, current_wear=0.0):
+    """Race time from start_lap to the flag of every candidate in every sampled race, (candidates, samples)."""
+    compound_index = {model.compound: i for i, model in enumerate(models)}
+    indices = np.vectorize(compound_index.__getitem__, otypes=[np.int32])(stint_compounds)
+    pace = np.array([model.pace_offset for model in models])
+    degradation = np.array([model.degradation for model in models])
+
+    candidates = len(stop_laps)
+    max_stops = stop_laps.shape[1]
+    # Stint boundaries: a stint runs from the lap after the previous stop to its stop lap
+    ends = np.where(stop_laps >= 0, stop_laps, total_laps)
+    ends = np.concatenate([ends, np.full((candidates, 1), total_laps)], axis=1)
+    starts = np.concatenate([np.full((candidates, 1), start_lap - 1), ends[:, :-1]], axis=1)
+    lengths = (ends - starts).astype(np.float64)  # (candidates, stints), 0 for unused stints
+    initial_wear = np.zeros(lengths.shape)
+    initial_wear[:, 0] = current_wear
+
+    times = np.zeros((candidates, wear_rates.shape[1]))
+    for stint in range(max_stops + 1):
+        n = lengths[:, stint, None]
+        compound = indices[:, stint]
+        rate = wear_rates[compound]  # (candidates, samples)
+        w0 = initial_wear[:, stint, None]
+        # sum over i = 1..n of (w0 + rate * i), and the laps spent above the cliff
+        wear_sum = n * w0 + rate * n * (n + 1) / 2
+        laps_before_cliff = np.clip(np.floor((STRATEGY_CLIFF_WEAR - w0) / rate), 0, None)
+        cliff_laps = np.maximum(n - laps_before_cliff, 0)
+        times += n * (base_lap_time + pace[compound, None]) + degradation[compound, None] * wear_sum
+        times += STRATEGY_CLIFF_PENALTY * cliff_laps
+
+    for stop in range(max_stops):
+        laps = stop_laps[:, stop]
+        made = laps >= 0
+        under_safety_car = safety_car[:, np.where(made, laps, 0)].T  # (candidates, samples)
+        cost = pit_losses[None, :] * np.where(under_safety_car, STRATEGY_SAFETY_CAR_PIT_FACTOR, 1.0)
+        times += np.where(made[:, None], cost, 0.0)
+    return times
+
+
+def _simulate_chunk(args):
+    return simulate(*args)
+
+
+def rank_strategies(models, total_laps, base_lap_time, start_lap=1, current_compound=None, current_wear=0.0,
+                    used_compounds=(), max_stops=STRATEGY_MAX_STOPS, min_stint=STRATEGY_MIN_STINT, lap_step=None,
+                    samples=STRATEGY_SAMPLES, pit_loss=STRATEGY_PIT_LOSS, pit_loss_std=STRATEGY_PIT_LOSS_STD,
+                    safety_car_probability=STRATEGY_SAFETY_CAR_PROBABILITY, top=10, workers=None, seed=None):
+    """Simulates every candidate strategy and returns the `top` best as StrategyResults.
+
+    With workers, candidates are split over a process pool (same sampled races in
+    every process); otherwise everything runs in this process.
+    """
+    _require_numpy()
+    compounds = [model.compound for model in models]
+    stop_laps, stint_compounds = generate_candidates(
+        compounds, start_lap, total_laps, max_stops, min_stint, lap_step,
+        current_compound, used_compounds
+    )
+    if len(stop_laps) == 0:
+        return []
+    wear_rates, pit_losses, safety_car = sample_races(
+        models, total_laps, samples, pit_loss, pit_loss_std, safety_car_probability, seed
+    )
+    common = (models, start_lap, total_laps, base_lap_time, wear_rates, pit_losses, safety_car, current_wear)
+    # Bound the (candidates, samples) arrays to a few tens of MB per batch
+    batch = max(1, STRATEGY_BATCH_CELLS // samples)
+    batches = [(stop_laps[i:i + batch], stint_compounds[i:i + batch], *common)
+               for i in range(0, len(stop_laps), batch)]
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            times = np.concatenate(list(pool.map(_simulate_chunk, batches)))
+    else:
+        times = np.concatenate([_simulate_chunk(args) for args in batches])
+
+    expected = times.mean(axis=1)
+    order = np.argsort(expected)[:top]
+    spread = times[order].std(axis=1)
+    p10, p90 = np.percentile(times[order], [10, 90], axis=1)
+    results = []
+    for rank, i in enumerate(order):
+        stops = [int(lap) for lap in stop_laps[i] if lap >= 0]
+        results.append(StrategyResult(
+            stops, [stint_compounds[i][j].item() for j in range(len(stops) + 1)],
+            float(expected[i]), float(spread[rank]), float(p10[rank]), float(p90[rank])
+        ))
+    return results
@@ -1,7 +1,19 @@
+import queue
 import tkinter as tk
+from collections import deque
+
+from constants import *
+
+# The GUI is fed from the listener thread, but Tk may only be touched from the
+# thread running mainloop. Other threads call post(), which appends to a deque
+# (thread-safe, no lock); a root.after poll drains it at most frame_rate times a
+# second, merges everything that arrived since the last frame into one update
+# and only reconfigures canvas items whose value actually changed.
+# Other processes send updates through a multiprocessing.Queue registered with
+# add_source(); the same poll drains it.
 
 class TelemetryGUI:
-    def __init__(self):
+    def __init__(self, frame_rate=GUI_FRAME_RATE):
         self.root = tk.Tk()
         self.root.title("F1 Car Overview")
         self.root.geometry("400x500")
@@ -26,19 +38,67 @@ class TelemetryGUI:
             "FR": self.canvas.create_text(275, 170, text="", fill="white"),
             "RL": self.canvas.create_text(125, 450, text="", fill="white"),
             "RR": self.canvas.create_text(275, 450, text="", fill="white"),
-            "Tip": self.canvas.create_text(200, 470, text="", fill="white")
+            "Tip": self.canvas.create_text(200, 470, text="", fill="white"),
+            "Lap Tip": self.canvas.create_text(200, 490, text="", fill="white")
         }
 
+        self.frame_interval = max(1, int(1000 / frame_rate))  # ms
+        self.pending = deque(maxlen=GUI_PENDING_UPDATES)
+        self.sources = []  # multiprocessing queues of updates from other processes
+        self.item_options = {}  # item -> options last sent to the canvas
+        self.frames = 0
+        self.coalesced_updates = 0
+
+    def post(self, data):
+        """Queues an update from any thread; it is drawn on the next frame."""
+        self.pending.append(data)
+
+    def add_source(self, source):
+        """Registers a multiprocessing.Queue of updates, drained on every frame."""
+        self.sources.append(source)
+
+    def poll(self):
+        for source in self.sources:
+            while True:
+                try:
+                    self.pending.append(source.get_nowait())
+                except (queue.Empty, OSError, ValueError):
+                    break  # OSError/ValueError: the queue was closed
+        merged = None
+        while True:
+            try:
+                data = self.pending.popleft()
+            except IndexError:
+                break
+            if merged is None:
+                merged = dict(data)
+            else:
+                merged.update(data)
+                self.coalesced_updates += 1
+        if merged is not None:
+            self.update(merged)
+            self.frames += 1
+        self.root.after(self.frame_interval, self.poll)
+
+    def set_item(self, item, **options):
+        if self.item_options.get(item) != options:
+            self.canvas.itemconfig(item, **options)
+            self.item_options[item] = options
+
     def update(self, data):
         for tire in ["FL", "FR", "RL", "RR"]:
             wear = data.get(tire, None)
             if wear is not None:
-                color = self.get_wear_color(wear)
-                self.canvas.itemconfig(self.tires[tire], fill=color)
-                self.canvas.itemconfig(self.texts[tire], text=f"{tire}: {wear}%")
+                self.set_item(self.tires[tire], fill=self.get_wear_color(wear))
+                self.set_item(self.texts[tire], text=f"{tire}: {wear:.0f}%")
+
+        tip = data.get("Strategy Tip")
+        if tip is not None:
+            self.set_item(self.texts["Tip"], text=tip)
 
-        tip = data.get("Strategy Tip", "")
-        self.canvas.itemconfig(self.texts["Tip"], text=tip)
+        lap_tip = data.get("Lap Tip")
+        if lap_tip is not None:
+            self.set_item(self.texts["Lap Tip"], text=lap_tip)
 
     def get_wear_color(self, wear):
         if wear < 30:
@@ -49,4 +109,5 @@ class TelemetryGUI:
             return "red"
 
     def run(self):
+        self.root.after(self.frame_interval, self.poll)
         self.root.mainloop()
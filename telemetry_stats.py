@@ -0,0 +1,174 @@
+import json
+import struct
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import *
+from packet_views import PACKET_ID_OFFSET
+
+# Hot-path counters for the listener. Per packet id: datagrams, bytes, decode
+# errors and a histogram of decode/handle latency in power-of-two nanosecond
+# buckets. Datagrams lost on the way in are detected from gaps in
+# m_overallFrameIdentifier of the packet types the game sends every frame, and
+# gauges (queue depths etc.) are sampled whenever a snapshot is taken.
+#
+# Pipelines only record when they are given a PipelineStats, so with stats off
+# the hot path pays a single "is None" check per datagram.
+
+OVERALL_FRAME_STRUCT = struct.Struct('<I')
+OVERALL_FRAME_OFFSET = struct.calcsize('<HBBBBBQfI')
+LATENCY_BUCKETS = 40  # bucket i counts latencies below 2**i ns, the last one everything above
+PER_FRAME_PACKET_IDS = (0, 2, 6, 7, 10)  # sent every frame at the configured send rate
+
+
+class PacketTypeStats:
+    __slots__ = ('packets', 'bytes', 'errors', 'lost', 'total_ns', 'max_ns', 'histogram')
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.errors = 0
+        self.lost = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = array('Q', bytes(8 * LATENCY_BUCKETS))
+
+    def percentile_ns(self, fraction):
+        """Upper bound of the bucket holding the given fraction of latencies, capped at the max."""
+        target = fraction * self.packets
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** bucket, self.max_ns)
+        return 0
+
+    def snapshot(self):
+        return {
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'lost': self.lost,
+            'mean_us': self.total_ns / self.packets / 1e3 if self.packets else 0.0,
+            'p50_us': self.percentile_ns(0.5) / 1e3,
+            'p99_us': self.percentile_ns(0.99) / 1e3,
+            'max_us': self.max_ns / 1e3,
+            'histogram': {f"<{2 ** bucket}ns": count for bucket, count in enumerate(self.histogram) if count},
+        }
+
+
+class PipelineStats:
+    def __init__(self):
+        self.started = time.time()
+        self.packet_types = {}
+        self.short_packets = 0
+        self.errors = {}  # exception type name -> count
+        self.last_frame = {}  # packet id -> last m_overallFrameIdentifier
+        self.frame_step = {}  # packet id -> smallest frame step seen, the send interval
+        self.out_of_order = 0
+        self.gauges = {}
+
+    def _type_stats(self, packet_id):
+        stats = self.packet_types.get(packet_id)
+        if stats is None:
+            stats = self.packet_types[packet_id] = PacketTypeStats()
+        return stats
+
+    def record(self, data, elapsed_ns):
+        """Counts one handled datagram and the time it took to decode and handle."""
+        packet_id = data[PACKET_ID_OFFSET]
+        stats = self._type_stats(packet_id)
+        stats.packets += 1
+        stats.bytes += len(data)
+        stats.total_ns += elapsed_ns
+        if elapsed_ns > stats.max_ns:
+            stats.max_ns = elapsed_ns
+        stats.histogram[min(elapsed_ns.bit_length(), LATENCY_BUCKETS - 1)] += 1
+        if packet_id in PER_FRAME_PACKET_IDS:
+            self.check_frame(stats, packet_id, OVERALL_FRAME_STRUCT.unpack_from(data, OVERALL_FRAME_OFFSET)[0])
+
+    def check_frame(self, stats, packet_id, frame):
+        last = self.last_frame.get(packet_id)
+        if last is None:
+            self.last_frame[packet_id] = frame
+            return
+        step = frame - last
+        if step <= 0:
+            # A late datagram must not become the baseline, or the next one in
+            # order would be counted as a gap
+            self.out_of_order += 1
+            return
+        self.last_frame[packet_id] = frame
+        # At send rates below 60 Hz the game skips frames, so the smallest step
+        # seen so far is taken as the normal one
+        expected = min(step, self.frame_step.get(packet_id, step))
+        self.frame_step[packet_id] = expected
+        if step > expected:
+            stats.lost += step // expected - 1
+
+    def parse_error(self, packet_id, error):
+        self._type_stats(packet_id).errors += 1
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def add_gauge(self, name, read):
+        """Registers read(), sampled for every snapshot (e.g. a queue's qsize)."""
+        self.gauges[name] = read
+
+    def snapshot(self):
+        packet_types = {packet_id: stats.snapshot() for packet_id, stats in sorted(list(self.packet_types.items()))}
+        return {
+            'uptime_s': time.time() - self.started,
+            'packets': sum(stats['packets'] for stats in packet_types.values()),
+            'short_packets': self.short_packets,
+            'lost_packets': sum(stats['lost'] for stats in packet_types.values()),
+            'out_of_order': self.out_of_order,
+            'errors': dict(self.errors),
+            'gauges': {name: read() for name, read in self.gauges.items()},
+            'packet_types': packet_types,
+        }
+
+    def report(self):
+        snapshot = self.snapshot()
+        lines = [f"{snapshot['packets']} packets in {snapshot['uptime_s']:.0f}s, "
+                 f"{snapshot['lost_packets']} lost, {snapshot['out_of_order']} out of order, "
+                 f"{snapshot['short_packets']} too short, errors {snapshot['errors']}",
+                 ' '.join(f"{name}={value}" for name, value in snapshot['gauges'].items()),
+                 f"{'Id':>3} {'Packets':>9} {'Lost':>7} {'Errors':>7} {'Mean us':>9} {'p50 us':>9} {'p99 us':>9} {'Max us':>9}"]
+        for packet_id, stats in snapshot['packet_types'].items():
+            lines.append(f"{packet_id:>3} {stats['packets']:>9} {stats['lost']:>7} {stats['errors']:>7} {stats['mean_us']:>9.1f} "
+                         f"{stats['p50_us']:>9.1f} {stats['p99_us']:>9.1f} {stats['max_us']:>9.1f}")
+        return '\n'.join(lines)
+
+    def start_reporter(self, interval=STATS_INTERVAL, output=print):
+        """Calls output(report) every interval seconds from a daemon thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                output(self.report())
+        thread = threading.Thread(target=run, name="PipelineStatsReporter", daemon=True)
+        thread.start()
+        return thread
+
+    def serve(self, port=STATS_PORT, host='127.0.0.1'):
+        """Serves the snapshot as JSON on http://host:port/ from a daemon thread."""
+        stats = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(stats.snapshot(), indent=1).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep request lines out of the console
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="PipelineStatsServer", daemon=True).start()
+        print(f"Pipeline stats on http://{host}:{server.server_address[1]}/")
+        return server
@@ -0,0 +1,63 @@
+import math
+
+import pytest
+
+from lap_delta import LapDeltaTracker
+from session_state import SessionState
+
+TRACK_LENGTH = 1000
+
+
+def drive(state, tracker, cars, seconds, step=1.0):
+    """Moves every car in cars (index -> (lap, start time, speed in m/s)) for a
+    number of seconds of lap data, starting a new lap at the line."""
+    state.active_cars = sorted(cars)
+    for tick in range(int(seconds / step)):
+        for car_index, (lap, start, speed) in cars.items():
+            elapsed = start + tick * step
+            lap_time = TRACK_LENGTH / speed
+            lap_number = lap + int(elapsed // lap_time)
+            state.current_lap_num[car_index] = lap_number
+            state.current_lap_time[car_index] = elapsed % lap_time
+            state.lap_distance[car_index] = (elapsed % lap_time) * speed
+            state.last_lap_time[car_index] = lap_time if lap_number > lap else 0.0
+        tracker.update()
+
+
+@pytest.fixture
+def state():
+    state = SessionState(retention=16)
+    state.track_length = TRACK_LENGTH
+    return state
+
+
+def test_car_without_own_best_gets_session_delta(state):
+    tracker = LapDeltaTracker(state)
+    # Car 0 laps at 10 m/s; car 1 is only half way round its first lap, at 8 m/s
+    drive(state, tracker, {0: (1, 0.0, 10.0), 1: (1, 0.0, 8.0)}, 110)
+    assert tracker.session_best is tracker.best[0]
+    assert tracker.best[1] is None
+    assert math.isnan(tracker.delta[1])
+    # At 8 m/s car 1 loses 0.025 s per metre against the 10 m/s reference
+    distance = state.lap_distance[1]
+    assert tracker.session_delta[1] == pytest.approx(distance * (1 / 8 - 1 / 10), abs=0.05)
+    assert tracker.delta[0] == pytest.approx(0.0, abs=0.01)
+
+
+def test_only_active_cars_are_tracked(state):
+    tracker = LapDeltaTracker(state)
+    # Active cars need not sit at the lowest indices
+    drive(state, tracker, {3: (1, 0.0, 10.0), 17: (1, 0.0, 8.0)}, 110)
+    assert tracker.best[3] is not None
+    assert tracker.session_delta[17] > 0
+    for car_index in (0, 1, 2, 16):
+        assert math.isnan(tracker.session_delta[car_index])
+        assert len(tracker.lap_distances[car_index]) == 0
+
+
+def test_invalid_lap_is_no_reference(state):
+    tracker = LapDeltaTracker(state)
+    state.lap_invalid[0] = 1
+    drive(state, tracker, {0: (1, 0.0, 10.0)}, 110)
+    assert tracker.best[0] is None
+    assert tracker.session_best is None
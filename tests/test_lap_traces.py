@@ -0,0 +1,122 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lap_traces import LapComparison, LapTrace, LapTraceStore, distance_grid
+
+TRACK_LENGTH = 1000.0
+
+
+def lap_samples(speed, start=0.0, stop=TRACK_LENGTH, rate=60.0):
+    """Samples of a lap driven at speed(distance) m/s, the way CarDataBuffer records them."""
+    distance, lap_time = [start], [0.0]
+    while distance[-1] < stop:
+        distance.append(distance[-1] + speed(distance[-1]) / rate)
+        lap_time.append(lap_time[-1] + 1 / rate)
+    distance = np.array(distance, dtype=np.float32)
+    count = len(distance)
+    return {
+        'distance_around_track': distance,
+        'lap_time': np.array(lap_time, dtype=np.float32),
+        'speed': np.array([speed(d) * 3.6 for d in distance], dtype=np.float32),
+        'throttle': np.ones(count, dtype=np.float32),
+        'brake': np.zeros(count, dtype=np.float32),
+        'steer': np.zeros(count, dtype=np.float32),
+        'gear': np.minimum(8, 1 + (distance // 125)).astype(np.int8),
+    }
+
+
+def resample(samples, lap_number=1, step=1.0):
+    return LapTrace.resample(0, lap_number, samples, distance_grid(TRACK_LENGTH, step), TRACK_LENGTH)
+
+
+def test_resample_aligns_to_distance_grid():
+    trace = resample(lap_samples(lambda d: 50.0))
+    assert len(trace.distance) == 1000
+    assert trace.distance[1] - trace.distance[0] == 1.0
+    # 50 m/s, so 10 ms per grid point
+    assert trace.time[500] == pytest.approx(10.0, abs=0.02)
+    assert trace.lap_time == pytest.approx(19.98, abs=0.02)  # Time at the last grid point, 999 m
+    assert trace.speed[500] == pytest.approx(180.0)
+
+
+def test_gear_is_not_interpolated():
+    trace = resample(lap_samples(lambda d: 50.0))
+    assert set(np.unique(trace.gear)) == set(range(1, 9))
+    assert trace.gear[124] == 1
+    assert trace.gear[126] == 2
+
+
+def test_samples_from_previous_lap_are_skipped():
+    samples = lap_samples(lambda d: 50.0)
+    # Telemetry sent before the lap data of the new lap still has the old distance
+    stale = {name: np.concatenate((values[-3:], values)) for name, values in samples.items()}
+    stale['distance_around_track'][:3] = [999.0, 999.5, 1000.0]
+    trace = resample(stale)
+    assert trace.time[0] == pytest.approx(0.0, abs=0.02)
+
+
+def test_lap_joined_mid_way_is_rejected():
+    assert resample(lap_samples(lambda d: 50.0, start=300.0)) is None
+
+
+def test_comparison_finds_where_time_was_lost():
+    reference = resample(lap_samples(lambda d: 50.0))
+    # 25 m/s instead of 50 between 400 and 500 m: 4 s instead of 2 s
+    other = resample(lap_samples(lambda d: 25.0 if 400 <= d < 500 else 50.0), lap_number=2)
+    comparison = LapComparison(reference, other)
+    assert comparison.delta[-1] == pytest.approx(2.0, abs=0.05)
+    starts, lost = comparison.time_lost(100.0)
+    assert len(starts) == len(lost) == 10
+    assert lost.sum() == pytest.approx(comparison.delta[-1], abs=1e-5)
+    worst_start, worst_lost = comparison.worst_segments(1)[0]
+    assert worst_start == 400.0
+    assert worst_lost == pytest.approx(2.0, abs=0.05)
+
+
+def test_comparison_needs_same_grid():
+    coarse = resample(lap_samples(lambda d: 50.0), step=2.0)
+    fine = resample(lap_samples(lambda d: 50.0))
+    with pytest.raises(ValueError):
+        LapComparison(fine, coarse)
+
+
+def test_store_compares_every_lap_to_session_best():
+    store = LapTraceStore()
+    slow = resample(lap_samples(lambda d: 40.0), lap_number=1)
+    fast = resample(lap_samples(lambda d: 50.0), lap_number=2)
+    store.add(slow)
+    store.add(fast)
+    assert store.best() is fast
+    deltas = store.deltas_to_best()
+    assert deltas.shape == (2, 1000)
+    assert deltas[0, -1] == pytest.approx(5.0, abs=0.05)
+    assert not deltas[1].any()
+
+
+def test_pipeline_posts_where_player_lost_time(tmp_path):
+    from data_logging import TelemetryLogger
+    from listener import TelemetryPipeline
+
+    class Gui:
+        def __init__(self):
+            self.updates = []
+
+        def post(self, data):
+            self.updates.append(data)
+
+    gui = Gui()
+    pipeline = TelemetryPipeline(logger=TelemetryLogger(str(tmp_path)), gui=gui, lap_traces=LapTraceStore())
+    try:
+        store = pipeline.lap_traces
+        store.add(resample(lap_samples(lambda d: 50.0), lap_number=1))
+        pipeline.post_lap_tip(store.traces[0])
+        assert gui.updates == []  # The best lap itself
+        slower = resample(lap_samples(lambda d: 25.0 if 400 <= d < 500 else 50.0), lap_number=2)
+        store.add(slower)
+        pipeline.post_lap_tip(slower)
+        assert len(gui.updates) == 1
+        assert gui.updates[0]["Lap Tip"].startswith("Lost 1.9")
+        assert gui.updates[0]["Lap Tip"].endswith("s to your best lap at 400-500m")
+    finally:
+        pipeline.logger.close()
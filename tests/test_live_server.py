@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+
+import pytest
+
+from live_server import (LiveTelemetryServer, OPCODE_CLOSE, OPCODE_TEXT, WEBSOCKET_GUID, read_websocket_frame,
+                         snapshot_delta, websocket_frame)
+from session_state import SessionState
+
+
+def decode(frame):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(frame)
+        reader.feed_eof()
+        return await read_websocket_frame(reader)
+    return asyncio.run(read())
+
+
+def masked_frame(payload, opcode=OPCODE_TEXT):
+    """A client frame as browsers send it: always masked."""
+    mask = os.urandom(4)
+    masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    if len(payload) < 126:
+        header = struct.pack('!BB', 0x80 | opcode, 0x80 | len(payload))
+    else:
+        header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, len(payload))
+    return header + mask + masked
+
+
+@pytest.mark.parametrize('length', [0, 5, 125, 126, 65535, 65536, 100000])
+def test_frame_round_trip(length):
+    payload = os.urandom(length)
+    frame = websocket_frame(payload)
+    assert frame[0] == 0x80 | OPCODE_TEXT
+    assert len(frame) - len(payload) == (2 if length < 126 else 4 if length < 65536 else 10)
+    assert decode(frame) == (OPCODE_TEXT, payload)
+
+
+@pytest.mark.parametrize('length', [3, 300])
+def test_masked_client_frame(length):
+    payload = os.urandom(length)
+    assert decode(masked_frame(payload, OPCODE_CLOSE)) == (OPCODE_CLOSE, payload)
+
+
+def snapshot(*cars, session_uid=1):
+    return {'session': {'session_uid': session_uid, 'track_length': 5000},
+            'cars': [dict(car) for car in cars]}
+
+
+def test_delta_of_identical_snapshots_is_none():
+    car = {'position': 1, 'speed': 200}
+    assert snapshot_delta(snapshot(car), snapshot(car)) is None
+
+
+def test_delta_has_only_changed_fields():
+    before = snapshot({'position': 1, 'speed': 200}, {'position': 2, 'speed': 190})
+    after = snapshot({'position': 1, 'speed': 210}, {'position': 2, 'speed': 190})
+    assert snapshot_delta(before, after) == {'cars': {'0': {'speed': 210}}}
+
+
+def test_delta_of_added_cars_is_complete():
+    car = {'position': 1, 'speed': 200}
+    added = {'position': 2, 'speed': 150}
+    assert snapshot_delta(snapshot(car), snapshot(car, added)) == {'cars': {'1': added}}
+
+
+def test_delta_lists_removed_cars():
+    cars = [{'position': i, 'speed': 100} for i in range(4)]
+    assert snapshot_delta(snapshot(*cars), snapshot(*cars[:2])) == {'removed': [2, 3]}
+
+
+def test_delta_of_session_fields():
+    car = {'position': 1}
+    assert snapshot_delta(snapshot(car), snapshot(car, session_uid=2)) == {'session': {'session_uid': 2}}
+
+
+@pytest.fixture
+def server():
+    state = SessionState()
+    state.reset(42)
+    server = LiveTelemetryServer(port=0)
+    server.attach(state)
+    server.start()
+    yield server
+    server.stop()
+
+
+def request(server, path, key=True):
+    with socket.create_connection((server.host, server.port), timeout=5) as sock:
+        headers = f"GET {path} HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        if key:
+            headers += "Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+        sock.sendall((headers + "\r\n").encode())
+        response = b''
+        while b'\r\n\r\n' not in response:
+            data = sock.recv(4096)
+            if not data:
+                break
+            response += data
+        return response
+
+
+@pytest.mark.parametrize('path, key', [('/ws', False), ('/ws?rate=nan', True), ('/ws?rate=inf', True),
+                                       ('/ws?rate=fast', True)])
+def test_bad_upgrade_requests_get_400(server, path, key):
+    assert request(server, path, key).startswith(b'HTTP/1.1 400 ')
+
+
+def test_websocket_handshake_and_first_frame(server):
+    key = b"dGhlIHNhbXBsZSBub25jZQ=="
+    accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+    with socket.create_connection((server.host, server.port), timeout=5) as sock:
+        sock.sendall(b"GET /ws?rate=5 HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+                     b"Connection: Upgrade\r\nSec-WebSocket-Key: " + key + b"\r\n\r\n")
+        stream = sock.makefile('rb')
+        assert stream.readline().startswith(b'HTTP/1.1 101 ')
+        headers = []
+        while True:
+            line = stream.readline().strip()
+            if not line:
+                break
+            headers.append(line)
+        assert b"Sec-WebSocket-Accept: " + accept in headers
+        first, second = stream.read(2)
+        assert first == 0x80 | OPCODE_TEXT
+        length = second if second < 126 else struct.unpack('!H', stream.read(2))[0]
+        state = json.loads(stream.read(length))
+        assert state['session']['session_uid'] == 42
+        sock.sendall(masked_frame(b'', OPCODE_CLOSE))
+        sock.shutdown(socket.SHUT_RDWR)
+        stream.close()
+
+
+def test_port_in_use_raises_instead_of_hanging():
+    with socket.socket() as taken:
+        taken.bind(('127.0.0.1', 0))
+        taken.listen()
+        server = LiveTelemetryServer(port=taken.getsockname()[1])
+        with pytest.raises(OSError):
+            server.start()
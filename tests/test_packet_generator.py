@@ -0,0 +1,61 @@
+from constants import *
+from packet_generator import PacketGenerator, PACKET_SIZES_2025, VISUAL_COMPOUNDS
+from packet_views import PacketView
+
+
+def test_every_packet_parses_with_header_fields():
+    generator = PacketGenerator(seed=1, session_uid=1234, player_car_index=3)
+    for packet_id, size in PACKET_SIZES_2025.items():
+        data = generator.packet(packet_id)
+        assert len(data) >= size
+        packet = PacketView(data)
+        assert packet.packet_id == packet_id
+        assert packet.session_uid == 1234
+        assert packet.player_car_index == 3
+
+
+def test_same_seed_gives_same_datagrams():
+    assert PacketGenerator(seed=7).frames(5) == PacketGenerator(seed=7).frames(5)
+    assert PacketGenerator(seed=7).frames(5) != PacketGenerator(seed=8).frames(5)
+
+
+def test_fields_stay_in_their_valid_ranges():
+    generator = PacketGenerator(seed=2)
+    for _ in range(20):
+        participants = PacketView(generator.packet(4))
+        assert 1 <= participants.record('numActiveCars').numActiveCars <= MAX_CARS
+        for car in PacketView(generator.packet(7)).cars():
+            assert car.visualTyreCompound in VISUAL_COMPOUNDS
+        for car in PacketView(generator.packet(6)).cars():
+            assert 0 <= car.throttle <= 1 and -1 <= car.gear <= 8
+
+
+def test_session_packet_carries_the_track_length():
+    generator = PacketGenerator(seed=3)
+    session = PacketView(generator.packet(1)).record('session')
+    assert session.trackLength == generator.track_length
+
+
+def test_lap_data_moves_forward_consistently():
+    generator = PacketGenerator(seed=4)
+    previous = None
+    completed_laps = 0
+    for _ in range(200):
+        generator.advance(60)  # One second per step, a few laps in total
+        cars = list(PacketView(generator.packet(2)).cars())
+        for car in cars:
+            assert 0 <= car.lapDistance <= generator.track_length
+            assert car.sector in (0, 1, 2)
+            assert not car.currentLapInvalid
+        if previous is not None:
+            for before, after in zip(previous, cars):
+                if after.currentLapNum == before.currentLapNum:
+                    assert after.currentLapTimeInMS > before.currentLapTimeInMS
+                    assert after.lapDistance > before.lapDistance
+                    assert after.sector >= before.sector
+                else:
+                    assert after.currentLapNum == before.currentLapNum + 1
+                    assert 80000 <= after.lastLapTimeInMS <= 100000
+                    completed_laps += 1
+        previous = cars
+    assert completed_laps >= MAX_CARS
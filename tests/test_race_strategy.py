@@ -0,0 +1,52 @@
+from array import array
+
+import pytest
+
+from data_logging import TelemetryLogger
+from listener import TelemetryPipeline
+
+C3 = 18
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    pipeline = TelemetryPipeline(logger=TelemetryLogger(str(tmp_path)))
+    yield pipeline
+    pipeline.logger.close()
+
+
+def drive_stint(pipeline, laps, wear_per_lap, tire_type=C3):
+    """Completes laps on one set of tyres the way SessionState does: the compound
+    arrives with every car status packet, the lap hook runs before the next lap starts."""
+    state = pipeline.state
+    car = state.player_car
+    pipeline.add_strategy_lap(car)  # Placeholder lap 0 before the first lap data
+    car.started_new_lap(1)
+    for lap_number in range(1, laps + 1):
+        state.tire_type[car.car_index] = tire_type
+        car.update_car_status(tire_type)
+        wear = wear_per_lap * lap_number
+        state.tire_wear[car.car_index * 4:car.car_index * 4 + 4] = array('f', [wear] * 4)
+        pipeline.add_strategy_lap(car)
+        car.started_new_lap(lap_number + 1)
+
+
+def test_race_stint_is_one_compound_fit(pipeline):
+    pipeline.state.session_type = 15
+    drive_stint(pipeline, 6, 4.0)
+    strategy = pipeline.strategy
+    assert list(strategy.race_wear) == [C3]
+    compound = strategy.race_wear[C3]
+    assert len(compound.stints) == 1
+    assert compound.stints[0].n == 6
+    assert compound.wear_rate == pytest.approx(4.0)
+    projection = strategy.project_stint()
+    assert projection.tire_type == C3
+    assert projection.end_lap == pytest.approx(25.0)
+
+
+def test_practice_laps_feed_practice_wear_rates(pipeline):
+    pipeline.state.session_type = 1
+    drive_stint(pipeline, 5, 2.5)
+    assert pipeline.strategy.estimate_wear_rates() == {C3: pytest.approx(2.5)}
+    assert pipeline.strategy.race_wear == {}
@@ -0,0 +1,90 @@
+import pytest
+
+from session_catalogue import SessionCatalogue, compound_id
+
+C3, C4 = 18, 17
+ALL_VALID = 0xF
+
+
+def lap_row(lap_ms, s1, s2, s3, flags=ALL_VALID):
+    return {'lapTimeInMS': lap_ms, 'sector1MS': s1 % 60000, 'sector1Min': s1 // 60000,
+            'sector2MS': s2, 'sector2Min': 0, 'sector3MS': s3, 'sector3Min': 0, 'lapValidFlags': flags}
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    catalogue = SessionCatalogue(str(tmp_path / 'catalogue.sqlite'))
+    yield catalogue
+    catalogue.close()
+
+
+def test_fastest_laps_in_order(catalogue):
+    catalogue.record_session(1, track_id=10, session_type=15)
+    for lap_number, lap_ms in enumerate([91000, 89500, 90200, 88900], 1):
+        catalogue.record_lap(1, 0, lap_number, lap_row(lap_ms, 30000, 30000, lap_ms - 60000), C3)
+    catalogue.flush()
+    fastest = catalogue.fastest(limit=3)
+    assert [row['lap_time_ms'] for row in fastest] == [88900, 89500, 90200]
+    assert fastest[0]['lap_number'] == 4
+    assert fastest[0]['track_id'] == 10
+
+
+def test_sector_times_include_minutes(catalogue):
+    catalogue.record_session(1, 10, 15)
+    catalogue.record_lap(1, 0, 1, lap_row(150000, 61000, 40000, 49000), C3)
+    catalogue.record_lap(1, 0, 2, lap_row(150000, 59000, 42000, 49000), C3)
+    catalogue.flush()
+    assert [row['sector1_ms'] for row in catalogue.fastest(sector=1, limit=2)] == [59000, 61000]
+
+
+def test_invalid_times_are_filtered_per_sector(catalogue):
+    catalogue.record_session(1, 10, 15)
+    # Fastest lap overall, but the lap and sector 2 were invalidated
+    catalogue.record_lap(1, 0, 1, lap_row(85000, 28000, 27000, 30000, flags=0x2 | 0x8), C3)
+    catalogue.record_lap(1, 0, 2, lap_row(90000, 30000, 30000, 30000), C3)
+    catalogue.flush()
+    assert catalogue.fastest()[0]['lap_number'] == 2
+    assert catalogue.fastest(valid_only=False)[0]['lap_number'] == 1
+    assert catalogue.fastest(sector=1)[0]['lap_number'] == 1  # Sector 1 stayed valid
+    assert catalogue.fastest(sector=2)[0]['lap_number'] == 2
+
+
+def test_filters_by_compound_track_and_session_type(catalogue):
+    catalogue.record_session(1, track_id=10, session_type=15)
+    catalogue.record_session(2, track_id=11, session_type=1)
+    catalogue.record_lap(1, 0, 1, lap_row(90000, 30000, 30000, 30000), C3)
+    catalogue.record_lap(1, 1, 1, lap_row(89000, 29000, 30000, 30000), C4)
+    catalogue.record_lap(2, 0, 1, lap_row(80000, 25000, 25000, 30000), C4)
+    catalogue.flush()
+    assert [row['lap_time_ms'] for row in catalogue.fastest(limit=5)] == [80000, 89000, 90000]
+    assert [row['lap_time_ms'] for row in catalogue.fastest(compound='C3', limit=5)] == [90000]
+    assert [row['lap_time_ms'] for row in catalogue.fastest(compound='c4', track_id=10, limit=5)] == [89000]
+    assert [row['lap_time_ms'] for row in catalogue.fastest(session_type=1, limit=5)] == [80000]
+    assert catalogue.fastest(track_id=12) == []
+
+
+def test_unsigned_session_uids_round_trip(catalogue):
+    session_uid = 2 ** 64 - 5
+    catalogue.record_session(session_uid, 10, 15)
+    catalogue.record_lap(session_uid, 0, 1, lap_row(90000, 30000, 30000, 30000), C3)
+    catalogue.flush()
+    assert catalogue.fastest()[0]['session_uid'] == session_uid
+    assert len(catalogue.session_laps(session_uid)) == 1
+
+
+def test_laps_before_the_session_packet_are_backfilled(catalogue):
+    catalogue.record_lap(1, 0, 1, lap_row(90000, 30000, 30000, 30000), C3)
+    catalogue.record_stint(1, 0, 0, {'endLap': 255, 'actualTyre': C3, 'visualTyre': C3})
+    catalogue.flush()
+    assert catalogue.session_laps(1)[0]['track_id'] is None
+    catalogue.record_session(1, track_id=10, session_type=15)
+    catalogue.flush()
+    assert catalogue.fastest(track_id=10, session_type=15)[0]['lap_number'] == 1
+    assert len(catalogue.find_stints('C3', track_id=10, session_type=15)) == 1
+
+
+def test_compound_names():
+    assert compound_id('C3') == C3
+    assert compound_id(C4) == C4
+    with pytest.raises(ValueError):
+        compound_id('C9')
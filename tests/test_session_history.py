@@ -0,0 +1,98 @@
+from constants import *
+from packet_generator import PACKET_SIZES_2025
+from packet_layouts import HEADER_STRUCT, PACKET_FORMAT_2025, get_layouts
+from session_history import SessionHistoryStore
+
+LAYOUTS = get_layouts(PACKET_FORMAT_2025)[11]
+
+
+def history_packet(car_index, laps, stints, session_uid=1, best=(1, 1, 1, 1)):
+    """Session history datagram; laps are (lap ms, s1 ms, s2 ms, s3 ms, flags), stints (end lap, compound)."""
+    buffer = bytearray(PACKET_SIZES_2025[11])
+    HEADER_STRUCT.pack_into(buffer, 0, PACKET_FORMAT_2025, 25, 1, 0, 1, 11, session_uid, 0.0, 0, 0, 0, 255)
+    summary = LAYOUTS['summary']
+    summary.struct.pack_into(buffer, summary.offset, car_index, len(laps), len(stints), *best)
+    for i, (lap_ms, s1, s2, s3, flags) in enumerate(laps):
+        LAYOUTS['lap'].struct.pack_into(buffer, LAYOUTS['lap'].record_offset(i), lap_ms, s1, 0, s2, 0, s3, 0, flags)
+    for i, (end_lap, compound) in enumerate(stints):
+        LAYOUTS['stint'].struct.pack_into(buffer, LAYOUTS['stint'].record_offset(i), end_lap, compound, compound)
+    return bytes(buffer)
+
+
+def lap(n, flags=0xF):
+    return (90000 + n, 30000, 30000, 30000 + n, flags)
+
+
+def kinds(changes):
+    return [(change.kind, change.index, change.new) for change in changes]
+
+
+def test_first_packet_reports_every_row():
+    store = SessionHistoryStore()
+    changes = store.update_buffer(history_packet(2, [lap(1), lap(2)], [(255, 18)]))
+    assert kinds(changes) == [('lap', 1, True), ('lap', 2, True), ('stint', 0, True), ('best', None, True)]
+    assert store.lap(2, 2)['lapTimeInMS'] == 90002
+    assert store.lap(2, 2)['sector3MS'] == 30002
+    assert store.stints[2][0]['visualTyre'] == 18
+
+
+def test_unchanged_packet_decodes_nothing():
+    store = SessionHistoryStore()
+    data = history_packet(0, [lap(1), lap(2), lap(3)], [(255, 17)])
+    store.update_buffer(data)
+    decoded = store.rows_decoded
+    assert store.update_buffer(data) == []
+    assert store.rows_decoded == decoded
+
+
+def test_only_the_changed_last_row_and_new_rows_are_decoded():
+    store = SessionHistoryStore()
+    store.update_buffer(history_packet(0, [lap(1), lap(2), (0, 29000, 0, 0, 0)], [(255, 17)]))
+    decoded = store.rows_decoded
+    # Lap 3 completes and lap 4 starts
+    changes = store.update_buffer(history_packet(0, [lap(1), lap(2), lap(3), (0, 0, 0, 0, 0)], [(255, 17)]))
+    assert kinds(changes) == [('lap', 3, False), ('lap', 4, True)]
+    assert store.rows_decoded == decoded + 2
+    assert store.lap(0, 3)['lapTimeInMS'] == 90003
+
+
+def test_change_in_an_earlier_row_is_found():
+    store = SessionHistoryStore()
+    store.update_buffer(history_packet(0, [lap(1), lap(2), lap(3)], [(255, 17)]))
+    # The game invalidates lap 1 after the fact
+    changes = store.update_buffer(history_packet(0, [lap(1, flags=0), lap(2), lap(3)], [(255, 17)]))
+    assert kinds(changes) == [('lap', 1, False)]
+    assert store.lap(0, 1)['lapValidFlags'] == 0
+
+
+def test_stint_and_best_changes():
+    store = SessionHistoryStore()
+    store.update_buffer(history_packet(0, [lap(1)], [(255, 17)]))
+    changes = store.update_buffer(history_packet(0, [lap(1)], [(1, 17), (255, 16)], best=(1, 1, 1, 1)))
+    assert kinds(changes) == [('stint', 0, False), ('stint', 1, True)]
+    changes = store.update_buffer(history_packet(0, [lap(1)], [(1, 17), (255, 16)], best=(1, 1, 2, 1)))
+    assert kinds(changes) == [('best', None, False)]
+
+
+def test_cars_are_cached_separately():
+    store = SessionHistoryStore()
+    store.update_buffer(history_packet(0, [lap(1)], [(255, 17)]))
+    changes = store.update_buffer(history_packet(1, [lap(1)], [(255, 17)]))
+    assert kinds(changes) == [('lap', 1, True), ('stint', 0, True), ('best', None, True)]
+
+
+def test_shorter_history_and_new_session():
+    store = SessionHistoryStore()
+    store.update_buffer(history_packet(0, [lap(1), lap(2), lap(3)], [(255, 17)]))
+    store.update_buffer(history_packet(0, [lap(1)], [(255, 17)]))
+    assert len(store.laps[0]) == 1
+    changes = store.update_buffer(history_packet(0, [lap(1)], [(255, 17)], session_uid=2))
+    assert store.session_uid == 2
+    assert kinds(changes)[0] == ('lap', 1, True)
+
+
+def test_on_change_hook_gets_every_change():
+    seen = []
+    store = SessionHistoryStore(on_change=seen.append)
+    changes = store.update_buffer(history_packet(0, [lap(1)], [(255, 17)]))
+    assert seen == changes
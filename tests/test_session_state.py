@@ -0,0 +1,50 @@
+import pytest
+
+from constants import *
+from packet_generator import PacketGenerator
+from packet_views import PacketView
+from session_state import SessionState
+
+
+def feed(state, generator, count, packet_ids):
+    for data in generator.packets(count, packet_ids=packet_ids):
+        state.update(PacketView(data))
+
+
+def test_car_history_is_only_allocated_for_cars_on_track():
+    generator = PacketGenerator(seed=1, num_cars=3)
+    state = SessionState(retention=32)
+    assert all(car.car_data is None for car in state.cars)
+
+    feed(state, generator, 5, (6,))  # Telemetry before any lap data is not kept
+    assert all(car.car_data is None for car in state.cars)
+
+    feed(state, generator, 10, (2, 6))
+    assert state.active_cars == [0, 1, 2]
+    assert [car.car_index for car in state.cars if car.car_data is not None] == [0, 1, 2]
+    assert len(state.cars[0].car_data) > 0
+    assert state.cars[0].car_data.capacity == 32
+
+
+class InvalidLapsGenerator(PacketGenerator):
+    """Every lap of car 1 is invalid."""
+
+    def lap_values(self, car_index):
+        values = super().lap_values(car_index)
+        values['currentLapInvalid'] = int(car_index == 1)
+        return values
+
+
+def test_lap_statistics_use_official_times_of_valid_laps():
+    generator = InvalidLapsGenerator(seed=2, num_cars=2)
+    generator.lap_durations = [2.0] * MAX_CARS
+    generator.lap_elapsed = [1.0] * MAX_CARS  # Joined half way round, so the first lap is seen partly
+    state = SessionState(retention=32)
+    feed(state, generator, 60 * 7, (2,))
+
+    performance = state.performance
+    assert performance.cars[0].lap_count == 3
+    assert performance.best_lap_time[0] == pytest.approx(2.0)
+    assert performance.mean_lap_time[0] == pytest.approx(2.0)
+    assert performance.cars[1].lap_count == 0
+    assert performance.session_best.best_lap_time == pytest.approx(2.0)
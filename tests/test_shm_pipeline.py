@@ -0,0 +1,52 @@
+import pytest
+
+from shm_pipeline import SharedPacketRing
+from telemetry_stats import PipelineStats
+
+
+@pytest.fixture
+def ring():
+    ring = SharedPacketRing(slots=8, slot_size=16)
+    yield ring
+    ring.close()
+
+
+def write(ring, count, start=0):
+    for i in range(start, start + count):
+        ring.write(bytes([i]) * 4)
+
+
+def test_reader_starts_at_oldest_datagram_in_ring(ring):
+    write(ring, 5)
+    assert [data[0] for data in ring.reader().read_batch()] == [0, 1, 2, 3, 4]
+
+    write(ring, 10, start=5)
+    reader = ring.reader()
+    assert [data[0] for data in reader.read_batch()] == list(range(7, 15))
+    assert reader.lost_packets == 0
+
+
+def test_lapped_reader_counts_overruns(ring):
+    reader = ring.reader()
+    write(ring, 20)
+    assert len(reader.read_batch()) == 8
+    assert reader.lost_packets == 12
+    assert reader.backlog == 0
+
+
+def test_overruns_are_reported_periodically(ring, capsys):
+    reader = ring.reader()
+    write(ring, 20)
+    reader.read_batch()
+    reader.report_overruns("Decoder", interval=0)
+    assert "Decoder lost 12 packets to ring overruns" in capsys.readouterr().out
+    reader.report_overruns("Decoder", interval=0)
+    assert capsys.readouterr().out == ""  # Nothing new lost
+
+
+def test_gauges_follow_the_reader(ring):
+    stats = PipelineStats()
+    reader = ring.reader()
+    reader.add_gauges(stats)
+    write(ring, 3)
+    assert stats.snapshot()['gauges'] == {'ring_lost_packets': 0, 'ring_backlog': 3}
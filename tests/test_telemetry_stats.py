@@ -0,0 +1,31 @@
+from telemetry_stats import PacketTypeStats, PipelineStats
+
+
+def count_frames(frames, packet_id=2):
+    stats = PipelineStats()
+    type_stats = PacketTypeStats()
+    for frame in frames:
+        stats.check_frame(type_stats, packet_id, frame)
+    return stats, type_stats
+
+
+def test_in_order_frames_lose_nothing():
+    stats, type_stats = count_frames([10, 11, 12, 13])
+    assert type_stats.lost == 0
+    assert stats.out_of_order == 0
+
+
+def test_gap_counts_the_missing_frames():
+    stats, type_stats = count_frames([10, 11, 14])
+    assert type_stats.lost == 2
+
+
+def test_late_frame_does_not_become_the_baseline():
+    stats, type_stats = count_frames([9, 10, 12, 11, 13])
+    assert stats.out_of_order == 1
+    assert type_stats.lost == 1  # The gap before 12, but none again before 13
+
+
+def test_lower_send_rate_is_not_loss():
+    stats, type_stats = count_frames([0, 3, 6, 9, 15])
+    assert type_stats.lost == 1
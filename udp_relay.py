@@ -0,0 +1,145 @@
+import socket
+
+from constants import *
+from packet_views import PACKET_ID_OFFSET
+
+# Forwards every received datagram unchanged to other local UDP consumers
+# (overlays, other recorders), since the game only sends to one port. Each
+# destination may be limited to some packet ids, looked up in a 256-entry
+# table by the packet id byte. Datagrams go out with sendto() of the received
+# buffer itself (bytes or a memoryview into a receive buffer), without copying,
+# from one non-blocking socket: a destination that cannot keep up loses
+# datagrams and counts them instead of ever stalling the caller.
+#
+# Used either from TelemetryPipeline.process, before decoding, or as a
+# standalone relay loop receiving with recv_into into one reused buffer. In
+# that mode the listener itself can be a destination, so decoding runs in
+# parallel in another process.
+
+
+class RelayDestination:
+    __slots__ = ('address', 'packet_ids', 'accepts', 'sent', 'filtered', 'dropped')
+
+    def __init__(self, address, packet_ids=None):
+        self.address = address
+        self.packet_ids = tuple(sorted(packet_ids)) if packet_ids is not None else None
+        self.accepts = bytearray(b'\x01' * 256)
+        if packet_ids is not None:
+            self.accepts = bytearray(256)
+            for packet_id in packet_ids:
+                self.accepts[packet_id] = 1
+        self.sent = 0
+        self.filtered = 0
+        self.dropped = 0  # Send buffer full or send error
+
+    def __repr__(self):
+        host, port = self.address
+        ids = ','.join(map(str, self.packet_ids)) if self.packet_ids is not None else 'all'
+        return f"{host}:{port} ({ids}): sent {self.sent}, filtered {self.filtered}, dropped {self.dropped}"
+
+
+def parse_destination(text):
+    """'HOST:PORT' or 'HOST:PORT:ID,ID,...' as a RelayDestination; HOST defaults to 127.0.0.1.
+    Raises ValueError for a missing or out of range port or packet id."""
+    host, _, rest = text.partition(':')
+    port, _, ids = rest.partition(':')
+    try:
+        port = int(port)
+        packet_ids = [int(packet_id) for packet_id in ids.split(',') if packet_id] if ids else None
+    except ValueError:
+        raise ValueError(f"Relay destination {text!r} is not HOST:PORT[:ID,ID,...]") from None
+    if not 0 < port < 65536:
+        raise ValueError(f"Relay destination {text!r} has port {port}, expected 1-65535")
+    for packet_id in packet_ids or ():
+        if not 0 <= packet_id < 256:
+            raise ValueError(f"Relay destination {text!r} has packet id {packet_id}, expected 0-255")
+    return RelayDestination((host or '127.0.0.1', port), packet_ids)
+
+
+def is_local_address(address, ip=UDP_IP, port=UDP_PORT):
+    """True if datagrams sent to address would reach a listener bound to (ip, port)."""
+    host, destination_port = address
+    if destination_port != port:
+        return False
+    try:
+        destination_ip = socket.gethostbyname(host)
+    except OSError:
+        return False
+    if ip not in ('0.0.0.0', ''):
+        return destination_ip == ip
+    if destination_ip.startswith('127.') or destination_ip == '0.0.0.0':
+        return True
+    try:
+        return destination_ip in socket.gethostbyname_ex(socket.gethostname())[2]
+    except OSError:
+        return False
+
+
+class UdpRelay:
+    def __init__(self, destinations, sndbuf=UDP_RCVBUF):
+        self.destinations = [parse_destination(d) if isinstance(d, str) else d for d in destinations]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if sndbuf:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        self.sock.setblocking(False)
+        self.forwarded = 0
+
+    def forward(self, data):
+        """Sends data to every destination that accepts its packet id."""
+        if len(data) <= PACKET_ID_OFFSET:
+            return
+        packet_id = data[PACKET_ID_OFFSET]
+        sendto = self.sock.sendto
+        for destination in self.destinations:
+            if not destination.accepts[packet_id]:
+                destination.filtered += 1
+                continue
+            try:
+                sendto(data, destination.address)
+                destination.sent += 1
+            except OSError:
+                destination.dropped += 1  # Including BlockingIOError when the send buffer is full
+        self.forwarded += 1
+
+    def run(self, sock, consumer=None, stop_event=None):
+        """Standalone relay loop: receives into one reused buffer, forwards every
+        datagram and then hands it to consumer(view) if one is given."""
+        buffer = memoryview(bytearray(UDP_MAX_PACKET_SIZE))
+        if stop_event is not None:
+            sock.settimeout(0.5)  # Wake up now and then to check stop_event
+        while stop_event is None or not stop_event.is_set():
+            try:
+                size = sock.recv_into(buffer)
+            except socket.timeout:
+                continue
+            except ConnectionResetError:
+                continue  # Windows reports ICMP port unreachable on UDP sockets
+            datagram = buffer[:size]
+            self.forward(datagram)
+            if consumer is not None:
+                consumer(datagram)
+            datagram.release()
+
+    def report(self):
+        return '\n'.join(repr(destination) for destination in self.destinations)
+
+    def close(self):
+        self.sock.close()
+
+
+def relay_listener(destinations, ip=UDP_IP, port=UDP_PORT, stop_event=None):
+    """Relay-only mode: forwards everything received on port without decoding."""
+    from listener import open_socket
+
+    relay = UdpRelay(destinations)
+    for destination in relay.destinations:
+        if is_local_address(destination.address, ip, port):
+            relay.close()
+            raise ValueError(f"Relay destination {destination.address} is the relay's own port")
+    sock = open_socket(ip, port)
+    try:
+        relay.run(sock, stop_event=stop_event)
+    finally:
+        sock.close()
+        relay.close()
+        print(relay.report())